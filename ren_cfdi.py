@@ -5,12 +5,25 @@ Descripción         : Procesador de archivos XML de CFDi
 Autor               : David Padilla
 Fecha (creación)    : 11/09/2018
 Fecha (modificación): 29/09/2018
-Versión             : 1.2
+Fecha (modificación): 16/10/2026
+Versión             : 1.3
 Uso                 : Módulo que requiere de una función pricipal
                       - Importar:
                       from ren_cfdi import CFDi
                       -Inicializar:
                       new_cfdi = CFDi(nombre_archivo_xml, prefijo)
+                      - (Opcional) Elegir el motor de lectura del XML:
+                      new_cfdi = CFDi(nombre_archivo_xml, prefijo, parser='minidom')
+                      - (Opcional) Obtener sólo los valores necesarios:
+                      new_cfdi = CFDi(nombre_archivo_xml, prefijo, outputs=['file_name'])
+                      - (Opcional) Medir el tiempo de cada etapa:
+                      new_cfdi = CFDi(nombre_archivo_xml, prefijo, instrument=True)
+                      new_cfdi.timings
+                      - (Opcional) Leer el XML desde memoria o un objeto tipo
+                      archivo (por ejemplo un XML dentro de un ZIP):
+                      new_cfdi = CFDi(nombre, prefijo, source=contenido_xml)
+                      - (Opcional) Reglas de nómina (ver ren_cfdi_rules.py):
+                      new_cfdi = CFDi(nombre_archivo_xml, prefijo, rules=reglas)
                       - Renombrar archivo:
                       new_cfdi.rename_file()
                       - Generar línea de CSV
@@ -19,7 +32,17 @@ Uso                 : Módulo que requiere de una función pricipal
 import sys
 import os
 import csv
+import time
+from collections import namedtuple
+from cStringIO import StringIO
 from xml.dom import minidom
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+from ren_cfdi_report import get_csv_row
+from ren_cfdi_archive import is_member
+from ren_cfdi_rules import DEFAULT_RULES
 
 TAX_DICT = {
     '001': 'ISR',
@@ -27,6 +50,113 @@ TAX_DICT = {
     '003': 'IEPS',
 }
 
+# Motores disponibles para leer el XML:
+# 'iterparse' lee el archivo de forma incremental y descarta cada elemento
+# en cuanto se procesa; 'minidom' construye el DOM completo.
+PARSERS = ('iterparse', 'minidom')
+DEFAULT_PARSER = 'iterparse'
+
+# Campos de values generados por set_values_dict() y set_name()
+VALUE_FIELDS = (
+    'tipo', 'uuid', 'uuid1', 'rfce', 'folio', 'rfcr', 'uso_cfdi', 'total',
+    'mpago', 'ver', 'uuid2', 'monto', 'nom_ver', 'per', 'op', 'ded', 'neto',
+    'no_emp', 'per_f', 'ded_f', 'op_f', 'neto_f', 'ded_isr', 'subtotal',
+    'descuento', 'traslados', 'isr_t', 'iva_t', 'ieps_t', 'retenciones',
+    'isr_r', 'iva_r', 'fecha', 'doctos', 'file_name',
+)
+# Cambia cada vez que se agregan campos a VALUE_FIELDS, para no reutilizar
+# values guardados (ver ren_cfdi_manifest.py) que no los contienen
+VALUES_VERSION = 3
+
+# Grupos de campos de values según la sección del XML de la que provienen;
+# el resto de los campos sólo requiere los atributos de cfdi:Comprobante.
+TIMBRE_FIELDS = ('uuid', 'uuid1')
+PAGO_FIELDS = ('uuid2', 'monto', 'doctos')
+NOMINA_FIELDS = ('nom_ver', 'per', 'op', 'ded', 'neto', 'no_emp')
+NOMINA_FILTERED_FIELDS = ('per_f', 'ded_f', 'op_f', 'neto_f', 'ded_isr')
+IMPUESTOS_FIELDS = ('traslados', 'isr_t', 'iva_t', 'ieps_t', 'retenciones', 'isr_r', 'iva_r')
+
+FIELD_SECTIONS = {'rfce': 'emisor', 'rfcr': 'receptor', 'uso_cfdi': 'receptor'}
+FIELD_SECTIONS.update(dict.fromkeys(TIMBRE_FIELDS, 'timbre'))
+FIELD_SECTIONS.update(dict.fromkeys(PAGO_FIELDS, 'pago'))
+FIELD_SECTIONS.update(dict.fromkeys(NOMINA_FIELDS + NOMINA_FILTERED_FIELDS, 'nomina'))
+FIELD_SECTIONS.update(dict.fromkeys(IMPUESTOS_FIELDS, 'impuestos'))
+
+# Campos que forman el nombre de archivo según el tipo de comprobante
+# (ver get_name_n, get_name_p y get_name_i)
+NAME_FIELDS = {
+    'N': ('uuid1', 'rfcr', 'no_emp', 'rfce', 'per_f', 'neto_f', 'nom_ver'),
+    'P': ('uuid1', 'rfce', 'folio', 'rfcr', 'uuid2', 'monto', 'ver'),
+    None: ('uuid1', 'rfce', 'folio', 'rfcr', 'total', 'uso_cfdi', 'mpago', 'ver'),
+}
+
+# Salidas que se pueden solicitar además de cualquier campo de VALUE_FIELDS
+OUTPUTS = ('file_name', 'csv')
+
+class CFDiRecord(namedtuple('CFDiRecord', VALUE_FIELDS)):
+    """
+    Registro compacto (tupla sin __dict__) con los values de un CFDi.
+    Permite el acceso por nombre igual que el diccionario values
+    (record['rfce'], record.get('uuid')), por lo que puede sustituirlo
+    al mantener en memoria los resultados de un lote.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Crea el registro a partir de un diccionario values; los campos
+        ausentes quedan en None.
+        """
+        return cls._make(values.get(field) for field in VALUE_FIELDS)
+
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            # Sólo los campos: los métodos de la tupla (count, index) no son llaves
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        if key not in self._fields:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return list(self._fields)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+def get_qualified_name(tag, prefixes):
+    """
+    Convierte una etiqueta de ElementTree ('{uri}Nombre') al nombre calificado
+    que usa el documento ('prefijo:Nombre'), igual al tagName de MiniDOM.
+    """
+    if tag[0] != '{':
+        return tag
+    uri, name = tag[1:].split('}', 1)
+    prefix = prefixes.get(uri)
+    if prefix:
+        return "{}:{}".format(prefix, name)
+    return name
+
+def format_name(template, *args):
+    """
+    Aplica el formato del nombre de archivo y lo devuelve en UTF-8; los
+    valores pueden ser unicode con caracteres no ASCII (por ejemplo la Ñ
+    de un RFC).
+    """
+    args = [arg.decode('utf-8') if isinstance(arg, str) else arg for arg in args]
+    return unicode(template).format(*args).encode('utf-8')
+
 class CFDi(object):
     """
     Obtiene la información de un archivo XML para su renombrado.
@@ -36,235 +166,461 @@ class CFDi(object):
     docType = ''
     values = False
 
-    def __init__(self, fileName, prefix=False):
+    def __init__(self, fileName, prefix=False, parser=DEFAULT_PARSER, outputs=None,
+                 instrument=False, source=None, rules=None):
         """
         Método constructor de la instancia.
         Recibe el nombre de un archivo XML y lo procesa para obtener sus
         atributos, cambiar el nombre e insertar algunos de sus valores en un CSV
-        """
+        El parámetro parser indica el motor de lectura (ver PARSERS).
+        El parámetro outputs indica las salidas requeridas ('file_name', 'csv'
+        o campos de VALUE_FIELDS); sólo se procesan las secciones del XML que
+        éstas necesitan y el resto de los values queda en None.
+        Si no se indica se obtienen todos los valores.
+        Con instrument=True se guarda en timings el tiempo (segundos) de las
+        etapas 'parse', 'extract' y 'name'.
+        El parámetro source permite leer el XML desde su contenido (str) o
+        un objeto tipo archivo; en ese caso fileName sólo identifica al CFDi.
+        El parámetro rules (ren_cfdi_rules.NominaRules) indica qué conceptos
+        de nómina se suman en los valores filtrados; por omisión DEFAULT_RULES.
+        """
+        if parser not in PARSERS:
+            raise ValueError('Motor de lectura no soportado: %s' % parser)
+        for output in outputs or ():
+            if output not in OUTPUTS and output not in VALUE_FIELDS:
+                raise ValueError('Salida no soportada: %s' % output)
         self.fileName = fileName
+        self.source = source
+        self.rules = rules or DEFAULT_RULES
         self.attributes = dict()
         self.prefix = prefix
-        # Comprueba que el archivo exista
-        if os.path.isfile(fileName):
-            # Convierte el XML en un objeto MiniDOM para poder manipularlo
-            self.comprobante = minidom.parse(fileName).childNodes[0]
+        self.parser = parser
+        self.outputs = outputs
+        self.fields = set(VALUE_FIELDS)
+        self.sections = None
+        self.timings = None
+        if instrument:
+            start = time.time()
         err = self.setAttributes()
         if err:
             raise ValueError('Error!.%s'% err)
+        if instrument:
+            parsed = time.time()
 
         self.set_values_dict()
-        self.set_name()
+        if instrument:
+            extracted = time.time()
+        if 'file_name' in self.fields:
+            self.set_name()
+        if instrument:
+            self.timings = {
+                'parse': parsed - start,
+                'extract': extracted - parsed,
+                'name': time.time() - extracted,
+            }
 
-    def setAttributes(self):
+    def resolve_outputs(self):
+        """
+        Obtiene los campos de values (fields) y las secciones del XML
+        (sections) necesarios para las salidas solicitadas. Depende del tipo
+        de comprobante, por lo que se llama al leer cfdi:Comprobante.
+        """
+        if self.outputs is None:
+            return
+        fields = set()
+        for output in self.outputs:
+            if output == 'csv':
+                fields.update(VALUE_FIELDS)
+            elif output == 'file_name':
+                fields.update(NAME_FIELDS.get(self.docType, NAME_FIELDS[None]))
+                fields.add('file_name')
+            else:
+                fields.add(output)
+        self.fields = fields
+        self.sections = set(FIELD_SECTIONS[f] for f in fields if f in FIELD_SECTIONS)
+
+    def needs(self, section):
         """
-        Obtiene los atributos del archivo XML y los guarda en la variable attributes
+        Indica si la sección del XML es necesaria para las salidas solicitadas.
         """
+        return self.sections is None or section in self.sections
 
-        if self.comprobante:
-            self.attributes['comprobante'] = dict(self.comprobante.attributes.items())
-            self.docType = self.attributes['comprobante'].get("TipoDeComprobante")
-            errors = []
-            errors.append(self.process_timbre())
-            errors.append(self.process_emisor())
-            errors.append(self.process_receptor())
-            self.process_impuestos()
-            errors.append(self.process_nomina())
-            errors.append(self.process_pago())
-            if any(errors):
-                error = "\n".join([x for x in errors if x])
-                return "Se encontraron los siguientes errores: \n{}\nEn {}".format(error, self.fileName)
-            return False
+    def wants(self, fields):
+        """
+        Indica si alguno de los campos de values fue solicitado.
+        """
+        return any(field in self.fields for field in fields)
 
-        return "El CFDi no es válido: {}".format(self.fileName)
+    def setAttributes(self):
+        """
+        Obtiene los atributos del archivo XML y los guarda en la variable attributes.
+        El archivo se recorre una sola vez; cada elemento se envía al manejador
+        registrado para su nombre calificado en HANDLERS.
+        """
+        # Comprueba que el archivo exista
+        if self.source is None and not os.path.isfile(self.fileName):
+            return "El CFDi no es válido: {}".format(self.fileName)
+
+        self.reset_parse_state()
+        self.attributes['nomina'] = False
+        self.attributes['pago'] = False
+        if self.parser == 'iterparse':
+            self.read_iterparse()
+        else:
+            self.read_minidom()
+        self.reset_parse_state()
+
+        if 'comprobante' not in self.attributes:
+            return "El CFDi no es válido: {}".format(self.fileName)
+        errors = []
+        if self.needs('timbre') and 'timbre' not in self.attributes:
+            errors.append("El CFDi no cuenta con Timbre Fiscal Digital.")
+        if self.needs('emisor') and 'emisor' not in self.attributes:
+            errors.append("El CFDi no cuenta con Emisor")
+        if self.needs('receptor') and 'receptor' not in self.attributes:
+            errors.append("El CFDi no cuenta con Receptor")
+        if self.needs('nomina') and self.docType == 'N' and not self.attributes['nomina']:
+            errors.append("El CFDi no cuenta con Nómina")
+        if self.needs('pago') and self.docType == 'P' and not self.attributes['pago']:
+            errors.append("El CFDi no cuenta con Pagos")
+        if errors:
+            error = "\n".join(errors)
+            return "Se encontraron los siguientes errores: \n{}\nEn {}".format(error, self.fileName)
+        return False
 
+    def read_iterparse(self):
+        """
+        Lee el XML de forma incremental (iterparse) sin construir el árbol
+        completo; cada elemento se libera en cuanto se termina de leer.
+        """
+        prefixes = {}
+        names = {}
+        events = ('start-ns', 'start', 'end')
+        for event, elem in ElementTree.iterparse(self.get_source(), events):
+            if event == 'start-ns':
+                prefixes[elem[1]] = elem[0]
+                names.clear()
+                continue
+            tag = names.get(elem.tag)
+            if tag is None:
+                tag = names[elem.tag] = get_qualified_name(elem.tag, prefixes)
+            if event == 'start':
+                self.dispatch_start(tag, elem.attrib)
+            else:
+                self.dispatch_end(tag)
+                elem.clear()
+
+    def read_minidom(self):
+        """
+        Convierte el XML en un objeto MiniDOM y lo recorre una sola vez
+        enviando cada elemento a dispatch_start/dispatch_end.
+        """
+        self.comprobante = minidom.parse(self.get_source()).childNodes[0]
+        stack = [(self.comprobante, False)]
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                self.dispatch_end(node.tagName)
+                continue
+            self.dispatch_start(node.tagName, dict(node.attributes.items()))
+            stack.append((node, True))
+            children = [n for n in node.childNodes if n.nodeType == n.ELEMENT_NODE]
+            stack.extend((n, False) for n in reversed(children))
+
+    def get_source(self):
+        """
+        Devuelve lo que se entrega al motor de lectura: el nombre del archivo,
+        el objeto tipo archivo recibido en source o su contenido en memoria.
+        """
+        if self.source is None:
+            return self.fileName
+        if isinstance(self.source, str):
+            return StringIO(self.source)
+        return self.source
+
+    def reset_parse_state(self):
+        """
+        Inicializa las variables que usan los manejadores durante el recorrido.
+        """
+        self._path = []
+        self._handlers = {}
+        self._impuestos = None
+        self._impuestosLeidos = set()
+        self._impuestosChild = None
+        self._complementos = 0
+        self._nomina = None
+        self._pagos = None
+        self._pago = None
+
+    def dispatch_start(self, tag, attrs):
+        """
+        Envía la apertura de un elemento a su manejador registrado.
+        El primer elemento del documento es el propio comprobante.
+        """
+        parent = self._path[-1] if self._path else None
+        self._path.append(tag)
+        if parent is None:
+            self.process_comprobante(attrs, parent)
+            return
+        handler = self._handlers.get(tag)
+        if handler and handler[0]:
+            handler[0](self, attrs, parent)
+
+    def dispatch_end(self, tag):
+        """
+        Envía el cierre de un elemento a su manejador registrado.
+        """
+        self._path.pop()
+        handler = self._handlers.get(tag)
+        if handler and handler[1]:
+            handler[1](self)
+
+    @classmethod
+    def register_handler(cls, tag, start=None, end=None, section=None):
+        """
+        Registra los manejadores de apertura y cierre para un nombre calificado
+        ('prefijo:Elemento'). Si se indica una sección el manejador sólo se
+        ejecuta cuando las salidas solicitadas la necesitan.
+        Las subclases obtienen su propia copia del registro.
+        """
+        if 'HANDLERS' not in cls.__dict__:
+            cls.HANDLERS = dict(cls.HANDLERS)
+        cls.HANDLERS[tag] = (start, end, section)
+
+    def process_comprobante(self, attrs, parent):
+        """
+        Obtiene los atributos del elemento cfdi:Comprobante y activa los
+        manejadores de las secciones necesarias para su tipo.
+        """
+        self.attributes['comprobante'] = dict(attrs)
+        self.docType = self.attributes['comprobante'].get("TipoDeComprobante")
+        self.resolve_outputs()
+        if self.sections is None:
+            self._handlers = self.HANDLERS
+        else:
+            self._handlers = dict((tag, handler) for tag, handler in self.HANDLERS.items()
+                                  if handler[2] is None or handler[2] in self.sections)
 
-    def process_pago(self):
+    def process_pagos(self, attrs, parent):
         """
         Obtiene los atributos del elemento pago10:Pagos
         y los adjunta al diccionario de atributos en caso de existir.
+        Sólo se considera el primero dentro del primer cfdi:Complemento.
         """
-        if self.docType == 'P':
-            pagos = self.comprobante.getElementsByTagName('cfdi:Complemento')[0]\
-                .getElementsByTagName('pago10:Pagos')[0]
-            if not pagos:
-                return "El CFDi no cuenta con Pagos"
-            data = {}
-            data['total'] = 0.0
-            data['pagos'] = []
-
-            for pag in pagos.getElementsByTagName('pago10:Pago'):
-                pagoAttrs = dict(pag.attributes.items())
-                pago = {}
-                pago['monto'] = float(pagoAttrs.get('Monto', 0))
-                pago['no'] = pagoAttrs.get('NumOperacion')
-                pago['forma'] = pagoAttrs.get('FormaDePago')
-                pago['fecha'] = pagoAttrs.get('FechaPago')
-                pago['moneda'] = pagoAttrs.get('MonedaP')
-                pago['doctos'] = []
-
-                for doc in pag.getElementsByTagName('pago10:DoctoRelacionado'):
-                    doctoAttrs = dict(doc.attributes.items())
-                    docto = {}
-                    importe = float(doctoAttrs.get('ImpPagado', 0))
-                    if not importe or importe == 0:
-                        importe = float(pagoAttrs.get('Monto', 0))
-                    docto['docto'] = doctoAttrs.get('IdDocumento')
-                    docto['importe'] = importe
-                    data['total'] += importe
-                    pago['doctos'].append(docto)
-
-                data['pagos'].append(pago)
-            self.attributes['pago'] = data
-        else:
-            self.attributes['pago'] = False
-        return False
+        if self.docType == 'P' and self._complementos == 1 \
+                and not self.attributes['pago']:
+            self._pagos = {'total': 0.0, 'pagos': []}
+            self.attributes['pago'] = self._pagos
+
+    def end_pagos(self):
+        self._pagos = None
+
+    def process_pago(self, attrs, parent):
+        """
+        Obtiene los atributos del elemento pago10:Pago
+        """
+        if not self._pagos:
+            return
+        self._pago = {
+            'monto': float(attrs.get('Monto', 0)),
+            'no': attrs.get('NumOperacion'),
+            'forma': attrs.get('FormaDePago'),
+            'fecha': attrs.get('FechaPago'),
+            'moneda': attrs.get('MonedaP'),
+            'doctos': [],
+        }
+        self._pagos['pagos'].append(self._pago)
+
+    def end_pago(self):
+        self._pago = None
 
-    def process_nomina(self):
+    def process_docto(self, attrs, parent):
+        """
+        Obtiene los atributos del elemento pago10:DoctoRelacionado
+        """
+        if not self._pago:
+            return
+        importe = float(attrs.get('ImpPagado', 0))
+        if not importe:
+            importe = self._pago['monto']
+        self._pago['doctos'].append({
+            'docto': attrs.get('IdDocumento'),
+            'importe': importe,
+        })
+        self._pagos['total'] += importe
+
+    def process_nomina(self, attrs, parent):
         """
         Obtiene los atributos del elemento nomina12:Nomina
         y los adjunta al diccionario de atributos en caso de existir.
+        Sólo se considera el primero dentro del primer cfdi:Complemento.
+        """
+        if self.docType == 'N' and self._complementos == 1 \
+                and not self.attributes['nomina']:
+            self._nomina = {
+                'version': attrs.get('Version'),
+                'tipo': attrs.get('TipoNomina'),
+                'total_p': attrs.get('TotalPercepciones', 0),
+                'total_d': attrs.get('TotalDeducciones', 0),
+                'total_o': attrs.get('TotalOtrosPagos', 0),
+                # Reglas salariales
+                'percepciones': [],
+                'deducciones': [],
+                'otros': [],
+            }
+            self.attributes['nomina'] = self._nomina
+
+    def end_nomina(self):
+        self._nomina = None
+
+    def process_nomina_receptor(self, attrs, parent):
         """
-        if self.docType == 'N':
-            nomina = self.comprobante.getElementsByTagName('cfdi:Complemento')[0]\
-                .getElementsByTagName('nomina12:Nomina')[0]
-            if not nomina:
-                return "El CFDi no cuenta con Nómina"
-            nominaAttrs = dict(nomina.attributes.items())
-            data = {}
-            data['version'] = nominaAttrs.get('Version')
-            data['tipo'] = nominaAttrs.get('TipoNomina')
-            data['total_p'] = nominaAttrs.get('TotalPercepciones', 0)
-            data['total_d'] = nominaAttrs.get('TotalDeducciones', 0)
-            data['total_o'] = nominaAttrs.get('TotalOtrosPagos', 0)
-
-            # Procesa datos receptor
-            receptor = nomina.getElementsByTagName('nomina12:Receptor')[0]
-            recAttrs = dict(receptor.attributes.items())
-            data['receptor'] = {
-                'no_emp': recAttrs.get('NumEmpleado'),
-                'curp': recAttrs.get('Curp'),
-                'seguro': recAttrs.get('NumSeguridadSocial'),
-                'sdi': recAttrs.get('SalarioDiarioIntegrado'),
+        Obtiene los atributos del elemento nomina12:Receptor
+        """
+        if self._nomina and 'receptor' not in self._nomina:
+            self._nomina['receptor'] = {
+                'no_emp': attrs.get('NumEmpleado'),
+                'curp': attrs.get('Curp'),
+                'seguro': attrs.get('NumSeguridadSocial'),
+                'sdi': attrs.get('SalarioDiarioIntegrado'),
             }
 
-            # Procesar reglas salariales
-            data['percepciones'] = []
-            data['deducciones'] = []
-            data['otros'] = []
-
-            # Procesamiento de Percepciones
-            for percepciones in nomina.getElementsByTagName('nomina12:Percepciones'):
-                for percepcion in percepciones.getElementsByTagName('nomina12:Percepcion'):
-                    perAttrs = dict(percepcion.attributes.items())
-                    per = {}
-                    per['tipo'] = perAttrs.get('TipoPercepcion')
-                    per['clave'] = perAttrs.get('Clave')
-                    per['monto'] = float(perAttrs.get('ImporteExento', 0)) + \
-                        float(perAttrs.get('ImporteGravado', 0))
-                    data['percepciones'].append(per)
-
-            # Procesamiento de Deducciones
-            for deducciones in nomina.getElementsByTagName('nomina12:Deducciones'):
-                for deduccion in deducciones.getElementsByTagName('nomina12:Deduccion'):
-                    dedAttrs = dict(deduccion.attributes.items())
-                    ded = {}
-                    ded['tipo'] = dedAttrs.get('TipoDeduccion')
-                    ded['monto'] = float(dedAttrs.get('Importe', 0))
-                    data['deducciones'].append(ded)
-
-            # Procesamiento de Otros Pagos
-            for otros in nomina.getElementsByTagName('nomina12:OtrosPagos'):
-                for otro in otros.getElementsByTagName('nomina12:OtroPago'):
-                    otroAttrs = dict(otro.attributes.items())
-                    otro = {}
-                    otro['tipo'] = otroAttrs.get('TipoOtroPago')
-                    otro['monto'] = float(otroAttrs.get('Importe', 0))
-                    data['otros'].append(otro)
-
-            self.attributes['nomina'] = data
-        else:
-            self.attributes['nomina'] = False
-        return False
+    def process_percepcion(self, attrs, parent):
+        """
+        Obtiene los atributos de un elemento nomina12:Percepcion
+        """
+        if self._nomina and parent == 'nomina12:Percepciones':
+            self._nomina['percepciones'].append({
+                'tipo': attrs.get('TipoPercepcion'),
+                'clave': attrs.get('Clave'),
+                'monto': float(attrs.get('ImporteExento', 0)) + \
+                    float(attrs.get('ImporteGravado', 0)),
+            })
 
+    def process_deduccion(self, attrs, parent):
+        """
+        Obtiene los atributos de un elemento nomina12:Deduccion
+        """
+        if self._nomina and parent == 'nomina12:Deducciones':
+            self._nomina['deducciones'].append({
+                'tipo': attrs.get('TipoDeduccion'),
+                'clave': attrs.get('Clave'),
+                'monto': float(attrs.get('Importe', 0)),
+            })
 
-    def process_impuestos_childs(self, impuestos, iType):
+    def process_otro_pago(self, attrs, parent):
         """
-        Procesa los elementos que componen al elemento Impuesto
-        generando un diccionario de sus atributos
+        Obtiene los atributos de un elemento nomina12:OtroPago
         """
-        data = {}
-        data['total'] = 0.0
-        if iType == 'T':
-            elements = impuestos.getElementsByTagName('cfdi:Traslados')
-        elif iType == 'R':
-            elements = impuestos.getElementsByTagName('cfdi:Retenciones')
-        if not elements:
-            return data
-        for node in elements[0].childNodes:
-            if node.__class__.__name__ == 'Element':
-                nodeAttrs = dict(node.attributes.items())
-                subTotal = float(nodeAttrs.get('Importe', 0))
-                data['total'] += subTotal
-                if data.get(nodeAttrs['Impuesto']):
-                    data[nodeAttrs['Impuesto']] += subTotal
-                else:
-                    data[nodeAttrs['Impuesto']] = subTotal
-        return data
+        if self._nomina and parent == 'nomina12:OtrosPagos':
+            self._nomina['otros'].append({
+                'tipo': attrs.get('TipoOtroPago'),
+                'clave': attrs.get('Clave'),
+                'monto': float(attrs.get('Importe', 0)),
+            })
 
-    def process_impuestos(self):
+    def process_complemento(self, attrs, parent):
+        self._complementos += 1
+
+    def process_impuestos_childs(self, attrs, parent):
+        """
+        Abre el elemento cfdi:Traslados o cfdi:Retenciones del cfdi:Impuestos
+        en curso; sus hijos se suman en process_impuesto.
+        """
+        if not self._impuestos:
+            return
+        key = 'traslados' if self._path[-1] == 'cfdi:Traslados' else 'retenciones'
+        if key not in self._impuestosLeidos:
+            self._impuestosLeidos.add(key)
+            self._impuestosChild = (self._impuestos[key], len(self._path))
+
+    def end_impuestos_childs(self):
+        self._impuestosChild = None
+
+    def process_impuesto(self, attrs, parent):
+        """
+        Suma el importe de un cfdi:Traslado o cfdi:Retencion por tipo de impuesto
+        """
+        if not self._impuestosChild \
+                or len(self._path) != self._impuestosChild[1] + 1:
+            return
+        data = self._impuestosChild[0]
+        subTotal = float(attrs.get('Importe', 0))
+        data['total'] += subTotal
+        if data.get(attrs['Impuesto']):
+            data[attrs['Impuesto']] += subTotal
+        else:
+            data[attrs['Impuesto']] = subTotal
+
+    def process_impuestos(self, attrs, parent):
         """
         Obtiene los atributos del elemento cfdi:Impuestos
         y los adjunta al diccionario de atributos en caso de existir.
+        Se conserva el último del documento (el del comprobante).
         """
-        impuestos = self.comprobante.getElementsByTagName('cfdi:Impuestos')
-        if not impuestos:
-            return False
-        data = {}
-        data['traslados'] = self.process_impuestos_childs(impuestos[-1], 'T') #Corrección de ErrorIVAtotal david@rNet ([0], 'T'))
-        data['retenciones'] =self.process_impuestos_childs(impuestos[-1], 'R') #Corrección david@rNet ([0], 'R'))
-        self.attributes['impuestos'] = data
-        return False
+        self._impuestos = {
+            'traslados': {'total': 0.0},
+            'retenciones': {'total': 0.0},
+        }
+        self._impuestosLeidos = set()
+        self.attributes['impuestos'] = self._impuestos
+
+    def end_impuestos(self):
+        self._impuestos = None
 
-    def process_receptor(self):
+    def process_receptor(self, attrs, parent):
         """
         Obtiene los atributos del elemento cfdi:Receptor
         y los adjunta al diccionario de atributos
         """
-        receptor = self.comprobante.getElementsByTagName('cfdi:Receptor')
-        if not receptor:
-            return "El CFDi no cuenta con Receptor"
+        if 'receptor' in self.attributes:
+            return
         data = {}
-        data['rfc'] = receptor[0].getAttribute('Rfc')
-        data['nombre'] = receptor[0].getAttribute('Nombre')
-        data['uso_cfdi'] = receptor[0].getAttribute('UsoCFDI')
+        data['rfc'] = attrs.get('Rfc', '')
+        data['nombre'] = attrs.get('Nombre', '')
+        data['uso_cfdi'] = attrs.get('UsoCFDI', '')
         self.attributes['receptor'] = data
-        return False
 
-    def process_emisor(self):
+    def process_emisor(self, attrs, parent):
         """
         Obtiene los atributos del elemento cfdi:Emisor
         y los adjunta al diccionario de atributos
         """
-        emisor = self.comprobante.getElementsByTagName('cfdi:Emisor')
-        if not emisor:
-            return "El CFDi no cuenta con Emisor"
+        if 'emisor' in self.attributes:
+            return
         data = {}
-        data['rfc'] = emisor[0].getAttribute('Rfc')
-        data['nombre'] = emisor[0].getAttribute('Nombre')
+        data['rfc'] = attrs.get('Rfc', '')
+        data['nombre'] = attrs.get('Nombre', '')
         self.attributes['emisor'] = data
-        return False
 
-    def process_timbre(self):
+    def process_timbre(self, attrs, parent):
         """
         Obtiene los atributos del elemento tfd:TimbreFiscalDigital
         y los adjunta al diccionario de atributos
         """
-        tfd = self.comprobante.getElementsByTagName('tfd:TimbreFiscalDigital')
-        if not tfd:
-            return "El CFDi no cuenta con Timbre Fiscal Digital."
-        self.attributes['timbre'] = dict(tfd[0].attributes.items())
-        return False
+        if 'timbre' not in self.attributes:
+            self.attributes['timbre'] = dict(attrs)
+
+    # Manejadores por nombre calificado: (apertura, cierre, sección)
+    HANDLERS = {
+        'tfd:TimbreFiscalDigital': (process_timbre, None, 'timbre'),
+        'cfdi:Emisor': (process_emisor, None, 'emisor'),
+        'cfdi:Receptor': (process_receptor, None, 'receptor'),
+        'cfdi:Impuestos': (process_impuestos, end_impuestos, 'impuestos'),
+        'cfdi:Traslados': (process_impuestos_childs, end_impuestos_childs, 'impuestos'),
+        'cfdi:Retenciones': (process_impuestos_childs, end_impuestos_childs, 'impuestos'),
+        'cfdi:Traslado': (process_impuesto, None, 'impuestos'),
+        'cfdi:Retencion': (process_impuesto, None, 'impuestos'),
+        'cfdi:Complemento': (process_complemento, None, None),
+        'nomina12:Nomina': (process_nomina, end_nomina, 'nomina'),
+        'nomina12:Receptor': (process_nomina_receptor, None, 'nomina'),
+        'nomina12:Percepcion': (process_percepcion, None, 'nomina'),
+        'nomina12:Deduccion': (process_deduccion, None, 'nomina'),
+        'nomina12:OtroPago': (process_otro_pago, None, 'nomina'),
+        'pago10:Pagos': (process_pagos, end_pagos, 'pago'),
+        'pago10:Pago': (process_pago, end_pago, 'pago'),
+        'pago10:DoctoRelacionado': (process_docto, None, 'pago'),
+    }
 
     def get_pagos_data(self):
         """
@@ -282,47 +638,39 @@ class CFDi(object):
                     monto += docto['importe']
         return uuid, monto
 
+    def get_doctos_data(self):
+        """
+        Devuelve la tupla de pares (UUID completo en mayúsculas, importe pagado)
+        de todos los pago10:DoctoRelacionado del complemento de pago, o una
+        tupla vacía si el CFDi no es de tipo 'P' (ver ren_cfdi_reconcile.py).
+        """
+        if self.docType != 'P' or not self.attributes.get('pago'):
+            return ()
+        return tuple(((docto['docto'] or '').upper(), docto['importe'])
+                     for pago in self.attributes['pago']['pagos']
+                     for docto in pago['doctos'])
+
     # Filtrado de reglas salariales
     def get_per_data(self, percepciones):
         """
         Obtiene el total de percepciones en un CFDi de Nómina, filtra por clave para
-        no sumar algunas claves (modificar a conveniencia del usuario final)
+        no sumar algunas claves (ver ren_cfdi_rules.ini)
         """
-        total_per = 0.0
-        for per in percepciones:
-            try:
-                if int(per['clave']) < 15:
-                    total_per += float(per['monto'])
-            except:
-                total_per += float(per['monto'])
-        return total_per
+        return self.rules.per_total(percepciones)
 
     def get_ded_data(self, deducciones):
         """
-        Obtiene el total de deducciones en un CFDi de Nómina, filtra por clave para
-        no sumar algunas claves (modificar a conveniencia del usuario final) {['080', '081'] 100Viaticos C.P.ACS}
+        Obtiene el total de deducciones y el ISR en un CFDi de Nómina, filtra por
+        tipo para no sumar algunos tipos (ver ren_cfdi_rules.ini)
         """
-        total_ded = 0.0
-        isr = 0.0
-        deducciones_no_incluidas = ['080', '100', '081']
-        for ded in deducciones:
-            if ded['tipo'] not in deducciones_no_incluidas:
-                total_ded += float(ded['monto'])
-            if ded['tipo'] == '002':
-                isr += float(ded['monto'])
-        return total_ded, isr
+        return self.rules.ded_totals(deducciones)
 
     def get_op_data(self, otros):
         """
-        Obtiene el total de otros pagos en un CFDi de Nómina, filtra por clave para
-        no sumar algunas claves (modificar a conveniencia del usuario final)
+        Obtiene el total de otros pagos en un CFDi de Nómina, filtra por tipo para
+        no sumar algunos tipos (ver ren_cfdi_rules.ini)
         """
-        total_op = 0.0
-        otros_no_incluidos = ['003', '999']
-        for op in otros:
-            if op['tipo'] not in otros_no_incluidos:
-                total_op += float(op['monto'])
-        return total_op
+        return self.rules.op_total(otros)
 
     def get_filtered_nomina_data(self):
         """
@@ -361,7 +709,6 @@ class CFDi(object):
         1. Número de empleado                   (índice 5)
         """
         data = []
-        print self.docType
         if self.docType == 'N':
             data.append(self.attributes['nomina']['total_p'])
             data.append(self.attributes['nomina']['total_o'])
@@ -377,53 +724,58 @@ class CFDi(object):
         """
         Obtiene los valores que se utilizarán para generar el nombre del archivo
         así como el archivo csv con el resumen de las operaciones.
-        Estos valores son almacenados en la variable values
+        Estos valores son almacenados en la variable values; los campos que
+        no requieren las salidas solicitadas (ver resolve_outputs) quedan en None.
         values['folio'] = self.attributes['comprobante'].get('Folio', 'NA') {saved}
         """
-        values = {}
+        values = dict.fromkeys(VALUE_FIELDS)
         values['tipo'] = self.docType
-        values['uuid1'] = self.attributes['timbre'].get('UUID', 'XXXX')[-4:]
-        values['rfce'] = self.attributes['emisor'].get('rfc', 'AAA010101AAA')#[:-7] mod C.P. ACS
+        if self.wants(TIMBRE_FIELDS):
+            values['uuid'] = self.attributes['timbre'].get('UUID', '')
+            values['uuid1'] = self.attributes['timbre'].get('UUID', 'XXXX')[-4:]
+        if self.wants(('rfce',)):
+            values['rfce'] = self.attributes['emisor'].get('rfc', 'AAA010101AAA')#[:-7] mod C.P. ACS
         values['folio'] = self.attributes['comprobante'].get('Folio', 'NA')
-        values['rfcr'] = self.attributes['receptor'].get('rfc', 'AAA010101AAA')#[:-7] mod C.P. ACS
-        values['uso_cfdi'] = self.attributes['receptor'].get('uso_cfdi', 'NA')
+        if self.wants(('rfcr', 'uso_cfdi')):
+            values['rfcr'] = self.attributes['receptor'].get('rfc', 'AAA010101AAA')#[:-7] mod C.P. ACS
+            values['uso_cfdi'] = self.attributes['receptor'].get('uso_cfdi', 'NA')
         values['total'] = self.attributes['comprobante'].get('Total', 0)
         values['mpago'] = self.attributes['comprobante'].get('MetodoPago', '-')
         values['ver'] = self.attributes['comprobante'].get('Version', '-')
-        uuid2, monto = self.get_pagos_data()
-        values['uuid2'] = uuid2
-        values['monto'] = monto
-        nomina = self.get_nomina_data()
-        values['nom_ver'] = nomina[4]
-        values['per'] = nomina[0]
-        values['op'] = nomina[1]
-        values['ded'] = nomina[2]
-        values['neto'] = nomina[3]
-        values['no_emp'] = nomina[5]
-        nomina_filt = self.get_filtered_nomina_data()
-        values['per_f'] = nomina_filt[0]
-        values['ded_f'] = nomina_filt[1]
-        values['op_f'] = nomina_filt[2]
-        values['neto_f'] = nomina_filt[3]
-        values['ded_isr'] = nomina_filt[4]
+        values['fecha'] = self.attributes['comprobante'].get('Fecha', '')
+        if self.wants(PAGO_FIELDS):
+            uuid2, monto = self.get_pagos_data()
+            values['uuid2'] = uuid2
+            values['monto'] = monto
+            values['doctos'] = self.get_doctos_data()
+        if self.wants(NOMINA_FIELDS):
+            nomina = self.get_nomina_data()
+            values['nom_ver'] = nomina[4]
+            values['per'] = nomina[0]
+            values['op'] = nomina[1]
+            values['ded'] = nomina[2]
+            values['neto'] = nomina[3]
+            values['no_emp'] = nomina[5]
+        if self.wants(NOMINA_FILTERED_FIELDS):
+            nomina_filt = self.get_filtered_nomina_data()
+            values['per_f'] = nomina_filt[0]
+            values['ded_f'] = nomina_filt[1]
+            values['op_f'] = nomina_filt[2]
+            values['neto_f'] = nomina_filt[3]
+            values['ded_isr'] = nomina_filt[4]
         values['subtotal'] = self.attributes['comprobante'].get('SubTotal', '-')
         values['descuento'] = self.attributes['comprobante'].get('Descuento', 0)
-        if self.attributes.get('impuestos'):
-            values['traslados'] = self.attributes['impuestos']['traslados']['total']
-            values['isr_t'] = self.attributes['impuestos']['traslados'].get('001', 0)
-            values['iva_t'] = self.attributes['impuestos']['traslados'].get('002', 0)
-            values['ieps_t'] = self.attributes['impuestos']['traslados'].get('003', 0)
-            values['retenciones'] = self.attributes['impuestos']['retenciones']['total']
-            values['isr_r'] = self.attributes['impuestos']['retenciones'].get('001', 0)
-            values['iva_r'] = self.attributes['impuestos']['retenciones'].get('002', 0)
-        else:
-            values['traslados'] = 0
-            values['isr_t'] = 0
-            values['iva_t'] = 0
-            values['ieps_t'] = 0
-            values['retenciones'] = 0
-            values['isr_r'] = 0
-            values['iva_r'] = 0
+        if self.wants(IMPUESTOS_FIELDS):
+            impuestos = self.attributes.get('impuestos') or {}
+            traslados = impuestos.get('traslados', {})
+            retenciones = impuestos.get('retenciones', {})
+            values['traslados'] = traslados.get('total', 0)
+            values['isr_t'] = traslados.get('001', 0)
+            values['iva_t'] = traslados.get('002', 0)
+            values['ieps_t'] = traslados.get('003', 0)
+            values['retenciones'] = retenciones.get('total', 0)
+            values['isr_r'] = retenciones.get('001', 0)
+            values['iva_r'] = retenciones.get('002', 0)
         self.values = values
 
     def get_name_n(self, v, p):
@@ -431,7 +783,7 @@ class CFDi(object):
         Genera el nombre de archivo para los CFDi Tipo 'N' (nómina)
         """
         t = self.docType
-        file_name = "{}-{}_{}_{}_{}_{}_{}_{}{}".format(p, v['uuid1'],
+        file_name = format_name("{}-{}_{}_{}_{}_{}_{}_{}{}", p, v['uuid1'],
             v['rfcr'][:-7], v['no_emp'], v['rfce'][:-7], v['per_f'], v['neto_f'], t, v['nom_ver'])# mod C.P. ACS
         return file_name
 
@@ -442,7 +794,7 @@ class CFDi(object):
         TODO: Probar 'T' (traslado)
         """
         t = self.docType
-        file_name = "{}-{}_{}_{}_{}_{}_{}_{}_{}{}".format(p, v['uuid1'], \
+        file_name = format_name("{}-{}_{}_{}_{}_{}_{}_{}_{}{}", p, v['uuid1'], \
             v['rfce'][:-7], v['folio'], v['rfcr'][:-7], v['total'], v['uso_cfdi'], v['mpago'], t, v['ver'])# mod C.P. ACS
         return file_name
 
@@ -451,7 +803,7 @@ class CFDi(object):
         Genera el nombre de archivo para los CFDi Tipo 'P' (pago)
         """
         t = self.docType
-        file_name = "{}-{}_{}_{}_{}_#{}_{}_{}{}".format(p, v['uuid1'], \
+        file_name = format_name("{}-{}_{}_{}_{}_#{}_{}_{}{}", p, v['uuid1'], \
             v['rfce'][:-7], v['folio'], v['rfcr'][:-7], v['uuid2'], v['monto'], t, v['ver'])# mod C.P. ACS
         return file_name
 
@@ -474,46 +826,52 @@ class CFDi(object):
 
     def get_csv_line(self):
         """
-        Genera una fila para CSV (verificar concordancia entre este método y
-        el archivo CSV previamente generado)
-        """
-        line = []
-        v = self.values
-        line.append(str(v['file_name']))
-        line.append(str(v['rfce']))
-        line.append(str(v['rfcr']))
-        line.append(str(v['uuid1']))
-        line.append(str(v['folio']))
-        line.append(str(v['no_emp']))# mod C.P. ACS
-        line.append(str(v['subtotal']))
-        line.append(str(v['descuento']))
-        line.append(str(v['total']))
-        line.append(str(v['traslados']))
-        line.append(str(v['isr_t']))
-        line.append(str(v['iva_t']))
-        line.append(str(v['ieps_t']))
-        line.append(str(v['retenciones']))
-        line.append(str(v['isr_r']))
-        line.append(str(v['iva_r']))
-        line.append(str(v['per_f']))
-        line.append(str(v['op_f']))
-        line.append(str(v['ded_f']))
-        line.append(str(v['ded_isr']))
-        line.append(str(v['neto_f']))
-        line.append(str(v['mpago']))
-        line.append(str(v['tipo']))
-        line.append(str(v['ver']))
-        if str(v['mpago'])=='PUE':
-            if str(v['tipo']) == 'E':
-                line.append(str(float(v['total']) * -1.))
-            else:
-                line.append(str(v['total']))
-        line.append(str(v['monto']))
-        return ",".join(line)
+        Genera una fila para CSV con las columnas definidas en
+        ren_cfdi_report.CSV_COLUMNS (escapada con el módulo csv)
+        """
+        line = StringIO()
+        csv.writer(line, lineterminator='').writerow(get_csv_row(self.values, self.fileName))
+        return line.getvalue()
 
-    def rename_file(self):
+    @classmethod
+    def from_values(cls, fileName, values):
         """
-        Renombra el archivo XML con el formato obtenido en el método set_name()
+        Crea una instancia a partir de values previamente obtenidos (por ejemplo
+        del manifiesto de ren_cfdi_manifest.py) sin volver a leer el XML.
+        """
+        cfdi = cls.__new__(cls)
+        cfdi.fileName = fileName
+        cfdi.source = None
+        cfdi.rules = DEFAULT_RULES
+        cfdi.attributes = dict()
+        cfdi.docType = values.get('tipo')
+        cfdi.timings = None
+        cfdi.values = CFDiRecord.from_values(values)
+        return cfdi
+
+    def to_record(self):
+        """
+        Devuelve los values del CFDi como CFDiRecord.
+        """
+        if isinstance(self.values, CFDiRecord):
+            return self.values
+        return CFDiRecord.from_values(self.values)
+
+    def release(self):
+        """
+        Libera el árbol del documento y los atributos una vez obtenidos los
+        values, que se conservan como CFDiRecord. Después de llamarlo sólo
+        quedan disponibles fileName, docType, values y timings.
+        """
+        self.values = self.to_record()
+        self.source = None
+        self.comprobante = None
+        self.attributes = dict()
+
+    def get_rename_targets(self):
+        """
+        Devuelve la tupla (XML anterior, XML nuevo, PDF anterior, PDF nuevo)
+        con el formato obtenido en el método set_name()
         """
         newFileName = os.path.dirname(self.fileName)
 
@@ -530,11 +888,33 @@ class CFDi(object):
         # Nuevos nombres de archivo PDF y XML
         newFileNamePdf = "{}.pdf".format(newFileName)
         newFileNameXml = "{}.xml".format(newFileName)
+        return oldFileNameXml, newFileNameXml, oldFileNamePdf, newFileNamePdf
 
+    def rename_file(self):
+        """
+        Renombra el archivo XML con el formato obtenido en el método set_name()
+        Devuelve el nombre del archivo XML resultante (también si ya tenía el
+        nombre correcto), o None si no se renombró. Los XML leídos desde un
+        ZIP no se renombran.
+        Para un lote de archivos utilizar ren_cfdi_rename.RenameIndex, que
+        detecta duplicados y colisiones sin consultar cada archivo en disco.
+        """
+        if is_member(self.fileName):
+            print "El archivo {} está dentro de un ZIP\nNo se renombra.\n\n".format(self.fileName)
+            return None
+        oldFileNameXml, newFileNameXml, oldFileNamePdf, newFileNamePdf = \
+            self.get_rename_targets()
+
+        # El archivo ya tiene el nombre correcto (procesado anteriormente)
+        if oldFileNameXml == newFileNameXml:
+            return newFileNameXml
+
+        renamed = None
         # Comprobar que no existe el archivo XML con nombre nuevo para renombrar
         if not os.path.isfile(newFileNameXml):
             os.rename(oldFileNameXml, newFileNameXml)
-            os.system("touch {}".format(newFileNameXml))
+            os.utime(newFileNameXml, None)
+            renamed = newFileNameXml
             print "Renombrando: {}\nA: {}\n\n".format(self.fileName, self.values['file_name'])
         else:
             print "El nombre de archivo {} ya existe\nNo se renombra el " \
@@ -545,15 +925,17 @@ class CFDi(object):
             # Comprobar que no exista un archivo PDF con el mismo nombre que el XML anterior
             if os.path.isfile(oldFileNamePdf):
                 os.rename(oldFileNamePdf, newFileNamePdf)
-                os.system("touch {}".format(newFileNamePdf))
+                os.utime(newFileNamePdf, None)
         else:
             print "El nombre de archivo {} ya existe\nNo se renombra el " \
                   "archivo {}.\n\n".format(newFileNamePdf, oldFileNamePdf)
-
+        return renamed
 
     def generate_csv_line(self, fileCsvName):
         """
         Genera línea de Archivo CSV
+        Para un lote de archivos utilizar ren_cfdi_report.CsvReportWriter,
+        que mantiene el archivo abierto y escribe las filas en bloque.
         """
         f = open(fileCsvName, 'a')
         lineCSV = self.get_csv_line()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_aggregate.py
+Descripción         : Resumen de totales de CFDi por periodo, tipo y RFC
+                      Acumula los importes conforme se procesa cada CFDi, sin
+                      volver a leer el reporte detallado
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_aggregate import Aggregator
+                      - Acumular cada CFDi del lote:
+                      summary = Aggregator()
+                      summary.add(new_cfdi.values)
+                      - Escribir el resumen (junto al reporte CSV):
+                      summary.write(nombre_archivo_csv)
+'''
+import csv
+from ren_cfdi_report import to_cell
+
+SUMMARY_REPORT_NAME = 'resumencfdi.csv'
+
+# Llave de agrupación: (encabezado, función sobre values)
+GROUP_COLUMNS = (
+    ('Periodo', lambda v: (v.get('fecha') or '')[:7]),
+    ('Tipo', lambda v: v.get('tipo') or ''),
+    ('RFC Emisor', lambda v: v.get('rfce') or ''),
+    ('RFC Receptor', lambda v: v.get('rfcr') or ''),
+)
+
+# Importes acumulados: (encabezado, llave en values)
+SUM_COLUMNS = (
+    ('Sub Total', 'subtotal'),
+    ('Descuento', 'descuento'),
+    ('Total', 'total'),
+    ('Traslados', 'traslados'),
+    ('ISR Trasladado', 'isr_t'),
+    ('IVA Trasladado', 'iva_t'),
+    ('IEPS Trasladado', 'ieps_t'),
+    ('Retenciones', 'retenciones'),
+    ('ISR Retenido', 'isr_r'),
+    ('IVA Retenido', 'iva_r'),
+    ('Monto Pagos', 'monto'),
+    ('Percepciones', 'per_f'),
+    ('Otros Pagos', 'op_f'),
+    ('Deducciones', 'ded_f'),
+    ('Deducción ISR', 'ded_isr'),
+    ('Neto', 'neto_f'),
+)
+
+SUMMARY_HEADER = [column[0] for column in GROUP_COLUMNS] + ['CFDi'] + \
+                 [column[0] for column in SUM_COLUMNS]
+
+
+def to_amount(value):
+    """
+    Convierte un importe de values a número; los valores vacíos o no
+    numéricos ('-', 'NA', None) se consideran 0.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.
+
+
+class Aggregator(object):
+    """
+    Sumas acumuladas por grupo (periodo AAAA-MM, tipo, RFC emisor, RFC receptor).
+    Cada grupo ocupa una lista de tamaño fijo (número de CFDi e importes),
+    por lo que la memoria depende del número de grupos y no de CFDi.
+    """
+    def __init__(self):
+        self.groups = {}
+        self.count = 0
+
+    def add(self, values):
+        """
+        Suma los importes de los values de un CFDi a su grupo.
+        """
+        key = tuple(get(values) for header, get in GROUP_COLUMNS)
+        sums = self.groups.get(key)
+        if sums is None:
+            sums = self.groups[key] = [0] + [0.] * len(SUM_COLUMNS)
+        sums[0] += 1
+        for i, (header, field) in enumerate(SUM_COLUMNS, 1):
+            sums[i] += to_amount(values.get(field))
+        self.count += 1
+
+    def rows(self):
+        """
+        Devuelve las filas del resumen ordenadas por la llave de agrupación.
+        """
+        for key in sorted(self.groups):
+            sums = self.groups[key]
+            yield list(key) + [sums[0]] + [round(x, 2) for x in sums[1:]]
+
+    def write(self, fileName):
+        """
+        Escribe el resumen en un archivo CSV.
+        """
+        f = open(fileName, 'wb')
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(SUMMARY_HEADER)
+        writer.writerows([[to_cell(x) for x in row] for row in self.rows()])
+        f.close()
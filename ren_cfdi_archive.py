@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_archive.py
+Descripción         : Lectura de CFDi contenidos en archivos ZIP
+                      (por ejemplo la descarga masiva del SAT) sin extraerlos
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_batch.py
+                      - Importar:
+                      from ren_cfdi_archive import list_members, open_member
+                      - Nombres de los XML dentro de un ZIP ('descarga.zip!carpeta/a.xml'):
+                      for fileName in list_members(nombre_archivo_zip):
+                          f = open_member(fileName)
+                          new_cfdi = CFDi(fileName, prefijo, source=f)
+                          f.close()
+                      - Separar el ZIP y el nombre dentro de él:
+                      archive, member = split_member_name(fileName)
+'''
+import os
+import zipfile
+
+# Separador entre la ruta del ZIP y el nombre del XML dentro de él
+ARCHIVE_SEP = '!'
+ARCHIVE_EXT = '.ZIP'
+
+# ZipFile abierto más recientemente (uno por proceso); los miembros de un
+# ZIP se leen consecutivamente, por lo que basta con conservar el último.
+_archive = [None, None]
+
+
+def is_archive(fileName):
+    """
+    Indica si el nombre corresponde a un archivo ZIP.
+    """
+    return os.path.splitext(fileName)[1].upper() == ARCHIVE_EXT
+
+
+def member_name(archive, member):
+    """
+    Devuelve el nombre con el que se identifica un XML dentro de un ZIP.
+    """
+    return "{}{}{}".format(archive, ARCHIVE_SEP, member)
+
+
+def split_member_name(fileName):
+    """
+    Devuelve la tupla (ZIP, nombre dentro del ZIP) de un nombre generado
+    por member_name(), o (fileName, None) si es un archivo en disco.
+    """
+    pos = fileName.upper().rfind(ARCHIVE_EXT + ARCHIVE_SEP)
+    if pos < 0:
+        return fileName, None
+    pos += len(ARCHIVE_EXT)
+    return fileName[:pos], fileName[pos + len(ARCHIVE_SEP):]
+
+
+def is_member(fileName):
+    """
+    Indica si el nombre corresponde a un XML dentro de un ZIP.
+    """
+    return split_member_name(fileName)[1] is not None
+
+
+def get_archive(archive):
+    """
+    Devuelve el ZipFile del archivo, reutilizando el último abierto.
+    """
+    if _archive[0] != archive:
+        close_archive()
+        _archive[1] = zipfile.ZipFile(archive)
+        _archive[0] = archive
+    return _archive[1]
+
+
+def close_archive():
+    """
+    Cierra el último ZipFile abierto por get_archive().
+    """
+    if _archive[1] is not None:
+        _archive[1].close()
+    _archive[0] = _archive[1] = None
+
+
+def list_members(archive):
+    """
+    Devuelve la lista ordenada de nombres (ver member_name) de los XML
+    contenidos en el ZIP.
+    """
+    zf = zipfile.ZipFile(archive)
+    try:
+        members = [info.filename for info in zf.infolist()
+                   if os.path.splitext(info.filename)[1].upper() == '.XML']
+    finally:
+        zf.close()
+    return [member_name(archive, member) for member in sorted(members)]
+
+
+def open_member(fileName):
+    """
+    Abre para lectura (objeto tipo archivo, sin extraerlo a disco) el XML
+    identificado por un nombre generado por member_name().
+    """
+    archive, member = split_member_name(fileName)
+    return get_archive(archive).open(member)
+
+
+def stat_member(fileName):
+    """
+    Devuelve la tupla (tamaño, fecha de modificación) del ZIP que contiene
+    el XML; sus miembros se consideran sin cambios mientras no cambie el ZIP.
+    """
+    st = os.stat(split_member_name(fileName)[0])
+    return st.st_size, st.st_mtime
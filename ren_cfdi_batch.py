@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_batch.py
+Descripción         : Motor de procesamiento masivo de archivos XML de CFDi
+                      Reparte la lectura de los CFDi entre varios procesos
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_int.py o por un script
+                      - Importar:
+                      from ren_cfdi_batch import BatchProcessor, find_xml_files
+                      - Inicializar:
+                      batch = BatchProcessor(prefijo, workers=4)
+                      - Procesar (los resultados respetan el orden de entrada):
+                      for cfdi in batch.run(find_xml_files(directorio)):
+                          cfdi.rename_file()
+                      - Rendimiento:
+                      batch.files_per_second()
+                      - (Opcional) Obtener sólo los valores necesarios
+                      (ver CFDi.resolve_outputs):
+                      batch = BatchProcessor(prefijo, outputs=['file_name', 'uuid'])
+                      - (Opcional) Medir tiempos por etapa (ver ren_cfdi_stats.py):
+                      batch = BatchProcessor(prefijo, stats=Stats())
+                      - (Opcional) Omitir los archivos sin cambios desde la
+                      ejecución anterior (ver ren_cfdi_manifest.py):
+                      batch = BatchProcessor(prefijo, manifest=Manifest(directorio))
+                      - (Opcional) Incluir los XML contenidos en archivos ZIP
+                      (ver ren_cfdi_archive.py), que se leen sin extraerlos:
+                      batch.run(find_xml_files(directorio, archives=True))
+                      - (Opcional) Reutilizar el tamaño y fecha del recorrido
+                      (ver ren_cfdi_scan.py):
+                      scan = scan_directory(directorio)
+                      batch.run(scan.fileNames, scan.stats)
+                      - (Opcional) Procesar sólo los CFDi que cumplen un filtro
+                      (ver ren_cfdi_filter.py); el resto no se entrega:
+                      batch = BatchProcessor(prefijo, cfdi_filter=CFDiFilter(tipos='N'))
+                      - (Opcional) Reglas de nómina (ver ren_cfdi_rules.py):
+                      batch = BatchProcessor(prefijo, rules=load_rules(archivo_ini))
+                      - (Opcional) Avance y cancelación después de cada archivo:
+                      batch.run(archivos, progress=funcion, cancel=threading.Event())
+                      - Los archivos no válidos no detienen el lote: no se
+                      entregan y quedan en batch.errors (ver ren_cfdi_errors.py).
+'''
+import time
+import multiprocessing
+from ren_cfdi import CFDi, DEFAULT_PARSER, VALUES_VERSION
+from ren_cfdi_archive import is_member, open_member, close_archive
+from ren_cfdi_scan import scan_directory
+from ren_cfdi_rules import shared_rules
+
+
+def find_xml_files(directory, archives=False):
+    """
+    Devuelve la lista ordenada de archivos XML contenidos en el directorio
+    y sus subdirectorios.
+    Con archives=True se agregan al final los XML contenidos en los archivos
+    ZIP (ver ren_cfdi_archive.member_name), de modo que los XML en disco se
+    registren primero ante un UUID duplicado.
+    Para obtener además el tamaño, la fecha y el PDF de cada XML utilizar
+    ren_cfdi_scan.scan_directory.
+    """
+    return scan_directory(directory, archives).fileNames
+
+
+class CFDiError(object):
+    """
+    Error al procesar un archivo: nombre del archivo, tipo de error
+    (nombre de la excepción) y detalle.
+    """
+    def __init__(self, fileName, kind, detail):
+        self.fileName = fileName
+        self.kind = kind
+        self.detail = detail
+
+    @classmethod
+    def from_exception(cls, fileName, e):
+        try:
+            detail = str(e)
+        except UnicodeError:
+            detail = unicode(e).encode('utf-8')
+        return cls(fileName, e.__class__.__name__, detail.strip())
+
+
+def process_cfdi(job):
+    """
+    Procesa un archivo XML en el proceso trabajador.
+    Recibe una tupla (nombre_archivo, prefijo, motor, salidas, medir, filtro,
+    reglas)
+    y devuelve la instancia CFDi liberada (sólo con sus values como
+    CFDiRecord) para que pueda enviarse al proceso principal, None si el
+    CFDi no cumple el filtro o CFDiError si el archivo no es válido.
+    """
+    fileName = job[0]
+    try:
+        return read_cfdi(*job)
+    except Exception as e:
+        return CFDiError.from_exception(fileName, e)
+
+
+def read_cfdi(fileName, prefix, parser, outputs, instrument, cfdi_filter, rules=None):
+    """
+    Lee un CFDi para process_cfdi; los XML dentro de un ZIP se leen
+    directamente del archivo comprimido.
+    """
+    source = None
+    if is_member(fileName):
+        member = open_member(fileName)
+        try:
+            source = member.read()
+        finally:
+            member.close()
+    # Se descarta con el texto del XML antes de leerlo completo
+    if cfdi_filter and not cfdi_filter.accepts(fileName, source):
+        return None
+    cfdi = CFDi(fileName, prefix, parser, outputs, instrument, source, shared_rules(rules))
+    cfdi.release()
+    if cfdi_filter and not cfdi_filter.match_values(cfdi.values):
+        return None
+    return cfdi
+
+
+class BatchProcessor(object):
+    """
+    Procesa un lote de archivos XML repartiéndolos entre varios procesos.
+    Los resultados se entregan en el mismo orden que los archivos recibidos.
+    """
+    def __init__(self, prefix=False, workers=None, parser=DEFAULT_PARSER, chunksize=16,
+                 manifest=None, outputs=None, stats=None, cfdi_filter=None, rules=None):
+        self.prefix = prefix
+        self.rules = rules
+        self.cfdi_filter = cfdi_filter
+        # Los campos del filtro se agregan a las salidas para evaluarlo en values
+        if outputs is not None and cfdi_filter:
+            outputs = list(outputs) + [f for f in cfdi_filter.fields() if f not in outputs]
+        self.outputs = outputs
+        self.stats = stats
+        self.workers = workers or multiprocessing.cpu_count()
+        self.parser = parser
+        self.chunksize = chunksize
+        self.manifest = manifest
+        self.count = 0
+        self.cached = 0
+        self.skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def signature(self):
+        """
+        Firma de los parámetros que afectan a values; un registro del
+        manifiesto sólo se reutiliza si fue generado con la misma firma.
+        """
+        outputs = sorted(self.outputs) if self.outputs is not None else None
+        rules = shared_rules(self.rules).signature()
+        return repr((self.prefix, outputs, VALUES_VERSION, rules))
+
+    def run(self, fileNames, file_stats=None, progress=None, cancel=None):
+        """
+        Generador que devuelve una instancia CFDi por cada archivo en el
+        orden recibido. Los archivos sin cambios registrados en el manifiesto
+        se devuelven sin volver a leerlos; file_stats es el diccionario
+        {archivo: (tamaño, fecha)} ya obtenido (ScanResult.stats), para no
+        consultar de nuevo cada archivo en disco. Los que no cumplen cfdi_filter se
+        cuentan (count y skipped) pero no se devuelven, al igual que los que
+        no son válidos, que se agregan a errors (CFDiError).
+        progress es una función que recibe el BatchProcessor después de cada
+        archivo, también de los excluidos y los no válidos; cancel
+        (threading.Event) detiene el recorrido entre un archivo y otro.
+        """
+        self.count = 0
+        self.cached = 0
+        self.skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+        start = time.time()
+        signature = self.signature()
+        entries = []
+        jobs = []
+        for fileName in fileNames:
+            values = stat = None
+            if self.manifest:
+                stat = file_stats.get(fileName) if file_stats else None
+                if stat is None:
+                    try:
+                        stat = self.manifest.stat(fileName)
+                    except (OSError, IOError) as e:
+                        # Enlace roto o archivo borrado después del recorrido
+                        entries.append((fileName, None, CFDiError.from_exception(fileName, e)))
+                        continue
+                values = self.manifest.get(fileName, stat, signature)
+            if values is None:
+                jobs.append((fileName, self.prefix, self.parser, self.outputs,
+                             self.stats is not None, self.cfdi_filter, self.rules))
+            entries.append((fileName, stat, values))
+
+        results = self.imap(jobs)
+        try:
+            for fileName, stat, values in entries:
+                if cancel and cancel.is_set():
+                    return
+                if values is None or isinstance(values, CFDiError):
+                    cfdi = next(results) if values is None else values
+                    if isinstance(cfdi, CFDiError):
+                        self.errors.append(cfdi)
+                        self.count += 1
+                        self.elapsed = time.time() - start
+                        if self.stats:
+                            self.stats.count('errors')
+                        if progress:
+                            progress(self)
+                        continue
+                    if cfdi is not None:
+                        if self.manifest:
+                            self.manifest.put(fileName, stat, cfdi.values, signature)
+                        if self.stats:
+                            self.stats.add_file(fileName, cfdi.docType, cfdi.timings)
+                else:
+                    cfdi = CFDi.from_values(fileName, values)
+                    self.cached += 1
+                    if self.stats:
+                        self.stats.count('cached')
+                    if self.cfdi_filter and not self.cfdi_filter.match_values(cfdi.values):
+                        cfdi = None
+                self.count += 1
+                self.elapsed = time.time() - start
+                if progress:
+                    progress(self)
+                if cfdi is None:
+                    self.skipped += 1
+                    if self.stats:
+                        self.stats.count('skipped')
+                    continue
+                yield cfdi
+        finally:
+            # Al interrumpir el recorrido (cancelación) se detiene el Pool
+            results.close()
+            close_archive()
+            if self.manifest:
+                self.manifest.commit()
+
+    def imap(self, jobs):
+        """
+        Procesa los trabajos en el Pool y devuelve los resultados en orden.
+        Con un solo proceso (o un solo archivo) no se crea el Pool.
+        """
+        if self.workers == 1 or len(jobs) < 2:
+            for job in jobs:
+                yield process_cfdi(job)
+            return
+
+        pool = multiprocessing.Pool(min(self.workers, len(jobs)))
+        try:
+            for cfdi in pool.imap(process_cfdi, jobs, self.chunksize):
+                yield cfdi
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def process(self, fileNames):
+        """
+        Procesa todos los archivos y devuelve la lista de instancias CFDi.
+        """
+        return list(self.run(fileNames))
+
+    def files_per_second(self):
+        """
+        Devuelve el número de archivos procesados por segundo en la última ejecución.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.count / self.elapsed
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_bench.py
+Descripción         : Pruebas de rendimiento del procesador de CFDi
+                      Genera un corpus sintético de CFDi 3.3 (tipos I, E, P y N)
+                      y mide las etapas de lectura, extracción, nombre,
+                      renombrado y CSV
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Script independiente de la interfaz
+                      - Ejecutar con corpus de 1,000 y 10,000 archivos:
+                      python ren_cfdi_bench.py --sizes 1000,10000
+                      - Guardar los resultados como referencia:
+                      python ren_cfdi_bench.py --sizes 1000 --save
+                      - Las siguientes ejecuciones se comparan con la referencia
+                      guardada en ren_cfdi_bench.json
+                      - Sólo generar un corpus:
+                      from ren_cfdi_bench import generate_corpus
+                      generate_corpus(directorio, 1000, percepciones=50)
+'''
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+from ren_cfdi import CFDi, DEFAULT_PARSER, PARSERS
+from ren_cfdi_batch import BatchProcessor, find_xml_files
+from ren_cfdi_report import CsvReportWriter
+from ren_cfdi_rename import RenameIndex, undo_journal
+
+BASELINE_NAME = 'ren_cfdi_bench.json'
+CORPUS_MARKER = '.ren_cfdi_corpus'
+STAGES = ('parse', 'extract', 'name', 'rename', 'csv', 'batch')
+
+NS = ('xmlns:cfdi="http://www.sat.gob.mx/cfd/3" '
+      'xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital" '
+      'xmlns:nomina12="http://www.sat.gob.mx/nomina12" '
+      'xmlns:pago10="http://www.sat.gob.mx/Pagos" '
+      'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
+
+
+def random_rfc(rnd, moral=True):
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    size = 3 if moral else 4
+    return "{}{:02d}{:02d}{:02d}{}".format(
+        ''.join(rnd.choice(letters) for i in range(size)), rnd.randint(0, 99),
+        rnd.randint(1, 12), rnd.randint(1, 28),
+        ''.join(rnd.choice(letters + '0123456789') for i in range(3)))
+
+
+def random_uuid(rnd):
+    return '-'.join(''.join(rnd.choice('0123456789ABCDEF') for i in range(n))
+                    for n in (8, 4, 4, 4, 12))
+
+
+def generate_cfdi(rnd, docType, percepciones=10, doctos=3, traslados=3, uuids=None):
+    """
+    Devuelve el texto de un CFDi 3.3 sintético del tipo indicado.
+    percepciones, doctos y traslados controlan el número de elementos
+    nomina12:Percepcion, pago10:DoctoRelacionado y conceptos con cfdi:Traslados.
+    uuids es una lista de UUID de facturas previas para los DoctoRelacionado.
+    """
+    uuid = random_uuid(rnd)
+    fecha = "2018-{:02d}-{:02d}T{:02d}:00:00".format(
+        rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23))
+    emisor = '<cfdi:Emisor Rfc="{}" Nombre="Emisor {}, S.A. de C.V." RegimenFiscal="601"/>'.format(
+        random_rfc(rnd), rnd.randint(1, 999))
+    uso = {'N': 'P01', 'P': 'P01'}.get(docType, 'G03')
+    receptor = '<cfdi:Receptor Rfc="{}" Nombre="Receptor {}" UsoCFDI="{}"/>'.format(
+        random_rfc(rnd, docType == 'N'), rnd.randint(1, 999), uso)
+    timbre = ('<tfd:TimbreFiscalDigital Version="1.1" UUID="{}" FechaTimbrado="{}" '
+              'RfcProvCertif="SAT970701NN3" SelloCFD="A" NoCertificadoSAT="1" SelloSAT="B"/>').format(uuid, fecha)
+    complemento = ''
+    conceptos = []
+    subTotal = 0.0
+    descuento = 0.0
+    iva = 0.0
+    metodo = rnd.choice(('PUE', 'PPD'))
+
+    if docType in ('I', 'E'):
+        for i in range(max(traslados, 1)):
+            importe = round(rnd.uniform(10, 5000), 2)
+            impuesto = round(importe * 0.16, 2)
+            subTotal += importe
+            iva += impuesto
+            conceptos.append(
+                '<cfdi:Concepto ClaveProdServ="01010101" Cantidad="1" ClaveUnidad="H87" '
+                'Descripcion="Concepto {0}" ValorUnitario="{1:.2f}" Importe="{1:.2f}">'
+                '<cfdi:Impuestos><cfdi:Traslados><cfdi:Traslado Base="{1:.2f}" Impuesto="002" '
+                'TipoFactor="Tasa" TasaOCuota="0.160000" Importe="{2:.2f}"/></cfdi:Traslados>'
+                '</cfdi:Impuestos></cfdi:Concepto>'.format(i, importe, impuesto))
+        impuestos = ('<cfdi:Impuestos TotalImpuestosTrasladados="{0:.2f}"><cfdi:Traslados>'
+                     '<cfdi:Traslado Impuesto="002" TipoFactor="Tasa" TasaOCuota="0.160000" '
+                     'Importe="{0:.2f}"/></cfdi:Traslados></cfdi:Impuestos>').format(iva)
+        total = subTotal + iva
+    elif docType == 'P':
+        metodo = None
+        total = 0.0
+        impuestos = ''
+        conceptos.append('<cfdi:Concepto ClaveProdServ="84111506" Cantidad="1" ClaveUnidad="ACT" '
+                         'Descripcion="Pago" ValorUnitario="0" Importe="0"/>')
+        docs = []
+        monto = 0.0
+        for i in range(max(doctos, 1)):
+            pagado = round(rnd.uniform(10, 5000), 2)
+            monto += pagado
+            docto = uuids[rnd.randrange(len(uuids))] if uuids else random_uuid(rnd)
+            docs.append('<pago10:DoctoRelacionado IdDocumento="{}" MonedaDR="MXN" MetodoDePagoDR="PPD" '
+                        'NumParcialidad="1" ImpSaldoAnt="{:.2f}" ImpPagado="{:.2f}" '
+                        'ImpSaldoInsoluto="0.00"/>'.format(docto, pagado, pagado))
+        complemento = ('<pago10:Pagos Version="1.0"><pago10:Pago FechaPago="{}" FormaDePago="03" '
+                       'MonedaP="MXN" Monto="{:.2f}" NumOperacion="1">{}</pago10:Pago>'
+                       '</pago10:Pagos>').format(fecha, monto, ''.join(docs))
+    else:
+        metodo = 'PUE'
+        impuestos = ''
+        pers = []
+        totalPer = 0.0
+        for i in range(max(percepciones, 1)):
+            importe = round(rnd.uniform(10, 3000), 2)
+            totalPer += importe
+            pers.append('<nomina12:Percepcion TipoPercepcion="{0:03d}" Clave="{0:03d}" Concepto="P{0}" '
+                        'ImporteGravado="{1:.2f}" ImporteExento="0.00"/>'.format(i + 1, importe))
+        isr = round(totalPer * 0.1, 2)
+        imss = round(totalPer * 0.03, 2)
+        descuento = isr + imss
+        subTotal = totalPer
+        total = subTotal - descuento
+        complemento = (
+            '<nomina12:Nomina Version="1.2" TipoNomina="O" FechaPago="{0}" FechaInicialPago="{0}" '
+            'FechaFinalPago="{0}" NumDiasPagados="15" TotalPercepciones="{1:.2f}" '
+            'TotalDeducciones="{2:.2f}" TotalOtrosPagos="0.00">'
+            '<nomina12:Emisor RegistroPatronal="A0000000000"/>'
+            '<nomina12:Receptor Curp="XEXX010101HNEXXXA4" NumSeguridadSocial="1" NumEmpleado="E{3}" '
+            'TipoContrato="01" TipoRegimen="02" PeriodicidadPago="04" ClaveEntFed="JAL" '
+            'SalarioDiarioIntegrado="300.00"/>'
+            '<nomina12:Percepciones TotalSueldos="{1:.2f}" TotalGravado="{1:.2f}" TotalExento="0.00">{4}'
+            '</nomina12:Percepciones>'
+            '<nomina12:Deducciones TotalOtrasDeducciones="{5:.2f}" TotalImpuestosRetenidos="{6:.2f}">'
+            '<nomina12:Deduccion TipoDeduccion="002" Clave="002" Concepto="ISR" Importe="{6:.2f}"/>'
+            '<nomina12:Deduccion TipoDeduccion="001" Clave="001" Concepto="IMSS" Importe="{5:.2f}"/>'
+            '</nomina12:Deducciones></nomina12:Nomina>').format(
+                fecha[:10], totalPer, descuento, rnd.randint(1, 9999), ''.join(pers), imss, isr)
+        conceptos.append('<cfdi:Concepto ClaveProdServ="84111505" Cantidad="1" ClaveUnidad="ACT" '
+                         'Descripcion="Pago de nómina" ValorUnitario="{0:.2f}" Importe="{0:.2f}" '
+                         'Descuento="{1:.2f}"/>'.format(subTotal, descuento))
+
+    attrs = 'Version="3.3" Serie="A" Folio="{}" Fecha="{}" SubTotal="{:.2f}" Moneda="{}" Total="{:.2f}" ' \
+            'TipoDeComprobante="{}" LugarExpedicion="45000"'.format(
+                rnd.randint(1, 99999), fecha, subTotal, 'XXX' if docType == 'P' else 'MXN', total, docType)
+    if descuento:
+        attrs += ' Descuento="{:.2f}"'.format(descuento)
+    if metodo:
+        attrs += ' MetodoPago="{}" FormaPago="03"'.format(metodo)
+    xml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<cfdi:Comprobante {} {}>{}{}<cfdi:Conceptos>{}</cfdi:Conceptos>{}'
+           '<cfdi:Complemento>{}{}</cfdi:Complemento></cfdi:Comprobante>\n').format(
+               NS, attrs, emisor, receptor, ''.join(conceptos), impuestos, complemento, timbre)
+    return uuid, xml
+
+
+def generate_corpus(directory, count, types='IEPN', percepciones=10, doctos=3,
+                    traslados=3, pdf=True, seed=1):
+    """
+    Genera count archivos XML sintéticos (con su PDF vacío) en el directorio.
+    Si el directorio ya contiene un corpus con los mismos parámetros no se
+    vuelve a generar. Devuelve la lista de archivos XML.
+    """
+    params = [count, types, percepciones, doctos, traslados, pdf, seed]
+    marker = os.path.join(directory, CORPUS_MARKER)
+    if os.path.isfile(marker):
+        f = open(marker)
+        same = json.load(f) == params
+        f.close()
+        if same:
+            return find_xml_files(directory)
+        shutil.rmtree(directory)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    rnd = random.Random(seed)
+    uuids = []
+    for i in range(count):
+        docType = types[i % len(types)]
+        uuid, xml = generate_cfdi(rnd, docType, percepciones, doctos, traslados, uuids[-100:])
+        if docType == 'I':
+            uuids.append(uuid)
+        name = os.path.join(directory, "cfdi_{:07d}".format(i))
+        f = open(name + '.xml', 'w')
+        f.write(xml)
+        f.close()
+        if pdf:
+            open(name + '.pdf', 'w').close()
+    f = open(marker, 'w')
+    json.dump(params, f)
+    f.close()
+    return find_xml_files(directory)
+
+
+def run_benchmark(fileNames, directory, parser=DEFAULT_PARSER, workers=None):
+    """
+    Mide las etapas sobre los archivos del corpus y devuelve un diccionario
+    etapa -> segundos. El renombrado se deshace al terminar para conservar
+    el corpus.
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    cfdis = []
+    for fileName in fileNames:
+        cfdi = CFDi(fileName, 'B', parser, instrument=True)
+        for stage, seconds in cfdi.timings.items():
+            timings[stage] += seconds
+        cfdi.release()
+        cfdis.append(cfdi)
+
+    start = time.time()
+    csvName = os.path.join(tempfile.gettempdir(), 'ren_cfdi_bench.csv')
+    report = CsvReportWriter(csvName)
+    for cfdi in cfdis:
+        report.write(cfdi.values, cfdi.fileName)
+    report.close()
+    os.remove(csvName)
+    timings['csv'] = time.time() - start
+
+    start = time.time()
+    index = RenameIndex()
+    for cfdi in cfdis:
+        index.add(cfdi)
+    journal = os.path.join(directory, '.ren_cfdi_bench_journal')
+    index.plan().apply(journal)
+    timings['rename'] = time.time() - start
+    undo_journal(journal)
+
+    batch = BatchProcessor('B', workers=workers, parser=parser)
+    for cfdi in batch.run(fileNames):
+        pass
+    timings['batch'] = batch.elapsed
+    return timings
+
+
+def print_results(results, baseline=None, out=sys.stdout):
+    """
+    Imprime los tiempos por tamaño de corpus y etapa, y la variación
+    respecto a la referencia si existe.
+    """
+    for size in sorted(results, key=int):
+        out.write("Corpus de {} archivos\n".format(size))
+        base = (baseline or {}).get(size, {})
+        for stage in STAGES:
+            seconds = results[size][stage]
+            line = "  {:<8} {:>9.3f} s {:>10.1f} archivos/s".format(
+                stage, seconds, int(size) / seconds if seconds else 0)
+            if base.get(stage):
+                line += "  ({:+.1f}% vs referencia)".format((seconds / base[stage] - 1) * 100)
+            out.write(line + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento de ren_cfdi")
+    parser.add_argument('--sizes', default='1000', help="Tamaños de corpus separados por coma")
+    parser.add_argument('--dir', default=os.path.join(tempfile.gettempdir(), 'ren_cfdi_corpus'),
+                        help="Directorio base de los corpus generados")
+    parser.add_argument('--types', default='IEPN', help="Tipos de comprobante a generar")
+    parser.add_argument('--percepciones', type=int, default=10)
+    parser.add_argument('--doctos', type=int, default=3)
+    parser.add_argument('--traslados', type=int, default=3)
+    parser.add_argument('--parser', default=DEFAULT_PARSER, choices=PARSERS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--baseline', default=BASELINE_NAME, help="Archivo de referencia")
+    parser.add_argument('--save', action='store_true', help="Guardar los resultados como referencia")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in args.sizes.split(','):
+        directory = os.path.join(args.dir, size)
+        fileNames = generate_corpus(directory, int(size), args.types, args.percepciones,
+                                    args.doctos, args.traslados)
+        results[size] = run_benchmark(fileNames, directory, args.parser, args.workers)
+
+    baseline = None
+    if os.path.isfile(args.baseline):
+        f = open(args.baseline)
+        baseline = json.load(f).get('results')
+        f.close()
+    print_results(results, baseline)
+
+    if args.save:
+        f = open(args.baseline, 'w')
+        json.dump({
+            'python': platform.python_version(),
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'parser': args.parser,
+            'results': results,
+        }, f, indent=1, sort_keys=True)
+        f.close()
+
+
+if __name__ == "__main__":
+    main()
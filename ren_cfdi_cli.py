@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_cli.py
+Descripción         : Procesador de CFDi desde la línea de comandos
+                      Lee los XML de directorios, archivos o rutas recibidas por
+                      la entrada estándar y escribe una línea JSON por CFDi en
+                      cuanto se procesa, sin interfaz gráfica (sin Tkinter)
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Script independiente de la interfaz
+                      - Procesar un directorio (y sus subdirectorios):
+                      python ren_cfdi_cli.py /ruta/cfdi > cfdi.jsonl
+                      - Archivos sueltos, ZIP y folio:
+                      python ren_cfdi_cli.py --folio 7 --zip a.xml b.xml lote.zip
+                      - Rutas desde la entrada estándar ('-'):
+                      find /ruta -name '*.xml' | python ren_cfdi_cli.py -
+                      - Sólo algunos campos y CFDi (ver ren_cfdi_filter.py):
+                      python ren_cfdi_cli.py --campos uuid,total --filtro tipo=I /ruta
+                      - Cada línea es un objeto JSON con 'archivo' y los values del
+                      CFDi; los archivos no válidos se escriben en la salida de
+                      errores (también como JSON) y el código de salida es 1.
+'''
+import os
+import sys
+import json
+import time
+import errno
+import Queue
+import argparse
+import threading
+from ren_cfdi import VALUE_FIELDS
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_scan import scan_directory
+from ren_cfdi_archive import is_archive, list_members
+from ren_cfdi_filter import parse_filter
+from ren_cfdi_rules import load_rules, find_rules
+from ren_cfdi_errors import QUARANTINE_NAME
+from ren_cfdi_stats import Stats
+
+# Número máximo de rutas de la entrada estándar que se procesan juntas
+STDIN_BATCH = 500
+# Segundos que una ruta de la entrada estándar espera a que se complete su grupo
+STDIN_WAIT = 0.2
+# Segundos de cada espera de la entrada estándar sin rutas pendientes
+STDIN_IDLE = 1.0
+# Con menos archivos no se crean procesos trabajadores
+MIN_PARALLEL = 50
+
+
+def expand_paths(paths, archives=False):
+    """
+    Generador de tuplas (lista de XML, {archivo: (tamaño, fecha)}) a partir de
+    directorios, archivos XML o ZIP; '-' lee las rutas de la entrada estándar
+    (ver read_stdin_groups) sin esperar a que termine.
+    """
+    fileNames = []
+    for path in paths:
+        if path == '-':
+            if fileNames:
+                yield fileNames, None
+                fileNames = []
+            for group in read_stdin_groups(archives):
+                yield group, None
+        elif os.path.isdir(path):
+            if fileNames:
+                yield fileNames, None
+                fileNames = []
+            scan = scan_directory(path, archives, exclude=(QUARANTINE_NAME,))
+            yield scan.fileNames, scan.stats
+        else:
+            fileNames.extend(expand_file(path, archives))
+    if fileNames:
+        yield fileNames, None
+
+
+def read_stdin_lines(lines):
+    """
+    Lee la entrada estándar línea por línea (sin el búfer de lectura
+    anticipada de 'for line in sys.stdin') y pone cada línea en la cola;
+    None indica el fin de la entrada.
+    """
+    for line in iter(sys.stdin.readline, ''):
+        lines.put(line)
+    lines.put(None)
+
+
+def read_stdin_groups(archives=False):
+    """
+    Generador de listas de XML con las rutas de la entrada estándar. Un
+    grupo se entrega al llegar a STDIN_BATCH archivos o cuando su primera
+    ruta lleva STDIN_WAIT segundos esperando, para que cada CFDi se escriba
+    poco después de recibir su ruta aunque la entrada llegue lentamente.
+    """
+    lines = Queue.Queue()
+    reader = threading.Thread(target=read_stdin_lines, args=(lines,))
+    reader.daemon = True
+    reader.start()
+    fileNames = []
+    deadline = None
+    while True:
+        # Con timeout la espera se puede interrumpir con Ctrl+C
+        timeout = STDIN_IDLE if deadline is None else max(deadline - time.time(), 0)
+        try:
+            line = lines.get(True, timeout)
+        except Queue.Empty:
+            if fileNames:
+                yield fileNames
+                fileNames = []
+            deadline = None
+            continue
+        if line is None:
+            break
+        line = line.strip()
+        if line:
+            fileNames.extend(expand_file(line, archives))
+        if fileNames and deadline is None:
+            deadline = time.time() + STDIN_WAIT
+        if len(fileNames) >= STDIN_BATCH:
+            yield fileNames
+            fileNames = []
+            deadline = None
+    if fileNames:
+        yield fileNames
+
+
+def expand_file(fileName, archives=False):
+    """
+    Devuelve la lista de XML de un archivo: el propio archivo, o los XML
+    que contiene si es un ZIP y archives=True.
+    """
+    if archives and is_archive(fileName):
+        try:
+            return list_members(fileName)
+        except Exception as e:
+            write_error(fileName, e.__class__.__name__, str(e))
+            return []
+    return [fileName]
+
+
+def write_error(fileName, kind, detail):
+    """
+    Escribe un error en la salida de errores como objeto JSON.
+    """
+    error = {'archivo': fileName, 'error': kind, 'detalle': detail}
+    sys.stderr.write(json.dumps(error, sort_keys=True) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Procesa CFDi y escribe una línea JSON por CFDi')
+    parser.add_argument('paths', nargs='+', help="Directorios, archivos XML o ZIP ('-': entrada estándar)")
+    parser.add_argument('--folio', default='', help='Folio (prefijo) del nombre de archivo')
+    parser.add_argument('--zip', action='store_true', help='Leer también los XML contenidos en ZIP')
+    parser.add_argument('--campos', default='',
+                        help='Campos de values separados por comas (por omisión todos)')
+    parser.add_argument('--filtro', default='', help="Filtro, por ejemplo 'tipo=P fecha=2018-09'")
+    parser.add_argument('--reglas', help='Archivo de reglas de nómina (INI o JSON)')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Número de procesos (por omisión uno por CPU)')
+    parser.add_argument('--estadisticas', action='store_true',
+                        help='Escribir el resumen de tiempos en la salida de errores')
+    args = parser.parse_args()
+
+    try:
+        fields = [f.strip() for f in args.campos.split(',') if f.strip()]
+        for field in fields:
+            if field not in VALUE_FIELDS:
+                raise ValueError('Campo no soportado: %s' % field)
+        cfdiFilter = parse_filter(args.filtro)
+        rules = load_rules(args.reglas) if args.reglas else find_rules()
+    except (ValueError, IOError) as e:
+        parser.error(str(e))
+
+    stats = Stats() if args.estadisticas else None
+    errors = 0
+    out = sys.stdout
+    try:
+        for fileNames, fileStats in expand_paths(args.paths, args.zip):
+            workers = 1 if len(fileNames) < MIN_PARALLEL else args.procesos
+            batch = BatchProcessor(args.folio.upper(), workers=workers, outputs=fields or None,
+                                   stats=stats, cfdi_filter=cfdiFilter, rules=rules)
+            for cfdi in batch.run(fileNames, fileStats):
+                values = cfdi.values.as_dict()
+                if fields:
+                    values = dict((field, values.get(field)) for field in fields)
+                values['archivo'] = cfdi.fileName
+                out.write(json.dumps(values, sort_keys=True) + '\n')
+                out.flush()
+            for error in batch.errors:
+                write_error(error.fileName, error.kind, error.detail)
+            errors += len(batch.errors)
+    except IOError as e:
+        # La salida se cerró (por ejemplo '| head')
+        if e.errno != errno.EPIPE:
+            raise
+        return 0
+    except KeyboardInterrupt:
+        return 130
+    if stats:
+        sys.stderr.write(stats.summary() + '\n')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
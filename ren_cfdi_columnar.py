@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_columnar.py
+Descripción         : Tabla en memoria por columnas de los CFDi de un lote
+                      Los importes se guardan en arreglos de números y los
+                      textos (RFC, tipo, UUID...) codificados por diccionario,
+                      para ordenar, eliminar duplicados y totalizar sin
+                      recorrer instancias CFDi
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo que se puede usar después de un lote
+                      - Importar:
+                      from ren_cfdi_columnar import CFDiBatch
+                      - Llenar con los CFDi del lote:
+                      table = CFDiBatch()
+                      table.extend(batch.run(find_xml_files(directorio)))
+                      - Totales y desglose de impuestos por RFC emisor:
+                      table.sum('total')
+                      table.group_sum('total', 'rfce')
+                      table.tax_breakdown('rfce')
+                      - Ordenar y eliminar duplicados (por UUID):
+                      table.order('total', reverse=True)
+                      unique = table.take(table.first_by('uuid'))
+                      - Con NumPy instalado las operaciones son vectoriales y
+                      column() devuelve un numpy.ndarray (una copia, que no
+                      cambia al agregar filas).
+'''
+from array import array
+from ren_cfdi_aggregate import to_amount
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Importes de values guardados como números (array 'd')
+NUMERIC_FIELDS = (
+    'subtotal', 'descuento', 'total', 'traslados', 'isr_t', 'iva_t', 'ieps_t',
+    'retenciones', 'isr_r', 'iva_r', 'monto', 'per_f', 'op_f', 'ded_f',
+    'ded_isr', 'neto_f',
+)
+TAX_FIELDS = ('traslados', 'isr_t', 'iva_t', 'ieps_t', 'retenciones', 'isr_r', 'iva_r')
+
+# Textos codificados por diccionario; 'periodo' es AAAA-MM de la fecha
+CATEGORY_FIELDS = ('tipo', 'rfce', 'rfcr', 'uso_cfdi', 'mpago', 'periodo', 'uuid')
+
+
+class StringColumn(object):
+    """
+    Columna de textos codificada por diccionario: cada fila guarda el código
+    (array 'i') de su valor en la lista labels.
+    """
+    def __init__(self):
+        self.codes = array('i')
+        self.labels = []
+        self.index = {}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.labels)
+            self.labels.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, i):
+        return self.labels[self.codes[i]]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class CFDiBatch(object):
+    """
+    Tabla por columnas de los values de los CFDi de un lote (una fila por
+    CFDi, en el orden en que se agregan). Las filas se identifican por su
+    posición; take() devuelve una tabla nueva con las filas indicadas.
+    """
+    def __init__(self):
+        self.numbers = dict((field, array('d')) for field in NUMERIC_FIELDS)
+        self.strings = dict((field, StringColumn()) for field in CATEGORY_FIELDS)
+        self.fechas = []
+        self.fileNames = []
+
+    def __len__(self):
+        return len(self.fileNames)
+
+    def append(self, values, fileName=''):
+        """
+        Agrega una fila con los values de un CFDi.
+        """
+        for field in NUMERIC_FIELDS:
+            self.numbers[field].append(to_amount(values.get(field)))
+        fecha = values.get('fecha') or ''
+        for field in CATEGORY_FIELDS:
+            if field == 'periodo':
+                value = fecha[:7]
+            else:
+                value = values.get(field) or ''
+            self.strings[field].append(value)
+        self.fechas.append(fecha)
+        self.fileNames.append(fileName)
+
+    def extend(self, cfdis):
+        """
+        Agrega una fila por cada instancia CFDi.
+        """
+        for cfdi in cfdis:
+            self.append(cfdi.values, cfdi.fileName)
+
+    def row(self, i):
+        """
+        Devuelve el diccionario de valores de la fila i.
+        """
+        data = dict((field, self.numbers[field][i]) for field in NUMERIC_FIELDS)
+        data.update((field, self.strings[field][i]) for field in CATEGORY_FIELDS)
+        data['fecha'] = self.fechas[i]
+        data['fileName'] = self.fileNames[i]
+        return data
+
+    def column(self, field):
+        """
+        Devuelve la columna de importes (o de códigos, para los textos) como
+        numpy.ndarray, o el array sin NumPy. El ndarray es una copia: una vista
+        sobre el array quedaría inválida si append() lo cambia de lugar.
+        """
+        if field in self.numbers:
+            data = self.numbers[field]
+        else:
+            data = self.strings[field].codes
+        if numpy is None:
+            return data
+        dtype = numpy.float64 if data.typecode == 'd' else numpy.intc
+        if not len(data):
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.frombuffer(data, dtype=dtype).copy()
+
+    def labels(self, field):
+        """
+        Devuelve la lista de valores distintos (en orden de código) de una
+        columna de textos.
+        """
+        return self.strings[field].labels
+
+    def sum(self, field):
+        """
+        Devuelve la suma de una columna de importes.
+        """
+        if numpy is None:
+            return sum(self.numbers[field])
+        return float(self.column(field).sum())
+
+    def group_sum(self, field, by):
+        """
+        Devuelve el diccionario {valor de by: suma de field}.
+        """
+        return dict((label, sums[0]) for label, sums in self.group_sums((field,), by).items())
+
+    def group_sums(self, fields, by):
+        """
+        Devuelve el diccionario {valor de by: [suma de cada campo de fields]}.
+        """
+        labels = self.labels(by)
+        if numpy is not None:
+            codes = self.column(by)
+            sums = [numpy.bincount(codes, weights=self.column(field), minlength=len(labels))
+                    for field in fields]
+            return dict((label, [float(s[code]) for s in sums])
+                        for code, label in enumerate(labels))
+        sums = [[0.] * len(fields) for label in labels]
+        codes = self.strings[by].codes
+        for j, field in enumerate(fields):
+            data = self.numbers[field]
+            for i, code in enumerate(codes):
+                sums[code][j] += data[i]
+        return dict(zip(labels, sums))
+
+    def tax_breakdown(self, by='rfce'):
+        """
+        Devuelve el diccionario {valor de by: {impuesto: suma}} con los
+        traslados y retenciones por impuesto (ver TAX_FIELDS).
+        """
+        return dict((label, dict(zip(TAX_FIELDS, sums)))
+                    for label, sums in self.group_sums(TAX_FIELDS, by).items())
+
+    def select(self, field, value):
+        """
+        Devuelve la lista de filas cuyo texto en field es igual a value.
+        """
+        code = self.strings[field].index.get(value)
+        if code is None:
+            return []
+        if numpy is not None:
+            return numpy.flatnonzero(self.column(field) == code).tolist()
+        return [i for i, c in enumerate(self.strings[field].codes) if c == code]
+
+    def order(self, field, reverse=False):
+        """
+        Devuelve la lista de filas ordenadas por un importe o un texto
+        (orden estable).
+        """
+        if field in self.numbers:
+            keys = self.column(field)
+        else:
+            # Rango alfabético de cada código
+            labels = self.labels(field)
+            ranks = [0] * len(labels)
+            for rank, code in enumerate(sorted(range(len(labels)), key=labels.__getitem__)):
+                ranks[code] = rank
+            if numpy is not None:
+                keys = numpy.array(ranks, dtype=numpy.intc)[self.column(field)]
+            else:
+                keys = [ranks[code] for code in self.strings[field].codes]
+        if numpy is not None:
+            keys = -keys if reverse else keys
+            return numpy.argsort(keys, kind='mergesort').tolist()
+        return sorted(range(len(self)), key=keys.__getitem__, reverse=reverse)
+
+    def first_by(self, field='uuid'):
+        """
+        Devuelve la lista ordenada de filas con la primera aparición de cada
+        valor de field (por ejemplo para eliminar CFDi duplicados por UUID).
+        """
+        if numpy is not None:
+            return sorted(numpy.unique(self.column(field), return_index=True)[1].tolist())
+        seen = set()
+        rows = []
+        for i, code in enumerate(self.strings[field].codes):
+            if code not in seen:
+                seen.add(code)
+                rows.append(i)
+        return rows
+
+    def take(self, rows):
+        """
+        Devuelve una nueva tabla con las filas indicadas, en ese orden.
+        """
+        table = CFDiBatch()
+        for field in NUMERIC_FIELDS:
+            data = self.numbers[field]
+            table.numbers[field] = array('d', [data[i] for i in rows])
+        for field in CATEGORY_FIELDS:
+            column = self.strings[field]
+            for i in rows:
+                table.strings[field].append(column[i])
+        table.fechas = [self.fechas[i] for i in rows]
+        table.fileNames = [self.fileNames[i] for i in rows]
+        return table
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_errors.py
+Descripción         : Manejo de los CFDi no válidos de un lote
+                      Reporte de errores y cuarentena de los archivos
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_errors import quarantine, write_errors
+                      - Después del lote (ver BatchProcessor.errors), primero
+                      el reporte, para conservarlo aunque falle la cuarentena:
+                      write_errors(nombre_archivo_csv, batch.errors)
+                      moved, failed = quarantine(batch.errors, directorio, scan=scan)
+                      write_errors(nombre_archivo_csv, batch.errors, moved, failed)
+'''
+import os
+import csv
+from ren_cfdi_report import to_cell
+from ren_cfdi_archive import is_member
+
+ERRORS_REPORT_NAME = 'errorescfdi.csv'
+QUARANTINE_NAME = 'cuarentena'
+
+
+def quarantine(errors, directory, folder=QUARANTINE_NAME, scan=None):
+    """
+    Mueve los archivos con error (y su PDF) a la carpeta de cuarentena dentro
+    del directorio, conservando su ruta relativa. Los XML dentro de un ZIP no
+    se mueven. Con scan (ren_cfdi_scan.ScanResult) se mueve el PDF que éste
+    relaciona con el XML (con cualquier mayúscula en la extensión); sin él,
+    el '.pdf' con el mismo nombre. Un archivo que no se puede mover (carpeta
+    de sólo lectura, otra unidad, etc.) no detiene a los demás. Devuelve los
+    diccionarios {archivo: ruta en cuarentena} y {archivo: error al moverlo}.
+    """
+    target = os.path.join(directory, folder)
+    moved = {}
+    failed = {}
+    for error in errors:
+        fileName = error.fileName
+        if is_member(fileName) or not os.path.isfile(fileName):
+            continue
+        relative = os.path.relpath(fileName, directory)
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(fileName)
+        newFileName = os.path.join(target, relative)
+        if os.path.exists(newFileName):
+            failed[fileName] = "{} ya existe en cuarentena".format(newFileName)
+            continue
+        try:
+            if not os.path.isdir(os.path.dirname(newFileName)):
+                os.makedirs(os.path.dirname(newFileName))
+            os.rename(fileName, newFileName)
+        except OSError as e:
+            failed[fileName] = str(e)
+            continue
+        moved[fileName] = newFileName
+        if scan:
+            pdf = scan.pdf_for(fileName)
+        else:
+            pdf = "{}.pdf".format(os.path.splitext(fileName)[0])
+        if not pdf:
+            continue
+        newPdf = os.path.splitext(newFileName)[0] + os.path.splitext(pdf)[1]
+        if os.path.isfile(pdf) and not os.path.exists(newPdf):
+            try:
+                os.rename(pdf, newPdf)
+            except OSError as e:
+                failed[fileName] = "PDF {}: {}".format(pdf, e)
+    return moved, failed
+
+
+def write_errors(fileName, errors, moved=None, failed=None):
+    """
+    Escribe el reporte CSV de archivos con error: archivo, tipo de error,
+    detalle, ruta en cuarentena (si se movió) y error al moverlo (si falló).
+    """
+    moved = moved or {}
+    failed = failed or {}
+    f = open(fileName, 'wb')
+    writer = csv.writer(f, lineterminator='\n')
+    writer.writerow(['Archivo', 'Error', 'Detalle', 'Cuarentena', 'Error de cuarentena'])
+    for error in errors:
+        writer.writerow([to_cell(error.fileName), to_cell(error.kind),
+                         to_cell(error.detail), to_cell(moved.get(error.fileName, '')),
+                         to_cell(failed.get(error.fileName, ''))])
+    f.close()
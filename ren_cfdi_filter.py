@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_filter.py
+Descripción         : Filtro de CFDi para los lotes
+                      Cada criterio se evalúa en la primera etapa que lo puede
+                      decidir: el nombre del archivo (ya renombrado), el texto
+                      del XML (con mmap, sin construir el DOM) o los values
+                      obtenidos por la clase CFDi
+Fecha (creación)    : 16/10/2026
+Versión             : 1.1
+Uso                 : Módulo utilizado por ren_cfdi_batch.py
+                      - Importar:
+                      from ren_cfdi_filter import CFDiFilter, read_header
+                      - Leer el encabezado de un XML:
+                      read_header(nombre_archivo_xml)
+                      - Procesar sólo los CFDi de nómina de un receptor:
+                      cfdi_filter = CFDiFilter(tipos='N', rfcr='XAXX010101000')
+                      batch = BatchProcessor(prefijo, cfdi_filter=cfdi_filter)
+                      - Filtro en texto (interfaz): campo=valor[,valor] separados
+                      por espacios; campos tipo, rfce, rfcr, desde, hasta,
+                      fecha (desde y hasta), uso y mpago:
+                      cfdi_filter = parse_filter('tipo=P rfce=AAA010101AAA fecha=2018-09')
+                      - Los archivos en los que no se encuentra el dato en el
+                      texto se procesan completos y se filtran por sus values.
+'''
+import re
+import os
+import mmap
+
+# Campos que se pueden obtener del texto del XML (mismas llaves que values)
+HEADER_FIELDS = ('tipo', 'fecha', 'rfce', 'rfcr', 'uso_cfdi', 'mpago', 'uuid')
+
+# Contenido de una etiqueta de apertura respetando '>' dentro de comillas
+TAG_BODY = r'\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>'
+TAG_RES = {
+    'comprobante': re.compile(r'<cfdi:Comprobante' + TAG_BODY),
+    'emisor': re.compile(r'<cfdi:Emisor' + TAG_BODY),
+    'receptor': re.compile(r'<cfdi:Receptor' + TAG_BODY),
+    'timbre': re.compile(r'<tfd:TimbreFiscalDigital' + TAG_BODY),
+}
+ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Campo: (etiqueta, atributo)
+HEADER_ATTRIBUTES = {
+    'tipo': ('comprobante', 'TipoDeComprobante'),
+    'fecha': ('comprobante', 'Fecha'),
+    'rfce': ('emisor', 'Rfc'),
+    'rfcr': ('receptor', 'Rfc'),
+    'uso_cfdi': ('receptor', 'UsoCFDI'),
+    'mpago': ('comprobante', 'MetodoPago'),
+    'uuid': ('timbre', 'UUID'),
+}
+# Valor en values cuando la etiqueta existe pero no tiene el atributo
+HEADER_DEFAULTS = {'rfce': '', 'rfcr': '', 'uso_cfdi': '', 'mpago': '-'}
+
+# Nombre generado por CFDi.set_name(): termina en '_{tipo}{versión}' y para
+# los tipos I, E y T en '_{uso_cfdi}_{mpago}_{tipo}{versión}'
+NAME_RE = re.compile(r'^T[^_]*-[0-9A-Fa-f]{4}_.*?'
+                     r'(?:_([A-Z0-9]{2,4}|NA)?_(PUE|PPD|-)(?=_[IET]))?_([IETNP])\d+\.\d+$')
+
+ENTITIES = (('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&apos;', "'"), ('&amp;', '&'))
+
+
+def to_text(value):
+    """
+    Convierte un valor a unicode (los str se leen como UTF-8) para comparar
+    y pasar a mayúsculas también los caracteres no ASCII, como la Ñ del RFC.
+    """
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def unescape(value):
+    """
+    Sustituye las entidades de XML de un atributo; devuelve None si contiene
+    referencias a caracteres (&#...;), que se dejan al lector completo.
+    """
+    for entity, char in ENTITIES:
+        value = value.replace(entity, char)
+    if '&#' in value:
+        return None
+    return value
+
+
+def read_header(fileName, data=None, fields=HEADER_FIELDS):
+    """
+    Devuelve el diccionario {campo: valor} de los campos solicitados leídos
+    del texto del XML (data o el archivo mapeado en memoria). Los campos que
+    no se encuentran quedan en None.
+    """
+    header = dict.fromkeys(fields)
+    if data is not None:
+        return parse_header(data, header)
+    f = open(fileName, 'rb')
+    try:
+        if not os.fstat(f.fileno()).st_size:
+            return header
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return parse_header(data, header)
+        finally:
+            data.close()
+    finally:
+        f.close()
+
+
+def parse_header(data, header):
+    """
+    Busca en data (str o mmap) los atributos de los campos de header.
+    """
+    tags = {}
+    for field in header:
+        tag, attribute = HEADER_ATTRIBUTES[field]
+        if tag not in tags:
+            match = TAG_RES[tag].search(data)
+            attributes = {}
+            if match:
+                for m in ATTR_RE.finditer(match.group(1)):
+                    value = m.group(2) if m.group(2) is not None else m.group(3)
+                    attributes[m.group(1)] = value
+            tags[tag] = attributes if match else None
+        if tags[tag] is None:
+            continue
+        value = tags[tag].get(attribute)
+        if value is not None:
+            value = unescape(to_text(value))
+        elif field in HEADER_DEFAULTS:
+            value = HEADER_DEFAULTS[field]
+        header[field] = value
+    return header
+
+
+def read_name(fileName):
+    """
+    Devuelve el diccionario {campo: valor} de los campos que indica el nombre
+    de un archivo ya renombrado por CFDi.set_name() (tipo y, para I, E y T,
+    uso_cfdi y mpago), o un diccionario vacío si el nombre no tiene ese formato.
+    """
+    name = os.path.splitext(os.path.basename(fileName))[0]
+    match = NAME_RE.match(name)
+    if not match:
+        return {}
+    uso, mpago, tipo = match.groups()
+    fields = {'tipo': tipo}
+    if mpago is not None:
+        fields['uso_cfdi'] = uso or ''
+        fields['mpago'] = mpago
+    return fields
+
+
+def to_set(value):
+    """
+    Convierte un valor o una lista de valores en un conjunto (unicode) en
+    mayúsculas.
+    """
+    if value is None:
+        return None
+    if isinstance(value, basestring):
+        value = value.split(',')
+    return frozenset(to_text(x).strip().upper() for x in value if x.strip()) or None
+
+
+# Criterios de CFDiFilter por conjunto de valores: (parámetro, campo de values)
+SET_CRITERIA = (
+    ('tipos', 'tipo'),
+    ('rfce', 'rfce'),
+    ('rfcr', 'rfcr'),
+    ('uso_cfdi', 'uso_cfdi'),
+    ('mpago', 'mpago'),
+)
+
+
+class CFDiFilter(object):
+    """
+    Criterios para seleccionar los CFDi de un lote: tipos de comprobante,
+    RFC emisor, RFC receptor, UsoCFDI, MetodoPago (un valor o una lista) y
+    rango de fechas (desde/hasta como prefijos de la Fecha, por ejemplo
+    '2018-09'). Los criterios en None no se aplican.
+    Se evalúan en orden: nombre del archivo (read_name), texto del XML
+    (read_header) y values; cada etapa descarta sin pasar a la siguiente.
+    """
+    def __init__(self, tipos=None, rfce=None, rfcr=None, desde=None, hasta=None,
+                 uso_cfdi=None, mpago=None):
+        criteria = {'tipos': tipos, 'rfce': rfce, 'rfcr': rfcr,
+                    'uso_cfdi': uso_cfdi, 'mpago': mpago}
+        self.sets = {}
+        for param, field in SET_CRITERIA:
+            values = to_set(criteria[param])
+            if values is not None:
+                self.sets[field] = values
+        self.desde = to_text(desde) or None
+        self.hasta = to_text(hasta) or None
+
+    def __nonzero__(self):
+        return bool(self.fields())
+
+    def spec(self):
+        """
+        Devuelve los criterios como un diccionario que se puede guardar en
+        JSON, para comparar el filtro de distintas ejecuciones.
+        """
+        spec = dict((field, sorted(values)) for field, values in self.sets.items())
+        if self.desde:
+            spec['desde'] = self.desde
+        if self.hasta:
+            spec['hasta'] = self.hasta
+        return spec
+
+    def fields(self):
+        """
+        Devuelve la lista de campos de values que necesitan los criterios.
+        """
+        fields = [field for param, field in SET_CRITERIA if field in self.sets]
+        if self.desde or self.hasta:
+            fields.append('fecha')
+        return fields
+
+    def check(self, field, value):
+        """
+        Evalúa el criterio del campo; devuelve None si el valor es desconocido.
+        """
+        if value is None:
+            return None
+        value = to_text(value).strip()
+        if field == 'fecha':
+            if self.desde and value[:len(self.desde)] < self.desde:
+                return False
+            if self.hasta and value[:len(self.hasta)] > self.hasta:
+                return False
+            return True
+        return value.upper() in self.sets[field]
+
+    def match(self, data, fields=None):
+        """
+        Evalúa los criterios de fields (todos si no se indica) sobre data.
+        Devuelve False si el CFDi se descarta, True si cumple todos los
+        criterios o None si falta algún dato y debe pasar a la siguiente etapa.
+        """
+        if fields is None:
+            fields = self.fields()
+        result = True
+        for field in fields:
+            checked = self.check(field, data.get(field))
+            if checked is False:
+                return False
+            if checked is None:
+                result = None
+        return result
+
+    def match_header(self, header):
+        """
+        Evalúa los criterios sobre el encabezado obtenido con read_header.
+        """
+        return self.match(header)
+
+    def match_values(self, values):
+        """
+        Evalúa los criterios sobre los values de un CFDi ya procesado.
+        """
+        for field in self.fields():
+            if not self.check(field, values.get(field) or ''):
+                return False
+        return True
+
+    def accepts(self, fileName, data=None):
+        """
+        Filtro previo: devuelve False sólo si el nombre del archivo o el texto
+        del XML muestran que el CFDi no cumple los criterios; en caso de duda
+        devuelve True (se decide con sus values).
+        """
+        fields = self.fields()
+        if not fields:
+            return True
+        nameFields = read_name(fileName)
+        if nameFields:
+            if self.match(nameFields, [f for f in fields if f in nameFields]) is False:
+                return False
+            fields = [f for f in fields if f not in nameFields]
+            if not fields:
+                return True
+        return self.match(read_header(fileName, data, fields), fields) is not False
+
+
+# Campos del filtro en texto: campo -> parámetros de CFDiFilter
+FILTER_KEYWORDS = {
+    'tipo': ('tipos',),
+    'rfce': ('rfce',),
+    'rfcr': ('rfcr',),
+    'uso': ('uso_cfdi',),
+    'mpago': ('mpago',),
+    'desde': ('desde',),
+    'hasta': ('hasta',),
+    'fecha': ('desde', 'hasta'),
+}
+
+
+def parse_filter(text):
+    """
+    Convierte un filtro en texto ('tipo=P,I rfce=AAA010101AAA fecha=2018-09')
+    en un CFDiFilter, o None si el texto está vacío.
+    """
+    params = {}
+    for item in text.split():
+        key, sep, value = item.partition('=')
+        key = key.strip().lower()
+        if not sep or key not in FILTER_KEYWORDS:
+            raise ValueError('Filtro no válido: %s' % item)
+        for param in FILTER_KEYWORDS[key]:
+            params[param] = value.strip()
+    if not params:
+        return None
+    return CFDiFilter(**params)
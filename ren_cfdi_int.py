@@ -7,21 +7,68 @@ Autor               : David Padilla (mods Aztecos)
 Fecha (creación)    : 11/09/2018
 Fecha (modificación): 29/09/2018
 Fecha (modificación): 09/10/2018 Aztecos
-Versión             : 1.5
-Uso                 : Interfaz que utiliza el módulo ren_cfdi.py
+Fecha (modificación): 16/10/2026
+Versión             : 1.7
+Uso                 : Interfaz que utiliza los módulos ren_cfdi.py, ren_cfdi_batch.py
+                      y ren_cfdi_report.py
                       - Ejecutar:
                       python ren_cfdi_int.py
                       - (Opcional) Insertar un folio para el lote de archivos.
                       - Seleccionar carpeta donde se ubican los archivos XML.
+                      - (Opcional) Escribir un 'Filtro' para procesar sólo algunos
+                        CFDi, por ejemplo: tipo=P rfce=AAA010101AAA fecha=2018-09
+                        (campos tipo, rfce, rfcr, desde, hasta, fecha, uso y mpago).
                       - Seleccionar la opción 'CSV' si se requiere un reporte
-                      - Hacer click sobre el botón 'Procesar'
+                        (también genera resumencfdi.csv con los totales por
+                        periodo, tipo y RFC, y conciliacioncfdi.csv con el saldo
+                        de las facturas PPD según los complementos de pago).
+                      - Seleccionar 'SQLite' para agregar los valores de los CFDi
+                        a la base de datos reportecfdi.sqlite del directorio.
+                      - Seleccionar 'ZIP' para leer también los XML contenidos
+                        en archivos ZIP (no se extraen ni se renombran).
+                      - (Opcional) Seleccionar 'Simular' para sólo mostrar los
+                        nombres nuevos sin renombrar.
+                      - (Opcional) Seleccionar 'Estadísticas' para medir el tiempo
+                        de cada etapa (resumen en pantalla y estadisticascfdi.json).
+                      - Hacer click sobre el botón 'Procesar'; el avance se
+                        muestra en la barra de progreso y se puede detener con
+                        el botón 'Cancelar'.
+                      - Las percepciones, deducciones y otros pagos que se suman
+                        en los CFDi de nómina se configuran en ren_cfdi_rules.ini
+                        (el del directorio procesado o el del programa).
+                      - Los XML no válidos no detienen el lote: se mueven a la
+                        carpeta 'cuarentena' (si se renombra) y se listan en
+                        errorescfdi.csv.
+                      - (Opcional) Hacer click sobre 'Deshacer' para restaurar los
+                        nombres del último renombrado.
                       - Hacer click sobre el botón 'Salir' al finalizar.
 '''
 from tkFileDialog import askdirectory
 from Tkinter import *
+import ttk
 import sys
 import os
-from ren_cfdi import CFDi
+import time
+import threading
+import traceback
+import Queue
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_scan import scan_directory
+from ren_cfdi_report import CsvReportWriter, SqliteReportWriter, REPORT_NAME, SQLITE_REPORT_NAME
+from ren_cfdi_manifest import Manifest
+from ren_cfdi_rename import RenameIndex, undo_journal, DUPLICATES_REPORT_NAME, JOURNAL_NAME
+from ren_cfdi_stats import Stats
+from ren_cfdi_aggregate import Aggregator, SUMMARY_REPORT_NAME
+from ren_cfdi_reconcile import Reconciler, RECONCILE_REPORT_NAME
+from ren_cfdi_filter import parse_filter
+from ren_cfdi_rules import find_rules
+from ren_cfdi_errors import quarantine, write_errors, ERRORS_REPORT_NAME, QUARANTINE_NAME
+
+# Intervalo (ms) para leer los mensajes del proceso en segundo plano
+POLL_INTERVAL = 100
+# Intervalo mínimo (s) entre mensajes de avance
+PROGRESS_INTERVAL = 0.2
+STATS_NAME = 'estadisticascfdi.json'
 
 class mainWindow(object):
     """
@@ -30,6 +77,12 @@ class mainWindow(object):
     def __init__(self, master):
         self.master = master
         self.fileCsvName = False
+        self.report = None
+        self.database = None
+        self.worker = None
+        self.queue = Queue.Queue()
+        self.cancelled = threading.Event()
+        self.lastProgress = 0
 
         # Entrada de Texto 'Folio' {CP.ACS: }
         Label(master, text="Folio").grid(row=0)
@@ -37,6 +90,11 @@ class mainWindow(object):
         self.e1.grid(row=0, column=1)
         self.e1.focus()
 
+        # Entrada de Texto 'Filtro' (ver ren_cfdi_filter.parse_filter)
+        Label(master, text="Filtro").grid(row=0, column=2)
+        self.e10 = Entry(master)
+        self.e10.grid(row=0, column=3)
+
         # Botón de selección de 'Directorio'
         Label(master, text="Directorio de Archivos").grid(row=1)
         self.e2 = False
@@ -47,6 +105,15 @@ class mainWindow(object):
         Checkbutton(master, text="CSV", variable=self.e3).grid(row=2, sticky=W)
         self.e3.set(1)
 
+        # Check para leer los XML dentro de archivos 'ZIP'
+        self.e8 = IntVar()
+        Checkbutton(master, text="ZIP", variable=self.e8).grid(row=2, column=1, sticky=W)
+        self.e8.set(1)
+
+        # Check para guardar los valores en 'SQLite'
+        self.e9 = IntVar()
+        Checkbutton(master, text="SQLite", variable=self.e9).grid(row=3, column=1, sticky=W)
+
         # C.P. ACS Check para generar 'sóloReporte'
         self.e4 = IntVar()
         Checkbutton(master, text="sinRenombrar", variable=self.e4).grid(row=3, sticky=W)
@@ -55,9 +122,28 @@ class mainWindow(object):
         self.e5 = IntVar()
         #Checkbutton(master, text="Ventas", variable=self.e5).grid(column=2, row=3, sticky=W)
 
+        # Check para 'Simular' el renombrado (sólo muestra el plan)
+        self.e6 = IntVar()
+        Checkbutton(master, text="Simular", variable=self.e6).grid(row=4, sticky=W)
+
+        # Check para medir tiempos por etapa ('Estadísticas')
+        self.e7 = IntVar()
+        Checkbutton(master, text="Estadísticas", variable=self.e7).grid(row=4, column=1, sticky=W)
+
         # Botones de Acción
         Button(master, text='Salir', command=master.quit).grid(row=5, column=0, sticky=W, pady=4)
-        Button(master, text='Procesar', command=self.process_files).grid(row=5, column=1, sticky=W, pady=4)
+        self.b1 = Button(master, text='Procesar', command=self.process_files)
+        self.b1.grid(row=5, column=1, sticky=W, pady=4)
+        self.b2 = Button(master, text='Deshacer', command=self.undo_rename)
+        self.b2.grid(row=5, column=2, sticky=W, pady=4)
+        self.b3 = Button(master, text='Cancelar', command=self.cancel, state=DISABLED)
+        self.b3.grid(row=5, column=3, sticky=W, pady=4)
+
+        # Barra de progreso y estado (archivos, archivos/s y tiempo restante)
+        self.progress = ttk.Progressbar(master, orient=HORIZONTAL, mode='determinate')
+        self.progress.grid(row=6, column=0, columnspan=4, sticky=W+E, padx=4)
+        self.status = StringVar()
+        Label(master, textvariable=self.status).grid(row=7, column=0, columnspan=4, sticky=W)
 
     def browse_directory(self):
         """
@@ -71,72 +157,238 @@ class mainWindow(object):
         """
         Procesa todos los archivos contenidos por el Directorio almacenado
         en la variable 'e2', si son XML los procesa utilizando la clase CFDi.
+        El lote se ejecuta en un hilo en segundo plano (run_batch) para que la
+        ventana siga respondiendo; el avance se recibe por self.queue.
         """
         if not self.e2:
             sys.stdout.write("No proporcionó un directorio.\n")
             self.master.quit()
+            return
+        if self.worker and self.worker.is_alive():
+            return
+        try:
+            cfdiFilter = parse_filter(self.e10.get())
+            rules = find_rules(self.e2)
+        except (ValueError, IOError) as e:
+            sys.stdout.write("{}\n".format(e))
+            self.status.set(str(e))
+            return
         sys.stdout.write("Folio: %s\nFolder: %s\nCSV: %s\n" \
             % (self.e1.get(), self.e2, self.e3.get()))
-        if self.e3.get:
+        # Las variables de Tkinter sólo se leen desde el hilo principal
+        options = {
+            'folio': self.e1.get().upper(),
+            'csv': self.e3.get(),
+            'rename': not self.e4.get(),
+            'simulate': self.e6.get(),
+            'stats': self.e7.get(),
+            'zip': self.e8.get(),
+            'sqlite': self.e9.get(),
+            'filter': cfdiFilter,
+            'rules': rules,
+        }
+        self.cancelled.clear()
+        self.set_running(True)
+        self.status.set("Buscando archivos...")
+        self.worker = threading.Thread(target=self.run_batch, args=(options,))
+        self.worker.daemon = True
+        self.worker.start()
+        self.master.after(POLL_INTERVAL, self.poll_queue)
+
+    def run_batch(self, options):
+        """
+        Ejecuta el lote en segundo plano. Envía a self.queue mensajes
+        ('progress', procesados, total, archivos/s) y al final ('done', texto).
+        Se detiene entre un archivo y otro si se solicita la cancelación.
+        """
+        try:
+            self.queue.put(('done', self.process_batch(options)))
+        except Exception:
+            traceback.print_exc()
+            self.queue.put(('done', "Error: {}".format(sys.exc_info()[1])))
+
+    def process_batch(self, options):
+        """
+        Lee los CFDi del Directorio, genera el reporte y los renombra.
+        Devuelve el resumen de la ejecución.
+        """
+        # Una sola pasada por el directorio: XML, tamaño y fecha, y PDF de cada XML
+        scan = scan_directory(self.e2, archives=options['zip'], exclude=(QUARANTINE_NAME,))
+        fileNames = scan.fileNames
+        total = len(fileNames)
+        if options['csv']:
             self.generate_csv()
-        for root, dirs, files in os.walk(self.e2):
-            for name in files:
-                if name.split(".")[-1].upper() in ("XML"):
-                    filename = "{}{}{}".format(self.e2, os.sep, name)
-                    sys.stdout.write("{}\n".format(filename))
-                    fileCfdi = CFDi(filename, self.e1.get().upper())
+        if options['sqlite']:
+            # Los CFDi se acumulan en la base de datos entre ejecuciones
+            self.database = SqliteReportWriter(os.path.join(self.e2, SQLITE_REPORT_NAME), append=True)
+        # Los archivos sin cambios desde la ejecución anterior no se vuelven a leer
+        manifest = Manifest(self.e2)
+        manifest.prune(fileNames)
+        failed = []
+        index = RenameIndex(scan)
+        stats = Stats() if options['stats'] else None
+        aggregator = Aggregator() if self.report else None
+        reconciler = Reconciler() if self.report else None
+        try:
+            # Los CFDi se leen en paralelo y se registran en el orden de los archivos
+            # Sin reporte sólo se leen las secciones que forman el nombre
+            outputs = None if self.report or self.database else ['file_name', 'uuid']
+            batch = BatchProcessor(options['folio'], manifest=manifest, outputs=outputs, stats=stats,
+                                   cfdi_filter=options['filter'], rules=options['rules'])
+            # El avance y la cancelación se revisan después de cada archivo,
+            # también de los excluidos por el filtro y los no válidos
+            self.lastProgress = 0
+            results = batch.run(fileNames, scan.stats, cancel=self.cancelled,
+                                progress=lambda batch: self.send_progress(batch, total))
+            try:
+                for fileCfdi in results:
+                    sys.stdout.write("{}\n".format(fileCfdi.fileName))
                     sys.stdout.write("Valores: {}\n\n".format(str(fileCfdi.values)))
-                    if not self.e4.get():
-                        sys.stdout.write("==========Cambiando nombre de Archivo: =========\n{}\n".format(fileCfdi.fileName))
-                        fileCfdi.rename_file()
-                    if self.e3.get():
-                        fileCfdi.generate_csv_line(self.fileCsvName)
+                    index.add(fileCfdi)
+                    if self.report:
+                        if stats:
+                            with stats.timer('csv', fileCfdi.docType):
+                                self.report.write(fileCfdi.values, fileCfdi.fileName)
+                        else:
+                            self.report.write(fileCfdi.values, fileCfdi.fileName)
+                    if self.database:
+                        self.database.write(fileCfdi.values, fileCfdi.fileName)
+                    if aggregator:
+                        aggregator.add(fileCfdi.values)
+                    if reconciler:
+                        reconciler.add(fileCfdi.values, fileCfdi.fileName)
+            finally:
+                results.close()
+            count = batch.count if self.cancelled.is_set() else total
+            self.queue.put(('progress', count, total, batch.files_per_second()))
+
+            # Renombrado una vez detectados duplicados y colisiones de todo el lote
+            if options['rename'] and not self.cancelled.is_set():
+                plan = index.plan()
+                if options['simulate']:
+                    sys.stdout.write("==========Simulación de renombrado: =========\n")
+                    plan.write(sys.stdout)
+                else:
+                    journal = os.path.join(self.e2, JOURNAL_NAME)
+                    start = time.time()
+                    applied, failed = plan.apply(journal, sys.stdout, self.cancelled)
+                    if stats:
+                        stats.add('rename', time.time() - start, count=len(applied))
+                    for old, new in applied:
+                        if os.path.splitext(new)[1].lower() == '.xml':
+                            manifest.move(old, new)
+        finally:
+            manifest.close()
+            if self.report:
+                self.report.close()
+                self.report = None
+            if self.database:
+                self.database.close()
+                self.database = None
+        if batch.errors:
+            # El reporte se escribe antes de la cuarentena para conservarlo si ésta falla
+            fileName = os.path.join(self.e2, ERRORS_REPORT_NAME)
+            write_errors(fileName, batch.errors)
+            if options['rename'] and not options['simulate']:
+                moved, notMoved = quarantine(batch.errors, self.e2, scan=scan)
+                write_errors(fileName, batch.errors, moved, notMoved)
+                if notMoved:
+                    sys.stdout.write("{} archivos no se movieron a {}\n".format(
+                        len(notMoved), QUARANTINE_NAME))
+            sys.stdout.write("{} archivos no válidos, ver {}\n".format(len(batch.errors), fileName))
+        if aggregator:
+            aggregator.write(os.path.join(self.e2, SUMMARY_REPORT_NAME))
+        if reconciler:
+            reconciler.write(os.path.join(self.e2, RECONCILE_REPORT_NAME))
+        if index.conflicts:
+            fileName = os.path.join(self.e2, DUPLICATES_REPORT_NAME)
+            index.write_report(fileName)
+            sys.stdout.write("{} duplicados o colisiones, ver {}\n".format(len(index.conflicts), fileName))
+        summary = "Procesados {} de {} archivos ({} sin cambios) en {:.2f} s ({:.1f} archivos/s)".format(
+            batch.count, total, batch.cached, batch.elapsed, batch.files_per_second())
+        if batch.skipped:
+            summary = "{}, {} excluidos por el filtro".format(summary, batch.skipped)
+        if batch.errors:
+            summary = "{}, {} con error".format(summary, len(batch.errors))
+        if failed:
+            summary = "{}, {} sin renombrar".format(summary, len(failed))
+        if stats:
+            stats.count('conflicts', len(index.conflicts))
+            sys.stdout.write("{}\n".format(stats.summary()))
+            stats.to_json(os.path.join(self.e2, STATS_NAME))
+        if self.cancelled.is_set():
+            summary = "Cancelado. {}".format(summary)
+        sys.stdout.write("{}\n".format(summary))
+        return summary
+
+    def send_progress(self, batch, total):
+        """
+        Envía a self.queue el avance del lote como máximo cada
+        PROGRESS_INTERVAL segundos (BatchProcessor.run la llama por archivo).
+        """
+        if time.time() - self.lastProgress >= PROGRESS_INTERVAL:
+            self.lastProgress = time.time()
+            self.queue.put(('progress', batch.count, total, batch.files_per_second()))
+
+    def poll_queue(self):
+        """
+        Lee los mensajes del hilo en segundo plano y actualiza la barra de
+        progreso y el estado. Se vuelve a programar mientras el lote esté activo.
+        """
+        # Se consulta antes de leer la cola para no perder el mensaje final
+        running = self.worker and self.worker.is_alive()
+        try:
+            while True:
+                message = self.queue.get_nowait()
+                if message[0] == 'progress':
+                    count, total, fps = message[1:]
+                    self.progress['maximum'] = max(total, 1)
+                    self.progress['value'] = count
+                    eta = (total - count) / fps if fps else 0
+                    self.status.set("{} / {} archivos - {:.1f} archivos/s - restante {}:{:02d}".format(
+                        count, total, fps, int(eta) // 60, int(eta) % 60))
+                elif message[0] == 'done':
+                    self.status.set(message[1])
+        except Queue.Empty:
+            pass
+        if running:
+            self.master.after(POLL_INTERVAL, self.poll_queue)
+        else:
+            self.set_running(False)
+
+    def set_running(self, running):
+        """
+        Habilita o deshabilita los botones según haya un lote en ejecución.
+        """
+        self.b1.config(state=DISABLED if running else NORMAL)
+        self.b2.config(state=DISABLED if running else NORMAL)
+        self.b3.config(state=NORMAL if running else DISABLED)
+
+    def cancel(self):
+        """
+        Solicita detener el lote en ejecución al terminar el archivo actual.
+        """
+        self.cancelled.set()
+        self.status.set("Cancelando...")
+
+    def undo_rename(self):
+        """
+        Restaura los nombres de archivo del último renombrado del Directorio
+        utilizando su bitácora.
+        """
+        if not self.e2:
+            sys.stdout.write("No proporcionó un directorio.\n")
+            return
+        count = undo_journal(os.path.join(self.e2, JOURNAL_NAME), sys.stdout)
+        sys.stdout.write("Restaurados {} archivos.\n".format(count))
 
     def generate_csv(self):
         """
-        Genera un archivo CSV con una fila que contiene los encabezados.
-        """
-        fileCsvName = "{}{}reportecfdi.csv".format(self.e2, os.sep)
-        if os.path.isfile(fileCsvName):
-            os.remove(fileCsvName)
-        header = self.get_csv_header()
-        f = open(fileCsvName, 'a')
-        f.write("{}\n".format(header))
-        f.close()
-        self.fileCsvName = fileCsvName
-
-    def get_csv_header(self):
-        """
-        Genera la primera fila del CSV con el encabezado de las columnas.
-        """
-        vals = []
-        vals.append('Archivo')
-        vals.append('RFC Emisor')
-        vals.append('RFC Receptor')
-        vals.append('UUID')
-        vals.append('Folio')
-        vals.append('NumEmpleado')#  mod C.P. ACS
-        vals.append('Sub Total')
-        vals.append('Descuento')
-        vals.append('Total')
-        vals.append('Traslados')
-        vals.append('ISR')
-        vals.append('IVA')
-        vals.append('IEPS')
-        vals.append('Retenciones')
-        vals.append('ISR')
-        vals.append('IVA')
-        vals.append('Percepciones')
-        vals.append('Otros Pagos')
-        vals.append('Deducciones')
-        vals.append('Dedducción ISR')
-        vals.append('Neto')
-        vals.append('M.P.')
-        vals.append('Tipo')
-        vals.append('Versión')
-        vals.append('ImpPagado')
-        vals.append('=SUMA(Y2:Y9999)')
-        return ",".join(vals)
+        Abre el reporte CSV del directorio con la fila de encabezados;
+        permanece abierto hasta terminar el lote.
+        """
+        self.fileCsvName = os.path.join(self.e2, REPORT_NAME)
+        self.report = CsvReportWriter(self.fileCsvName)
 
 
 if __name__ == "__main__":
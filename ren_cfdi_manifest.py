@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_manifest.py
+Descripción         : Manifiesto de CFDi procesados para ejecuciones incrementales
+                      Guarda los values de cada XML para no volver a leerlo
+                      mientras no cambie
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_batch.py
+                      - Importar:
+                      from ren_cfdi_manifest import Manifest
+                      - Abrir el manifiesto del directorio:
+                      manifest = Manifest(directorio)
+                      - Procesar con el motor masivo:
+                      batch = BatchProcessor(prefijo, manifest=manifest)
+                      - Eliminar los registros de archivos que ya no existen:
+                      manifest.prune(archivos_del_directorio)
+                      - Registrar un archivo renombrado y cerrar:
+                      manifest.move(nombre_anterior, nombre_nuevo)
+                      manifest.close()
+'''
+import os
+import json
+import sqlite3
+from ren_cfdi_archive import is_member, stat_member
+
+MANIFEST_NAME = '.ren_cfdi_manifest.sqlite'
+
+
+def to_str(values):
+    """
+    Convierte los textos de values leídos de JSON (unicode) a UTF-8, como
+    los obtiene CFDi (el nombre de archivo es str).
+    """
+    return dict((field, value.encode('utf-8') if isinstance(value, unicode) else value)
+                for field, value in values.items())
+
+
+class Manifest(object):
+    """
+    Manifiesto en disco (SQLite) de los archivos XML procesados.
+    Cada registro se identifica por la ruta relativa al directorio y es válido
+    mientras coincidan el tamaño, la fecha de modificación y la firma de la
+    ejecución (prefijo y reglas que afectan a values).
+    """
+    def __init__(self, directory, fileName=MANIFEST_NAME, commit_every=1000):
+        self.directory = directory
+        self.fileName = os.path.join(directory, fileName)
+        self.commit_every = commit_every
+        self.pending = 0
+        self.conn = sqlite3.connect(self.fileName)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER,"
+            " mtime REAL,"
+            " uuid TEXT,"
+            " signature TEXT,"
+            " vals TEXT)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_uuid ON files (uuid)")
+        self.conn.commit()
+
+    def key(self, fileName):
+        """
+        Ruta del archivo relativa al directorio del manifiesto.
+        """
+        return os.path.relpath(fileName, self.directory)
+
+    def stat(self, fileName):
+        """
+        Devuelve la tupla (tamaño, fecha de modificación) del archivo
+        (la del ZIP para los XML contenidos en él).
+        """
+        if is_member(fileName):
+            return stat_member(fileName)
+        st = os.stat(fileName)
+        return st.st_size, st.st_mtime
+
+    def get(self, fileName, stat, signature=''):
+        """
+        Devuelve los values guardados del archivo si no ha cambiado desde que
+        se registró, o None si es necesario volver a leerlo.
+        """
+        row = self.conn.execute(
+            "SELECT size, mtime, signature, vals FROM files WHERE path = ?",
+            (self.key(fileName),)).fetchone()
+        if not row or (row[0], row[1]) != stat or row[2] != signature:
+            return None
+        return to_str(json.loads(row[3]))
+
+    def put(self, fileName, stat, values, signature=''):
+        """
+        Registra (o actualiza) los values de un archivo.
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime, uuid, signature, vals)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (self.key(fileName), stat[0], stat[1], values.get('uuid'),
+             signature, json.dumps(dict(values))))
+        self.changed()
+
+    def move(self, oldName, newName):
+        """
+        Actualiza la ruta de un archivo renombrado con su nueva fecha de modificación.
+        """
+        if oldName == newName:
+            return
+        size, mtime = self.stat(newName)
+        self.conn.execute("DELETE FROM files WHERE path = ?", (self.key(newName),))
+        self.conn.execute(
+            "UPDATE files SET path = ?, size = ?, mtime = ? WHERE path = ?",
+            (self.key(newName), size, mtime, self.key(oldName)))
+        self.changed()
+
+    def prune(self, fileNames):
+        """
+        Elimina los registros de los archivos que no están en fileNames (los
+        encontrados al recorrer el directorio): borrados, movidos o renombrados
+        fuera del programa. Devuelve el número de registros eliminados.
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM seen")
+        self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)",
+                              ((self.key(fileName),) for fileName in fileNames))
+        removed = self.conn.execute(
+            "DELETE FROM files WHERE path NOT IN (SELECT path FROM seen)").rowcount
+        self.conn.execute("DELETE FROM seen")
+        self.commit()
+        return removed
+
+    def changed(self):
+        """
+        Confirma los cambios cada commit_every operaciones.
+        """
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self):
+        """
+        Confirma los cambios pendientes y cierra el manifiesto.
+        """
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_reconcile.py
+Descripción         : Conciliación de complementos de pago contra facturas
+                      Indexa las facturas (tipo 'I') por UUID completo y suma
+                      los pagos de cada pago10:DoctoRelacionado para obtener
+                      las facturas pagadas, parciales y pendientes con su saldo
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_int.py o script independiente
+                      - Importar:
+                      from ren_cfdi_reconcile import Reconciler
+                      - Registrar cada CFDi del lote (en cualquier orden):
+                      reconciler = Reconciler()
+                      reconciler.add(new_cfdi.values, new_cfdi.fileName)
+                      - Escribir la conciliación:
+                      reconciler.write(nombre_archivo_csv)
+                      - Desde la línea de comandos (sólo lee las secciones
+                      necesarias; escribe conciliacioncfdi.csv en el directorio):
+                      python ren_cfdi_reconcile.py /ruta/cfdi
+                      - Por omisión sólo se concilian las facturas con método de
+                      pago PPD (las PUE se pagan en una exhibición); los pagos a
+                      una factura del lote con otro método se reportan como
+                      'factura_excluida'.
+'''
+import os
+import sys
+import csv
+import argparse
+from ren_cfdi_report import to_cell
+from ren_cfdi_aggregate import to_amount
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_filter import CFDiFilter
+from ren_cfdi_scan import scan_directory
+from ren_cfdi_errors import QUARANTINE_NAME
+
+RECONCILE_REPORT_NAME = 'conciliacioncfdi.csv'
+
+# Campos de values que requiere la conciliación (ver BatchProcessor outputs)
+RECONCILE_FIELDS = ('tipo', 'uuid', 'folio', 'fecha', 'rfce', 'rfcr', 'total', 'mpago', 'doctos')
+
+# Estado de cada factura
+PAID = 'pagada'
+PARTIAL = 'parcial'
+UNPAID = 'pendiente'
+OVERPAID = 'excedente'
+# Pagos a un UUID que no está entre las facturas del lote
+ORPHAN = 'sin_factura'
+# Pagos a una factura del lote cuyo método de pago no se concilia (ver methods)
+EXCLUDED = 'factura_excluida'
+
+# Diferencia máxima (centavos) para considerar saldada una factura
+TOLERANCE = 0.01
+
+RECONCILE_HEADER = ['UUID', 'Folio', 'Fecha', 'RFC Emisor', 'RFC Receptor', 'Total',
+                    'Pagado', 'Saldo', 'Pagos', 'Estado', 'Archivo']
+
+
+class Reconciler(object):
+    """
+    Conciliación en una sola pasada: las facturas se guardan en un diccionario
+    por UUID y los pagos se acumulan en otro, de modo que cada
+    DoctoRelacionado se une a su factura en O(1) sin importar el orden en que
+    se registran los CFDi. Los complementos de pago repetidos (mismo UUID)
+    sólo se suman una vez. Se indexan todas las facturas; methods sólo
+    indica de cuáles se reporta el saldo.
+    """
+    def __init__(self, methods=('PPD',)):
+        self.methods = frozenset(methods) if methods else None
+        self.invoices = {}
+        self.payments = {}
+        self.seen = set()
+
+    def add(self, values, fileName=''):
+        """
+        Registra una factura (tipo 'I') o los pagos de un complemento (tipo 'P').
+        """
+        tipo = values.get('tipo')
+        uuid = (values.get('uuid') or '').upper()
+        if tipo == 'I':
+            if uuid and uuid not in self.invoices:
+                self.invoices[uuid] = (values.get('folio') or '', values.get('fecha') or '',
+                                       values.get('rfce') or '', values.get('rfcr') or '',
+                                       to_amount(values.get('total')), fileName,
+                                       values.get('mpago'))
+        elif tipo == 'P':
+            if uuid:
+                if uuid in self.seen:
+                    return
+                self.seen.add(uuid)
+            for docto, importe in values.get('doctos') or ():
+                paid = self.payments.get(docto)
+                if paid is None:
+                    paid = self.payments[docto] = [0., 0]
+                paid[0] += importe
+                paid[1] += 1
+
+    def status(self, total, paid):
+        """
+        Devuelve el estado de una factura según su total y lo pagado.
+        """
+        balance = total - paid
+        if paid < TOLERANCE:
+            return UNPAID
+        if balance > TOLERANCE:
+            return PARTIAL
+        if balance < -TOLERANCE:
+            return OVERPAID
+        return PAID
+
+    def rows(self):
+        """
+        Devuelve las filas de la conciliación: las facturas ordenadas por fecha
+        (las de un método de pago excluido sólo si tienen pagos, sin saldo) y
+        después los pagos sin factura en el lote (ordenados por UUID).
+        """
+        for uuid, invoice in sorted(self.invoices.items(), key=lambda item: (item[1][1], item[0])):
+            folio, fecha, rfce, rfcr, total, fileName, mpago = invoice
+            paid, count = self.payments.get(uuid, (0., 0))
+            if self.methods is None or mpago in self.methods:
+                yield [uuid, folio, fecha, rfce, rfcr, round(total, 2), round(paid, 2),
+                       round(total - paid, 2), count, self.status(total, paid), fileName]
+            elif count:
+                yield [uuid, folio, fecha, rfce, rfcr, round(total, 2), round(paid, 2),
+                       '', count, EXCLUDED, fileName]
+        for uuid in sorted(self.payments):
+            if uuid not in self.invoices:
+                paid, count = self.payments[uuid]
+                yield [uuid, '', '', '', '', '', round(paid, 2), '', count, ORPHAN, '']
+
+    def summary(self):
+        """
+        Devuelve el diccionario {estado: [número de facturas, saldo]}.
+        """
+        totals = {}
+        for row in self.rows():
+            entry = totals.setdefault(row[9], [0, 0.])
+            entry[0] += 1
+            entry[1] += to_amount(row[7])
+        return totals
+
+    def write(self, fileName):
+        """
+        Escribe la conciliación en un archivo CSV.
+        """
+        f = open(fileName, 'wb')
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(RECONCILE_HEADER)
+        writer.writerows([[to_cell(x) for x in row] for row in self.rows()])
+        f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concilia los complementos de pago contra las facturas')
+    parser.add_argument('directory', help='Directorio con los CFDi')
+    parser.add_argument('--zip', action='store_true', help='Leer también los XML contenidos en ZIP')
+    parser.add_argument('--todas', action='store_true',
+                        help='Conciliar también las facturas PUE')
+    parser.add_argument('--salida', help='Archivo CSV (por omisión %s en el directorio)'
+                        % RECONCILE_REPORT_NAME)
+    args = parser.parse_args()
+
+    scan = scan_directory(args.directory, args.zip, exclude=(QUARANTINE_NAME,))
+    # Sólo se leen las facturas y los pagos, y de ellos las secciones necesarias
+    batch = BatchProcessor(outputs=list(RECONCILE_FIELDS), cfdi_filter=CFDiFilter(tipos='I,P'))
+    reconciler = Reconciler(None if args.todas else ('PPD',))
+    for cfdi in batch.run(scan.fileNames, scan.stats):
+        reconciler.add(cfdi.values, cfdi.fileName)
+    fileName = args.salida or os.path.join(args.directory, RECONCILE_REPORT_NAME)
+    reconciler.write(fileName)
+
+    for error in batch.errors:
+        sys.stdout.write("Error en {}: {}\n".format(error.fileName, error.detail))
+    for status, (count, balance) in sorted(reconciler.summary().items()):
+        sys.stdout.write("{:<18} {:>8} {:>16.2f}\n".format(status, count, balance))
+    sys.stdout.write("Conciliación: {}\n".format(fileName))
+
+
+if __name__ == '__main__':
+    main()
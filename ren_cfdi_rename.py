@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_rename.py
+Descripción         : Renombrado masivo de CFDi
+                      Índice de UUID y nombres destino para detectar CFDi
+                      duplicados y colisiones de nombre antes de renombrar,
+                      y plan de renombrado con bitácora para deshacer o reanudar
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_rename import RenameIndex
+                      - Registrar cada CFDi del lote (antes de renombrar); con el
+                      recorrido de ren_cfdi_scan.py no se vuelve a listar ningún
+                      directorio:
+                      index = RenameIndex(scan)
+                      index.add(new_cfdi)
+                      - Renombrar los archivos sin conflictos:
+                      plan = index.plan()
+                      plan.write()          # simulación: sólo imprime el plan
+                      applied, failed = plan.apply(bitacora)  # renombra y registra
+                      - Deshacer el último renombrado:
+                      undo_journal(bitacora)
+                      - Reporte de duplicados y colisiones:
+                      index.write_report(nombre_archivo_csv)
+'''
+import os
+import sys
+import csv
+import json
+from ren_cfdi_report import to_cell
+from ren_cfdi_archive import is_member
+
+DUPLICATES_REPORT_NAME = 'duplicadoscfdi.csv'
+JOURNAL_NAME = '.ren_cfdi_journal'
+
+# Resultado de RenameIndex.add()
+RENAME = 'renombrar'
+UNCHANGED = 'sin_cambio'
+DUPLICATE = 'duplicado'
+COLLISION = 'colision'
+
+
+class RenameIndex(object):
+    """
+    Índice en memoria de los UUID completos y de los nombres destino de un lote.
+    Cada CFDi se clasifica en O(1): los directorios se listan una sola vez y
+    no se consulta cada archivo en disco. Con scan (ren_cfdi_scan.ScanResult)
+    se utilizan sus listados y su relación de XML y PDF.
+    """
+    def __init__(self, scan=None):
+        self.scan = scan
+        self.uuids = {}
+        self.targets = {}
+        self.listings = dict(scan.listings) if scan else {}
+        self.renames = []
+        self.conflicts = []
+
+    def listing(self, directory):
+        """
+        Devuelve el conjunto de nombres (normalizados) del directorio,
+        leyéndolo sólo la primera vez.
+        """
+        names = self.listings.get(directory)
+        if names is None:
+            try:
+                names = set(os.path.normcase(n) for n in os.listdir(directory or os.curdir))
+            except OSError:
+                names = set()
+            self.listings[directory] = names
+        return names
+
+    def exists(self, fileName):
+        """
+        Indica si el archivo existía en su directorio al momento de listarlo.
+        """
+        directory, name = os.path.split(fileName)
+        return os.path.normcase(name) in self.listing(directory)
+
+    def find_pdf(self, oldXml, oldPdf):
+        """
+        Devuelve el PDF que corresponde al XML (oldPdf si existe, o el de
+        ScanResult con cualquier mayúscula en la extensión) o None.
+        """
+        if self.scan:
+            return self.scan.pdf_for(oldXml)
+        if self.exists(oldPdf):
+            return oldPdf
+        return None
+
+    def add(self, cfdi):
+        """
+        Registra un CFDi del lote y devuelve su clasificación:
+        RENAME, UNCHANGED, DUPLICATE (mismo UUID que un CFDi anterior)
+        o COLLISION (el nombre destino ya existe o ya fue asignado).
+        Los XML dentro de un ZIP sólo registran su UUID (UNCHANGED).
+        """
+        oldXml, newXml, oldPdf, newPdf = cfdi.get_rename_targets()
+        uuid = (cfdi.values.get('uuid') or '').upper()
+        if uuid:
+            original = self.uuids.get(uuid)
+            if original:
+                self.conflicts.append((DUPLICATE, cfdi.fileName, original, uuid, newXml))
+                return DUPLICATE
+            self.uuids[uuid] = cfdi.fileName
+
+        if oldXml == newXml or is_member(cfdi.fileName):
+            return UNCHANGED
+
+        key = os.path.normcase(newXml)
+        other = self.targets.get(key)
+        if other is None and self.exists(newXml):
+            other = newXml
+        if other is not None:
+            self.conflicts.append((COLLISION, cfdi.fileName, other, uuid, newXml))
+            return COLLISION
+        self.targets[key] = cfdi.fileName
+
+        # El PDF sólo se renombra si existe y su nombre destino está libre
+        pdf = None
+        oldPdf = self.find_pdf(oldXml, oldPdf)
+        if oldPdf:
+            pdfKey = os.path.normcase(newPdf)
+            if pdfKey in self.targets or self.exists(newPdf):
+                self.conflicts.append((COLLISION, oldPdf, newPdf, uuid, newPdf))
+            else:
+                self.targets[pdfKey] = oldPdf
+                pdf = (oldPdf, newPdf)
+        self.renames.append((cfdi.fileName, oldXml, newXml, pdf))
+        return RENAME
+
+    def plan(self):
+        """
+        Devuelve el RenamePlan con los pares (anterior, nuevo) de los XML
+        y PDF a renombrar.
+        """
+        plan = RenamePlan()
+        for fileName, oldXml, newXml, pdf in self.renames:
+            plan.add(fileName, newXml)
+            if pdf:
+                plan.add(pdf[0], pdf[1])
+        return plan
+
+    def write_report(self, fileName):
+        """
+        Escribe el reporte CSV de CFDi duplicados y colisiones de nombre.
+        """
+        f = open(fileName, 'wb')
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['Motivo', 'Archivo', 'Conflicto con', 'UUID', 'Destino'])
+        writer.writerows([[to_cell(x) for x in row] for row in self.conflicts])
+        f.close()
+
+
+def read_journal(journal):
+    """
+    Lee la bitácora de renombrado. Devuelve la lista de pares (anterior, nuevo)
+    ya aplicados y si la ejecución que la escribió terminó.
+    """
+    pairs = []
+    finished = False
+    if not os.path.isfile(journal):
+        return pairs, finished
+    f = open(journal)
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # Línea incompleta por una interrupción
+            continue
+        if entry.get('fin'):
+            finished = True
+        else:
+            pairs.append((entry['old'], entry['new']))
+    f.close()
+    return pairs, finished
+
+
+def undo_journal(journal, out=None):
+    """
+    Deshace los renombrados registrados en la bitácora (en orden inverso)
+    y la elimina. Devuelve el número de archivos restaurados.
+    """
+    pairs, finished = read_journal(journal)
+    count = 0
+    for old, new in reversed(pairs):
+        if os.path.exists(new) and not os.path.exists(old):
+            os.rename(new, old)
+            count += 1
+            if out:
+                out.write("Restaurando: {}\nA: {}\n".format(new, old))
+    if os.path.isfile(journal):
+        os.remove(journal)
+    return count
+
+
+class RenamePlan(object):
+    """
+    Plan de renombrado: lista ordenada de pares (anterior, nuevo).
+    apply() renombra en el mismo proceso (sin lanzar comandos externos),
+    actualiza la fecha de modificación y registra cada par en la bitácora;
+    un par que no se puede renombrar no detiene el resto.
+    """
+    def __init__(self, entries=None):
+        self.entries = list(entries or [])
+
+    def add(self, old, new):
+        self.entries.append((old, new))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def write(self, out=None):
+        """
+        Imprime el plan sin renombrar (simulación).
+        """
+        out = out or sys.stdout
+        for old, new in self.entries:
+            out.write("{} -> {}\n".format(old, new))
+
+    def apply(self, journal=None, out=None, cancel=None):
+        """
+        Renombra los archivos del plan. Si la bitácora corresponde a una
+        ejecución interrumpida se reanuda omitiendo los pares ya aplicados;
+        en otro caso se inicia una nueva. Devuelve la tupla (pares aplicados,
+        fallidos), donde cada fallido es (anterior, nuevo, detalle); por
+        ejemplo un PDF abierto en otro programa o un archivo que ya no existe.
+        Sólo los pares aplicados se registran en la bitácora; la nueva
+        bitácora reemplaza a la anterior al aplicar el primer par, de modo que
+        un plan vacío (o sin pares aplicados) conserva la anterior para
+        deshacerla.
+        cancel (threading.Event) detiene el renombrado entre un archivo y otro;
+        la bitácora queda abierta para reanudarlo.
+        """
+        done = set()
+        f = None
+        mode = 'w'
+        if journal:
+            pairs, finished = read_journal(journal)
+            if pairs and not finished:
+                done = set(pairs)
+                mode = 'a'
+        applied = []
+        failed = []
+        try:
+            for old, new in self.entries:
+                if cancel and cancel.is_set():
+                    return applied, failed
+                if (old, new) in done:
+                    continue
+                try:
+                    os.rename(old, new)
+                except OSError as e:
+                    failed.append((old, new, e.strerror or str(e)))
+                    if out:
+                        out.write("No se pudo renombrar: {}\n{}\n\n".format(old, e))
+                    continue
+                try:
+                    os.utime(new, None)
+                except OSError:
+                    pass
+                applied.append((old, new))
+                if out:
+                    out.write("Renombrando: {}\nA: {}\n\n".format(old, new))
+                if journal:
+                    if f is None:
+                        f = open(journal, mode)
+                    f.write(json.dumps({'old': old, 'new': new}) + '\n')
+                    f.flush()
+            # Al reanudar se cierra la bitácora aunque no quedaran pares
+            if f is None and mode == 'a':
+                f = open(journal, mode)
+            if f:
+                f.write(json.dumps({'fin': True}) + '\n')
+        finally:
+            if f:
+                f.close()
+        return applied, failed
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_report.py
+Descripción         : Escritura del reporte de CFDi procesados
+                      Define en un solo lugar las columnas del reporte CSV
+                      y de la base de datos SQLite
+Fecha (creación)    : 16/10/2026
+Versión             : 1.1
+Uso                 : Módulo utilizado por ren_cfdi.py y ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_report import CsvReportWriter
+                      - Abrir el reporte (escribe el encabezado):
+                      report = CsvReportWriter(nombre_archivo_csv)
+                      - Agregar una fila por CFDi (con el archivo de origen,
+                      que para un XML dentro de un ZIP es 'descarga.zip!a.xml'):
+                      report.write(new_cfdi.values, new_cfdi.fileName)
+                      - Cerrar al terminar el lote:
+                      report.close()
+                      - (Opcional) Guardar los values en SQLite (mismos métodos):
+                      report = SqliteReportWriter(nombre_archivo_sqlite, append=True)
+'''
+import os
+import csv
+import sqlite3
+
+REPORT_NAME = 'reportecfdi.csv'
+SQLITE_REPORT_NAME = 'reportecfdi.sqlite'
+
+
+def get_imp_pagado(v):
+    """
+    Total pagado en una sola exhibición (negativo para egresos); para el resto
+    de los comprobantes se usa el monto del complemento de pago.
+    """
+    if str(v['mpago']) == 'PUE':
+        if str(v['tipo']) == 'E':
+            return float(v['total']) * -1.
+        return v['total']
+    return v['monto']
+
+
+def get_monto_pue(v):
+    """
+    Monto del complemento de pago para los comprobantes PUE.
+    """
+    if str(v['mpago']) == 'PUE':
+        return v['monto']
+    return ''
+
+
+# Columnas del reporte: (encabezado, llave en values o función sobre values)
+CSV_COLUMNS = (
+    ('Archivo', 'file_name'),
+    ('RFC Emisor', 'rfce'),
+    ('RFC Receptor', 'rfcr'),
+    ('UUID', 'uuid1'),
+    ('Folio', 'folio'),
+    ('NumEmpleado', 'no_emp'),# mod C.P. ACS
+    ('Sub Total', 'subtotal'),
+    ('Descuento', 'descuento'),
+    ('Total', 'total'),
+    ('Traslados', 'traslados'),
+    ('ISR', 'isr_t'),
+    ('IVA', 'iva_t'),
+    ('IEPS', 'ieps_t'),
+    ('Retenciones', 'retenciones'),
+    ('ISR', 'isr_r'),
+    ('IVA', 'iva_r'),
+    ('Percepciones', 'per_f'),
+    ('Otros Pagos', 'op_f'),
+    ('Deducciones', 'ded_f'),
+    ('Dedducción ISR', 'ded_isr'),
+    ('Neto', 'neto_f'),
+    ('M.P.', 'mpago'),
+    ('Tipo', 'tipo'),
+    ('Versión', 'ver'),
+    ('ImpPagado', get_imp_pagado),
+    ('=SUMA(Y:Y)', get_monto_pue),
+)
+
+# La última columna es el archivo de origen del CFDi (ver get_csv_row)
+CSV_HEADER = [column[0] for column in CSV_COLUMNS] + ['Origen']
+
+
+def to_cell(value):
+    """
+    Convierte un valor a texto para el CSV (UTF-8).
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def get_csv_row(values, source=''):
+    """
+    Devuelve la lista de celdas del reporte para el diccionario values de un
+    CFDi y el archivo del que se leyó (source).
+    """
+    row = []
+    for header, field in CSV_COLUMNS:
+        if callable(field):
+            row.append(to_cell(field(values)))
+        else:
+            row.append(to_cell(values[field]))
+    row.append(to_cell(source))
+    return row
+
+
+class CsvReportWriter(object):
+    """
+    Reporte CSV que permanece abierto durante todo el lote.
+    Las filas se acumulan y se escriben en bloque cada buffer_size filas.
+    """
+    def __init__(self, fileName, buffer_size=500, append=False):
+        self.fileName = fileName
+        self.buffer_size = buffer_size
+        self.rows = []
+        writeHeader = not (append and os.path.isfile(fileName)
+                           and os.path.getsize(fileName) > 0)
+        self.f = open(fileName, 'ab' if append else 'wb')
+        self.writer = csv.writer(self.f, lineterminator='\n')
+        if writeHeader:
+            self.writer.writerow(CSV_HEADER)
+
+    def write(self, values, source=''):
+        """
+        Agrega la fila correspondiente a los values de un CFDi y su archivo de origen.
+        """
+        self.rows.append(get_csv_row(values, source))
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Escribe en el archivo las filas acumuladas.
+        """
+        if self.rows:
+            self.writer.writerows(self.rows)
+            self.rows = []
+        self.f.flush()
+
+    def close(self):
+        """
+        Escribe las filas pendientes y cierra el archivo.
+        """
+        if self.f.closed:
+            return
+        self.flush()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Columnas de la tabla cfdi: (nombre, tipo, llave en values o función sobre values)
+SQLITE_COLUMNS = (
+    ('uuid', 'TEXT', 'uuid'),
+    ('tipo', 'TEXT', 'tipo'),
+    ('fecha', 'TEXT', 'fecha'),
+    ('rfce', 'TEXT', 'rfce'),
+    ('rfcr', 'TEXT', 'rfcr'),
+    ('folio', 'TEXT', 'folio'),
+    ('uso_cfdi', 'TEXT', 'uso_cfdi'),
+    ('ver', 'TEXT', 'ver'),
+    ('mpago', 'TEXT', 'mpago'),
+    ('subtotal', 'REAL', 'subtotal'),
+    ('descuento', 'REAL', 'descuento'),
+    ('total', 'REAL', 'total'),
+    ('traslados', 'REAL', 'traslados'),
+    ('isr_t', 'REAL', 'isr_t'),
+    ('iva_t', 'REAL', 'iva_t'),
+    ('ieps_t', 'REAL', 'ieps_t'),
+    ('retenciones', 'REAL', 'retenciones'),
+    ('isr_r', 'REAL', 'isr_r'),
+    ('iva_r', 'REAL', 'iva_r'),
+    ('uuid2', 'TEXT', 'uuid2'),
+    ('monto', 'REAL', 'monto'),
+    ('imp_pagado', 'REAL', get_imp_pagado),
+    ('nom_ver', 'TEXT', 'nom_ver'),
+    ('no_emp', 'TEXT', 'no_emp'),
+    ('per', 'REAL', 'per'),
+    ('op', 'REAL', 'op'),
+    ('ded', 'REAL', 'ded'),
+    ('neto', 'REAL', 'neto'),
+    ('per_f', 'REAL', 'per_f'),
+    ('op_f', 'REAL', 'op_f'),
+    ('ded_f', 'REAL', 'ded_f'),
+    ('ded_isr', 'REAL', 'ded_isr'),
+    ('neto_f', 'REAL', 'neto_f'),
+    ('archivo', 'TEXT', 'file_name'),
+)
+SQLITE_INDEXES = ('rfce', 'rfcr', 'tipo', 'fecha')
+# Un CFDi (UUID) ocupa una sola fila aunque se procese en varias ejecuciones
+SQLITE_UNIQUE_INDEX = 'cfdi_uuid_unico'
+# Versión del esquema (PRAGMA user_version); 1: columnas REAL sin texto
+SQLITE_VERSION = 1
+
+
+def to_db(value, kind='TEXT'):
+    """
+    Convierte un valor para SQLite (texto como unicode, UTF-8). En las
+    columnas REAL los marcadores del reporte ('-', 'NA', '') se guardan como
+    NULL, ya que SQLite ordena el texto después de cualquier número.
+    """
+    if kind == 'REAL':
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def get_db_row(values, source=''):
+    """
+    Devuelve la tupla de valores de la tabla cfdi para el diccionario values
+    de un CFDi y el archivo del que se leyó (source).
+    """
+    row = []
+    for name, kind, field in SQLITE_COLUMNS:
+        if name == 'uuid':
+            # Sin UUID (no timbrado) la fila no se identifica: NULL no se repite
+            row.append(to_db(values.get(field) or None))
+        elif callable(field):
+            try:
+                row.append(to_db(field(values), kind))
+            except (TypeError, ValueError):
+                row.append(None)
+        else:
+            row.append(to_db(values.get(field), kind))
+    row.append(to_db(source))
+    return tuple(row)
+
+
+class SqliteReportWriter(object):
+    """
+    Reporte en una base de datos SQLite (tabla cfdi) con índices por UUID,
+    RFC emisor y receptor, tipo y fecha; permite consultar el histórico de
+    millones de CFDi. Tiene los mismos métodos que CsvReportWriter.
+    Las filas se insertan con executemany en una transacción cada
+    buffer_size filas. Con append=False se eliminan las filas anteriores.
+    El UUID es único: un CFDi que se vuelve a procesar reemplaza su fila.
+    """
+    def __init__(self, fileName, buffer_size=1000, append=False):
+        self.fileName = fileName
+        self.buffer_size = buffer_size
+        self.rows = []
+        self.conn = sqlite3.connect(fileName)
+        columns = ["{} {}".format(name, kind) for name, kind, field in SQLITE_COLUMNS]
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cfdi ({}, origen TEXT)".format(
+            ", ".join(columns)))
+        for name in SQLITE_INDEXES:
+            self.conn.execute("CREATE INDEX IF NOT EXISTS cfdi_{0} ON cfdi ({0})".format(name))
+        if not append:
+            self.conn.execute("DELETE FROM cfdi")
+        self.create_unique_index()
+        self.clear_text_numbers()
+        self.conn.commit()
+        self.insert = "INSERT OR REPLACE INTO cfdi VALUES ({})".format(
+            ", ".join("?" * (len(SQLITE_COLUMNS) + 1)))
+
+    def create_unique_index(self):
+        """
+        Crea el índice único por UUID. Las bases de datos de versiones
+        anteriores pueden tener filas repetidas: se conserva la última.
+        """
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index'"
+                                   " AND name = ?", (SQLITE_UNIQUE_INDEX,)).fetchone()
+        if exists:
+            return
+        self.conn.execute("UPDATE cfdi SET uuid = NULL WHERE uuid = ''")
+        self.conn.execute("DELETE FROM cfdi WHERE uuid IS NOT NULL AND rowid NOT IN"
+                          " (SELECT MAX(rowid) FROM cfdi WHERE uuid IS NOT NULL GROUP BY uuid)")
+        self.conn.execute("DROP INDEX IF EXISTS cfdi_uuid")
+        self.conn.execute("CREATE UNIQUE INDEX {} ON cfdi (uuid)".format(SQLITE_UNIQUE_INDEX))
+
+    def clear_text_numbers(self):
+        """
+        Las versiones anteriores guardaban '-' o 'NA' en las columnas REAL;
+        se cambian por NULL una sola vez (PRAGMA user_version).
+        """
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= SQLITE_VERSION:
+            return
+        for name, kind, field in SQLITE_COLUMNS:
+            if kind == 'REAL':
+                self.conn.execute("UPDATE cfdi SET {0} = NULL WHERE typeof({0}) = 'text'".format(name))
+        self.conn.execute("PRAGMA user_version = {}".format(SQLITE_VERSION))
+
+    def write(self, values, source=''):
+        """
+        Agrega (o reemplaza, por UUID) la fila correspondiente a los values de
+        un CFDi y su archivo de origen.
+        """
+        self.rows.append(get_db_row(values, source))
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Inserta en una sola transacción las filas acumuladas.
+        """
+        if self.rows:
+            with self.conn:
+                self.conn.executemany(self.insert, self.rows)
+            self.rows = []
+
+    def close(self):
+        """
+        Inserta las filas pendientes y cierra la base de datos.
+        """
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_rules.py
+Descripción         : Reglas de filtrado de los conceptos de nómina
+                      Define qué percepciones, deducciones y otros pagos se
+                      suman en los valores filtrados (per_f, ded_f, op_f,
+                      neto_f y ded_isr); se leen de un archivo de
+                      configuración (INI o JSON) y se compilan una sola vez
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi.py, ren_cfdi_batch.py y
+                      ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_rules import load_rules
+                      - Leer las reglas de un archivo (ver ren_cfdi_rules.ini):
+                      rules = load_rules(nombre_archivo_ini)
+                      - Procesar con las reglas:
+                      new_cfdi = CFDi(nombre_archivo_xml, prefijo, rules=rules)
+                      batch = BatchProcessor(prefijo, rules=rules)
+                      - Sin archivo se utilizan las reglas originales
+                      (DEFAULT_RULES).
+'''
+import os
+import json
+import ConfigParser
+
+RULES_NAME = 'ren_cfdi_rules.ini'
+
+# Secciones del archivo: (sección, prefijo del parámetro de NominaRules)
+SECTIONS = (
+    ('percepciones', 'per'),
+    ('deducciones', 'ded'),
+    ('otros_pagos', 'op'),
+)
+
+
+def to_list(value):
+    """
+    Convierte un valor del archivo (texto separado por comas o lista) en lista.
+    """
+    if value is None:
+        return []
+    if isinstance(value, basestring):
+        value = value.split(',')
+    return [str(x).strip() for x in value if str(x).strip()]
+
+
+class NominaRules(object):
+    """
+    Reglas compiladas: conjuntos de claves excluidas y una tabla de
+    búsqueda (por clave) con el resultado de la regla de percepciones, que
+    se calcula una sola vez por clave distinta.
+    Percepciones: se suman las que no están en per_excluir y, si su clave
+    es numérica, es menor que per_clave_max (sin límite si es None); las no
+    numéricas se suman si per_no_numericas.
+    Deducciones: se suman las que no están en ded_excluir; las de ded_isr
+    forman la deducción de ISR.
+    Otros pagos: se suman los que no están en op_excluir.
+    per_campo, ded_campo y op_campo indican el atributo comparado
+    ('clave' o 'tipo').
+    """
+    def __init__(self, per_campo='clave', per_clave_max=15, per_excluir=(),
+                 per_no_numericas=True, ded_campo='tipo', ded_excluir=('080', '100', '081'),
+                 ded_isr=('002',), op_campo='tipo', op_excluir=('003', '999')):
+        for campo in (per_campo, ded_campo, op_campo):
+            if campo not in ('clave', 'tipo'):
+                raise ValueError('Campo de regla no soportado: %s' % campo)
+        self.per_campo = per_campo
+        self.per_clave_max = int(per_clave_max) if per_clave_max not in (None, '') else None
+        self.per_excluir = frozenset(to_list(per_excluir))
+        self.per_no_numericas = bool(per_no_numericas)
+        self.ded_campo = ded_campo
+        self.ded_excluir = frozenset(to_list(ded_excluir))
+        self.ded_isr = frozenset(to_list(ded_isr))
+        self.op_campo = op_campo
+        self.op_excluir = frozenset(to_list(op_excluir))
+        self.per_table = {}
+
+    def __getstate__(self):
+        # La tabla de búsqueda no se envía a los procesos trabajadores
+        state = dict(self.__dict__)
+        state['per_table'] = {}
+        return state
+
+    def signature(self):
+        """
+        Texto que identifica las reglas (ver BatchProcessor.signature).
+        """
+        return repr((self.per_campo, self.per_clave_max, sorted(self.per_excluir),
+                     self.per_no_numericas, self.ded_campo, sorted(self.ded_excluir),
+                     sorted(self.ded_isr), self.op_campo, sorted(self.op_excluir)))
+
+    def include_percepcion(self, key):
+        """
+        Indica si la percepción con la clave (o tipo) key se suma.
+        """
+        included = self.per_table.get(key)
+        if included is None:
+            if key in self.per_excluir:
+                included = False
+            else:
+                try:
+                    number = int(key)
+                except (TypeError, ValueError):
+                    included = self.per_no_numericas
+                else:
+                    included = self.per_clave_max is None or number < self.per_clave_max
+            self.per_table[key] = included
+        return included
+
+    def per_total(self, percepciones):
+        """
+        Total de las percepciones que cumplen las reglas.
+        """
+        include = self.include_percepcion
+        campo = self.per_campo
+        total = 0.0
+        for per in percepciones:
+            if include(per.get(campo)):
+                total += per['monto']
+        return total
+
+    def ded_totals(self, deducciones):
+        """
+        Devuelve la tupla (total de deducciones que cumplen las reglas, ISR).
+        """
+        excluded = self.ded_excluir
+        isrKeys = self.ded_isr
+        campo = self.ded_campo
+        total = 0.0
+        isr = 0.0
+        for ded in deducciones:
+            key = ded.get(campo)
+            if key not in excluded:
+                total += ded['monto']
+            if key in isrKeys:
+                isr += ded['monto']
+        return total, isr
+
+    def op_total(self, otros):
+        """
+        Total de los otros pagos que cumplen las reglas.
+        """
+        excluded = self.op_excluir
+        campo = self.op_campo
+        total = 0.0
+        for op in otros:
+            if op.get(campo) not in excluded:
+                total += op['monto']
+        return total
+
+
+DEFAULT_RULES = NominaRules()
+
+# Reglas ya compiladas en el proceso, por firma (ver shared_rules)
+_compiled = {DEFAULT_RULES.signature(): DEFAULT_RULES}
+
+
+def shared_rules(rules):
+    """
+    Devuelve la instancia de las reglas (con la misma firma) compartida en el
+    proceso, para que la tabla de búsqueda se reutilice entre los CFDi que
+    recibe un proceso trabajador.
+    """
+    if rules is None:
+        return DEFAULT_RULES
+    return _compiled.setdefault(rules.signature(), rules)
+
+
+def load_rules(fileName):
+    """
+    Lee las reglas de un archivo INI (secciones percepciones, deducciones y
+    otros_pagos) o JSON (mismo contenido como diccionario de secciones).
+    Los parámetros que no aparecen toman el valor de DEFAULT_RULES.
+    """
+    if os.path.splitext(fileName)[1].lower() == '.json':
+        f = open(fileName)
+        try:
+            config = json.load(f)
+        finally:
+            f.close()
+    else:
+        parser = ConfigParser.RawConfigParser()
+        try:
+            if not parser.read(fileName):
+                raise IOError('No se puede leer el archivo de reglas: %s' % fileName)
+        except ConfigParser.Error as e:
+            raise ValueError('Archivo de reglas no válido: %s' % e)
+        config = dict((section, dict(parser.items(section))) for section in parser.sections())
+
+    params = {}
+    for section, prefix in SECTIONS:
+        for option, value in (config.get(section) or {}).items():
+            param = "{}_{}".format(prefix, option)
+            if param == 'per_no_numericas' and isinstance(value, basestring):
+                value = value.strip().lower() in ('1', 'si', 'sí', 'true', 'incluir')
+            params[param] = value
+    try:
+        return NominaRules(**params)
+    except TypeError:
+        raise ValueError('Parámetro de reglas no soportado en %s' % fileName)
+
+
+def find_rules(directory=None):
+    """
+    Devuelve las reglas del archivo RULES_NAME del directorio indicado o, si
+    no existe, del directorio del programa; DEFAULT_RULES si no hay archivo.
+    """
+    for folder in (directory, os.path.dirname(os.path.abspath(__file__))):
+        if folder and os.path.isfile(os.path.join(folder, RULES_NAME)):
+            return load_rules(os.path.join(folder, RULES_NAME))
+    return DEFAULT_RULES
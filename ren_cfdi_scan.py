@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_scan.py
+Descripción         : Recorrido del directorio de CFDi en una sola pasada
+                      Obtiene los archivos XML, su tamaño y fecha de
+                      modificación, el contenido de cada directorio y el PDF
+                      que corresponde a cada XML
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_batch.py y ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_scan import scan_directory
+                      - Recorrer el directorio (y los ZIP, opcional):
+                      scan = scan_directory(directorio, archives=True)
+                      - Procesar sin volver a consultar cada archivo en disco:
+                      index = RenameIndex(scan)
+                      for cfdi in batch.run(scan.fileNames, scan.stats):
+                          index.add(cfdi)
+                      - PDF de un XML:
+                      scan.pdf_for(nombre_archivo_xml)
+                      - Utiliza os.scandir (o el paquete scandir en Python 2);
+                      sin ellos se usa os.listdir.
+'''
+import os
+import sys
+import stat as statmodule
+import zipfile
+from ren_cfdi_archive import is_archive, list_members
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+class ScanResult(object):
+    """
+    Resultado del recorrido: lista ordenada de XML (fileNames), su tupla
+    (tamaño, fecha de modificación) (stats), los nombres normalizados de cada
+    directorio (listings) y el PDF de cada XML (pdfs, por ruta sin extensión).
+    """
+    def __init__(self):
+        self.fileNames = []
+        self.stats = {}
+        self.listings = {}
+        self.pdfs = {}
+
+    def stat(self, fileName):
+        """
+        Devuelve la tupla (tamaño, fecha de modificación) obtenida en el
+        recorrido, o None si no se conoce.
+        """
+        return self.stats.get(fileName)
+
+    def pdf_for(self, fileName):
+        """
+        Devuelve la ruta del PDF con el mismo nombre que el XML (sin importar
+        mayúsculas en la extensión), o None si no existe.
+        """
+        return self.pdfs.get(os.path.normcase(os.path.splitext(fileName)[0]))
+
+
+def raise_error(e):
+    raise e
+
+
+def list_entries(directory):
+    """
+    Devuelve la lista ordenada de tuplas (nombre, es_directorio, stat) del
+    directorio. Con scandir el tipo se obtiene sin consultar cada archivo;
+    stat es la función que devuelve el os.stat del archivo.
+    Sin scandir se consulta cada entrada una sola vez (os.stat), y de ese
+    resultado se obtienen el tipo y el tamaño y fecha; os.lstat sólo se usa
+    en los directorios, para distinguir los enlaces.
+    Los enlaces a directorios (que os.walk no recorre) tienen es_directorio None.
+    """
+    entries = []
+    if scandir is not None:
+        for entry in scandir(directory or os.curdir):
+            isDir = entry.is_dir()
+            if isDir and entry.is_symlink():
+                isDir = None
+            entries.append((entry.name, isDir, entry.stat))
+    else:
+        for name in os.listdir(directory or os.curdir):
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                # Enlace roto: se conserva en el listado, stat() repite el error
+                entries.append((name, False, lambda e=e: raise_error(e)))
+                continue
+            isDir = statmodule.S_ISDIR(st.st_mode)
+            if isDir and statmodule.S_ISLNK(os.lstat(path).st_mode):
+                isDir = None
+            entries.append((name, isDir, lambda st=st: st))
+    entries.sort()
+    return entries
+
+
+def scan_directory(directory, archives=False, exclude=()):
+    """
+    Recorre el directorio y sus subdirectorios una sola vez (mismo orden que
+    os.walk con los nombres ordenados) y devuelve un ScanResult.
+    Sólo se consulta en disco el tamaño y la fecha de los XML y los ZIP.
+    Con archives=True se agregan al final los XML contenidos en los ZIP
+    (ver ren_cfdi_archive.member_name), que comparten el tamaño y fecha del ZIP.
+    Los subdirectorios del primer nivel cuyo nombre está en exclude (por
+    ejemplo la cuarentena) no se recorren.
+    """
+    scan = ScanResult()
+    zipFiles = []
+    pending = [directory]
+    while pending:
+        root = pending.pop()
+        try:
+            entries = list_entries(root)
+        except OSError:
+            continue
+        # Misma llave que os.path.split(xml)[0] (ver RenameIndex.listing)
+        key = os.path.dirname(os.path.join(root, ''))
+        scan.listings[key] = set(os.path.normcase(name) for name, isDir, stat in entries)
+        subdirs = []
+        for name, isDir, stat in entries:
+            path = os.path.join(root, name)
+            if isDir:
+                if not (root == directory and name in exclude):
+                    subdirs.append(path)
+                continue
+            if isDir is None:
+                continue
+            stem, ext = os.path.splitext(path)
+            ext = ext.upper()
+            if ext == '.XML':
+                scan.fileNames.append(path)
+                try:
+                    st = stat()
+                    scan.stats[path] = (st.st_size, st.st_mtime)
+                except OSError:
+                    pass
+            elif ext == '.PDF':
+                scan.pdfs[os.path.normcase(stem)] = path
+            elif archives and is_archive(name):
+                try:
+                    st = stat()
+                    zipFiles.append((path, (st.st_size, st.st_mtime)))
+                except OSError:
+                    pass
+        pending.extend(reversed(subdirs))
+    for zipName, st in zipFiles:
+        try:
+            members = list_members(zipName)
+        except (zipfile.BadZipfile, IOError) as e:
+            sys.stdout.write("No se puede leer el ZIP {}: {}\n".format(zipName, e))
+            continue
+        scan.fileNames.extend(members)
+        for member in members:
+            scan.stats[member] = st
+    return scan
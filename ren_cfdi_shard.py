@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_shard.py
+Descripción         : Procesamiento de CFDi repartido en varios equipos
+                      Cada equipo procesa una parte (shard i de N) del mismo
+                      directorio y genera un resultado parcial en SQLite; al
+                      unir los parciales se obtienen los mismos reportes que
+                      en una ejecución en un solo equipo
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Script independiente de la interfaz
+                      - Procesar la parte 0 de 4 (en cada equipo su parte; el
+                      directorio debe tener el mismo contenido en todos):
+                      python ren_cfdi_shard.py procesar /ruta/cfdi --shard 0/4
+                      - Repartir por UUID en lugar de por ruta (los CFDi
+                      repetidos quedan en la misma parte):
+                      python ren_cfdi_shard.py procesar /ruta/cfdi --shard 0/4 --por uuid
+                      - Unir los parciales (reportecfdi.csv, resumencfdi.csv,
+                      conciliacioncfdi.csv, duplicadoscfdi.csv y errorescfdi.csv):
+                      python ren_cfdi_shard.py unir parcialcfdi_*.sqlite --directorio /ruta/cfdi
+                      - (Opcional) Al unir, agregar a reportecfdi.sqlite y renombrar:
+                      python ren_cfdi_shard.py unir parcialcfdi_*.sqlite --sqlite --renombrar
+                      - Desde un script:
+                      from ren_cfdi_shard import run_shard, merge_shards
+                      parcial = run_shard(directorio, 0, 4)
+                      merge_shards([parcial, ...])
+'''
+import os
+import sys
+import json
+import zlib
+import heapq
+import sqlite3
+import argparse
+from ren_cfdi import CFDi
+from ren_cfdi_batch import BatchProcessor, CFDiError
+from ren_cfdi_scan import scan_directory
+from ren_cfdi_archive import is_member, open_member
+from ren_cfdi_filter import read_header, parse_filter
+from ren_cfdi_rules import load_rules, find_rules
+from ren_cfdi_report import CsvReportWriter, SqliteReportWriter, REPORT_NAME, SQLITE_REPORT_NAME
+from ren_cfdi_aggregate import Aggregator, SUMMARY_REPORT_NAME
+from ren_cfdi_reconcile import Reconciler, RECONCILE_REPORT_NAME
+from ren_cfdi_rename import RenameIndex, DUPLICATES_REPORT_NAME, JOURNAL_NAME
+from ren_cfdi_errors import write_errors, ERRORS_REPORT_NAME, QUARANTINE_NAME
+from ren_cfdi_manifest import to_str
+
+SHARD_NAME = 'parcialcfdi_{}_de_{}.sqlite'
+
+# Llave con la que se reparten los archivos
+SHARD_KEYS = ('ruta', 'uuid')
+
+# Datos del parcial que deben coincidir para unirlo con los demás
+SHARD_CHECKS = ('count', 'by', 'total', 'signature', 'filter')
+
+
+def parse_shard(text):
+    """
+    Convierte 'i/N' en la tupla (i, N), con 0 <= i < N.
+    """
+    try:
+        index, count = [int(x) for x in text.split('/')]
+    except ValueError:
+        raise ValueError('Parte no válida (i/N): %s' % text)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError('Parte no válida (i/N): %s' % text)
+    return index, count
+
+
+def relative_name(fileName, directory):
+    """
+    Ruta del archivo relativa al directorio con '/' como separador, igual en
+    todos los equipos aunque el directorio esté montado en otra ruta.
+    """
+    return os.path.relpath(fileName, directory).replace(os.sep, '/')
+
+
+def shard_key(fileName, directory, by='ruta'):
+    """
+    Devuelve la llave de reparto del archivo: su ruta relativa o, con
+    by='uuid', el UUID leído del texto del XML (sin leerlo completo); si no
+    se encuentra el UUID se usa la ruta.
+    """
+    if by == 'uuid':
+        try:
+            data = None
+            if is_member(fileName):
+                member = open_member(fileName)
+                try:
+                    data = member.read()
+                finally:
+                    member.close()
+            uuid = read_header(fileName, data, ('uuid',))['uuid']
+        except (IOError, OSError, ValueError):
+            uuid = None
+        if uuid:
+            return uuid.upper()
+    return relative_name(fileName, directory)
+
+
+def shard_of(key, count):
+    """
+    Parte (0 a count - 1) que corresponde a la llave; crc32 da el mismo
+    resultado en cualquier equipo y versión de Python.
+    """
+    return (zlib.crc32(key) & 0xffffffff) % count
+
+
+class ShardWriter(object):
+    """
+    Resultado parcial de una parte: tabla info (datos de la ejecución),
+    tabla cfdi (posición en el recorrido completo, ruta relativa, UUID y
+    values en JSON) y tabla errores. Las filas se guardan por bloques.
+    """
+    def __init__(self, fileName, info, buffer_size=1000):
+        if os.path.exists(fileName):
+            os.remove(fileName)
+        self.fileName = fileName
+        self.buffer_size = buffer_size
+        self.rows = []
+        self.conn = sqlite3.connect(fileName)
+        self.conn.text_factory = str
+        self.conn.execute("CREATE TABLE info (clave TEXT PRIMARY KEY, valor TEXT)")
+        self.conn.execute("CREATE TABLE cfdi (posicion INTEGER PRIMARY KEY, archivo TEXT,"
+                          " uuid TEXT, vals TEXT)")
+        self.conn.execute("CREATE INDEX cfdi_uuid ON cfdi (uuid)")
+        self.conn.execute("CREATE TABLE errores (posicion INTEGER PRIMARY KEY, archivo TEXT,"
+                          " tipo TEXT, detalle TEXT)")
+        self.set_info(info)
+
+    def set_info(self, info):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)",
+                                  [(key, json.dumps(value)) for key, value in info.items()])
+
+    def write(self, position, relative, values):
+        """
+        Agrega los values de un CFDi.
+        """
+        self.rows.append((position, relative, values.get('uuid'), json.dumps(dict(values))))
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def error(self, position, relative, error):
+        """
+        Registra un archivo no válido (CFDiError).
+        """
+        with self.conn:
+            self.conn.execute("INSERT INTO errores VALUES (?, ?, ?, ?)",
+                              (position, relative, error.kind, error.detail))
+
+    def flush(self):
+        if self.rows:
+            with self.conn:
+                self.conn.executemany("INSERT INTO cfdi VALUES (?, ?, ?, ?)", self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def run_shard(directory, index, count, by='ruta', output=None, prefix=False, archives=False,
+              workers=None, cfdi_filter=None, rules=None, out=None):
+    """
+    Procesa la parte index de count del directorio y escribe su resultado
+    parcial (por omisión SHARD_NAME en el directorio). Todas las partes
+    recorren el directorio completo para numerar los archivos en el mismo
+    orden que una ejecución en un solo equipo. Devuelve el nombre del parcial.
+    """
+    if by not in SHARD_KEYS:
+        raise ValueError('Llave de reparto no soportada: %s' % by)
+    out = out or sys.stdout
+    scan = scan_directory(directory, archives, exclude=(QUARANTINE_NAME,))
+    positions = {}
+    for position, fileName in enumerate(scan.fileNames):
+        if shard_of(shard_key(fileName, directory, by), count) == index:
+            positions[fileName] = position
+    fileNames = [f for f in scan.fileNames if f in positions]
+
+    batch = BatchProcessor(prefix, workers=workers, cfdi_filter=cfdi_filter, rules=rules)
+    info = {
+        'index': index, 'count': count, 'by': by, 'total': len(scan.fileNames),
+        'signature': batch.signature(), 'directory': os.path.abspath(directory),
+        'archives': archives, 'filter': cfdi_filter.spec() if cfdi_filter else None,
+    }
+    output = output or os.path.join(directory, SHARD_NAME.format(index, count))
+    writer = ShardWriter(output, info)
+    try:
+        for cfdi in batch.run(fileNames, scan.stats):
+            writer.write(positions[cfdi.fileName], relative_name(cfdi.fileName, directory),
+                         cfdi.values)
+        for error in batch.errors:
+            writer.error(positions[error.fileName], relative_name(error.fileName, directory), error)
+        info.update(processed=batch.count, skipped=batch.skipped, errors=len(batch.errors))
+        writer.set_info(info)
+    finally:
+        writer.close()
+    out.write("Parte {} de {}: {} de {} archivos ({} no válidos) en {:.2f} s\n".format(
+        index, count, batch.count, len(scan.fileNames), len(batch.errors), batch.elapsed))
+    return output
+
+
+def read_info(fileName):
+    """
+    Devuelve el diccionario info de un resultado parcial.
+    """
+    conn = sqlite3.connect(fileName)
+    try:
+        return dict((key, json.loads(value))
+                    for key, value in conn.execute("SELECT clave, valor FROM info"))
+    except sqlite3.DatabaseError:
+        raise ValueError('No es un resultado parcial: %s' % fileName)
+    finally:
+        conn.close()
+
+
+def read_rows(fileName, table):
+    """
+    Generador de las filas de una tabla del parcial ordenadas por posición.
+    """
+    conn = sqlite3.connect(fileName)
+    conn.text_factory = str
+    try:
+        for row in conn.execute("SELECT * FROM {} ORDER BY posicion".format(table)):
+            yield row
+    finally:
+        conn.close()
+
+
+def unique_rows(fileNames, table):
+    """
+    Une las filas de los parciales en el orden del recorrido completo
+    (heapq.merge, sin cargarlas en memoria); una posición repetida (la
+    misma parte procesada dos veces) sólo se entrega una vez.
+    """
+    last = None
+    for row in heapq.merge(*[read_rows(f, table) for f in fileNames]):
+        if row[0] != last:
+            last = row[0]
+            yield row
+
+
+def check_shards(fileNames, allow_missing=False):
+    """
+    Verifica que los parciales correspondan a la misma ejecución y que estén
+    todas las partes. Devuelve el info del primero.
+    """
+    if not fileNames:
+        raise ValueError('No se indicaron resultados parciales')
+    infos = [read_info(f) for f in fileNames]
+    first = infos[0]
+    for fileName, info in zip(fileNames, infos):
+        for key in SHARD_CHECKS:
+            if info.get(key) != first.get(key):
+                raise ValueError('El parcial {} no corresponde a la misma ejecución ({})'.format(
+                    fileName, key))
+        if 'processed' not in info:
+            raise ValueError('El parcial {} no terminó'.format(fileName))
+    missing = sorted(set(range(first['count'])) - set(info['index'] for info in infos))
+    if missing and not allow_missing:
+        raise ValueError('Faltan las partes: {}'.format(", ".join(str(i) for i in missing)))
+    return first
+
+
+def merge_shards(fileNames, directory=None, output=None, sqlite=False, rename=False,
+                 allow_missing=False, out=None):
+    """
+    Une los resultados parciales y escribe en output (por omisión el
+    directorio procesado) los mismos reportes que ren_cfdi_int.py: reporte
+    CSV (y SQLite), resumen, conciliación, duplicados y errores. Con rename
+    se renombran los archivos igual que en una ejecución en un solo equipo.
+    directory indica dónde está montado el directorio procesado en este
+    equipo. Devuelve el número de CFDi unidos.
+    """
+    out = out or sys.stdout
+    info = check_shards(fileNames, allow_missing)
+    directory = directory or info['directory'].encode('utf-8')
+    output = output or directory
+
+    report = CsvReportWriter(os.path.join(output, REPORT_NAME))
+    database = SqliteReportWriter(os.path.join(output, SQLITE_REPORT_NAME), append=True) \
+        if sqlite else None
+    aggregator = Aggregator()
+    reconciler = Reconciler()
+    # Con el directorio disponible en este equipo los duplicados, colisiones
+    # y PDF se obtienen del mismo recorrido que en un solo equipo
+    scan = None
+    if os.path.isdir(directory):
+        scan = scan_directory(directory, info.get('archives'), exclude=(QUARANTINE_NAME,))
+    index = RenameIndex(scan)
+    count = 0
+    try:
+        for position, relative, uuid, vals in unique_rows(fileNames, 'cfdi'):
+            fileName = os.path.join(directory, relative.replace('/', os.sep))
+            cfdi = CFDi.from_values(fileName, to_str(json.loads(vals)))
+            index.add(cfdi)
+            report.write(cfdi.values, fileName)
+            if database:
+                database.write(cfdi.values, fileName)
+            aggregator.add(cfdi.values)
+            reconciler.add(cfdi.values, fileName)
+            count += 1
+    finally:
+        report.close()
+        if database:
+            database.close()
+    aggregator.write(os.path.join(output, SUMMARY_REPORT_NAME))
+    reconciler.write(os.path.join(output, RECONCILE_REPORT_NAME))
+
+    errors = [CFDiError(os.path.join(directory, relative.replace('/', os.sep)), kind, detail)
+              for position, relative, kind, detail in unique_rows(fileNames, 'errores')]
+    if errors:
+        fileName = os.path.join(output, ERRORS_REPORT_NAME)
+        write_errors(fileName, errors)
+        out.write("{} archivos no válidos, ver {}\n".format(len(errors), fileName))
+    if rename:
+        index.plan().apply(os.path.join(directory, JOURNAL_NAME), out)
+    if index.conflicts:
+        fileName = os.path.join(output, DUPLICATES_REPORT_NAME)
+        index.write_report(fileName)
+        out.write("{} duplicados o colisiones, ver {}\n".format(len(index.conflicts), fileName))
+    out.write("Unidos {} CFDi de {} parciales\n".format(count, len(fileNames)))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Procesamiento de CFDi repartido en varios equipos')
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('procesar', help='Procesar una parte del directorio')
+    run.add_argument('directory', help='Directorio con los CFDi')
+    run.add_argument('--shard', required=True, help='Parte a procesar: i/N (i de 0 a N-1)')
+    run.add_argument('--por', dest='by', choices=SHARD_KEYS, default='ruta',
+                     help='Llave de reparto')
+    run.add_argument('--salida', help='Archivo del resultado parcial')
+    run.add_argument('--folio', default='', help='Folio (prefijo) del nombre de archivo')
+    run.add_argument('--zip', action='store_true', help='Leer también los XML contenidos en ZIP')
+    run.add_argument('--filtro', default='', help="Filtro, por ejemplo 'tipo=P fecha=2018-09'")
+    run.add_argument('--reglas', help='Archivo de reglas de nómina (INI o JSON)')
+    run.add_argument('--procesos', type=int, default=None, help='Número de procesos')
+
+    merge = commands.add_parser('unir', help='Unir los resultados parciales')
+    merge.add_argument('partials', nargs='+', help='Resultados parciales')
+    merge.add_argument('--directorio', dest='directory',
+                       help='Directorio procesado (si está en otra ruta en este equipo)')
+    merge.add_argument('--salida', help='Directorio de los reportes')
+    merge.add_argument('--sqlite', action='store_true', help='Agregar a reportecfdi.sqlite')
+    merge.add_argument('--renombrar', action='store_true', help='Renombrar los archivos')
+    merge.add_argument('--incompleto', action='store_true',
+                       help='Unir aunque falten partes')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'procesar':
+            index, count = parse_shard(args.shard)
+            rules = load_rules(args.reglas) if args.reglas else find_rules(args.directory)
+            run_shard(args.directory, index, count, args.by, args.salida, args.folio.upper(),
+                      args.zip, args.procesos, parse_filter(args.filtro), rules)
+        else:
+            merge_shards(args.partials, args.directory, args.salida, args.sqlite,
+                         args.renombrar, args.incompleto)
+    except (ValueError, IOError) as e:
+        parser.exit(1, "{}\n".format(e))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_stats.py
+Descripción         : Tiempos y contadores por etapa del procesamiento de CFDi
+                      (lectura, extracción, nombre, renombrado y CSV), por tipo
+                      de comprobante, y los archivos más lentos
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Módulo utilizado por ren_cfdi_batch.py y ren_cfdi_int.py
+                      - Importar:
+                      from ren_cfdi_stats import Stats
+                      - Activar en el motor masivo:
+                      stats = Stats()
+                      batch = BatchProcessor(prefijo, stats=stats)
+                      - Medir otras etapas:
+                      with stats.timer('csv', tipo):
+                          report.write(values, fileName)
+                      - Resultados:
+                      print stats.summary()
+                      stats.to_json(nombre_archivo_json)
+'''
+import time
+import json
+import heapq
+
+
+class StageTimer(object):
+    """
+    Administrador de contexto que suma a Stats el tiempo del bloque.
+    """
+    def __init__(self, stats, stage, docType=None, count=1):
+        self.stats = stats
+        self.stage = stage
+        self.docType = docType
+        self.count = count
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.stats.add(self.stage, time.time() - self.start, self.docType, self.count)
+
+
+class Stats(object):
+    """
+    Tiempos acumulados y número de operaciones por etapa y por
+    TipoDeComprobante, contadores generales y los archivos más lentos
+    (se conservan los slowest de mayor tiempo).
+    """
+    def __init__(self, slowest=10):
+        self.stages = {}
+        self.types = {}
+        self.counters = {}
+        self.slowest = slowest
+        self.heap = []
+        self.start = time.time()
+
+    def add(self, stage, seconds, docType=None, count=1):
+        """
+        Suma el tiempo y el número de operaciones de una etapa.
+        """
+        data = self.stages.setdefault(stage, [0, 0.0])
+        data[0] += count
+        data[1] += seconds
+        if docType is not None:
+            data = self.types.setdefault(docType, {}).setdefault(stage, [0, 0.0])
+            data[0] += count
+            data[1] += seconds
+
+    def timer(self, stage, docType=None, count=1):
+        """
+        Devuelve un administrador de contexto que mide el bloque como stage.
+        """
+        return StageTimer(self, stage, docType, count)
+
+    def count(self, name, value=1):
+        """
+        Incrementa un contador general (por ejemplo 'cached' o 'renamed').
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_file(self, fileName, docType, timings):
+        """
+        Registra los tiempos por etapa (CFDi.timings) de un archivo y lo
+        conserva si está entre los más lentos.
+        """
+        total = 0.0
+        for stage, seconds in timings.items():
+            self.add(stage, seconds, docType)
+            total += seconds
+        self.count('files')
+        if not self.slowest:
+            return
+        entry = (total, fileName, docType)
+        if len(self.heap) < self.slowest:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def merge(self, other):
+        """
+        Suma los resultados de otra instancia (por ejemplo de otro proceso).
+        """
+        for stage, (count, seconds) in other.stages.items():
+            self.add(stage, seconds, None, count)
+        for docType, stages in other.types.items():
+            for stage, (count, seconds) in stages.items():
+                data = self.types.setdefault(docType, {}).setdefault(stage, [0, 0.0])
+                data[0] += count
+                data[1] += seconds
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for entry in other.heap:
+            if len(self.heap) < self.slowest:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def get_slowest(self):
+        """
+        Devuelve la lista (segundos, archivo, tipo) de los archivos más lentos.
+        """
+        return sorted(self.heap, reverse=True)
+
+    def as_dict(self):
+        def stage_dict(count, seconds):
+            return {
+                'count': count,
+                'seconds': round(seconds, 6),
+                'avg_ms': round(seconds * 1000. / count, 3) if count else 0,
+            }
+        return {
+            'elapsed': round(time.time() - self.start, 3),
+            'counters': dict(self.counters),
+            'stages': dict((stage, stage_dict(*data)) for stage, data in self.stages.items()),
+            'types': dict((docType, dict((stage, stage_dict(*data)) for stage, data in stages.items()))
+                          for docType, stages in self.types.items()),
+            'slowest': [{'file': fileName, 'tipo': docType, 'seconds': round(seconds, 6)}
+                        for seconds, fileName, docType in self.get_slowest()],
+        }
+
+    def to_json(self, fileName):
+        """
+        Exporta los resultados a un archivo JSON.
+        """
+        f = open(fileName, 'w')
+        json.dump(self.as_dict(), f, indent=1, sort_keys=True)
+        f.close()
+
+    def summary(self):
+        """
+        Devuelve el resumen de los resultados en texto.
+        """
+        lines = ["Tiempo total: {:.2f} s".format(time.time() - self.start)]
+        for name in sorted(self.counters):
+            lines.append("  {:<12} {}".format(name, self.counters[name]))
+        lines.append("Etapa            Operaciones    Segundos   ms/operación")
+        for stage in sorted(self.stages):
+            count, seconds = self.stages[stage]
+            lines.append("  {:<14} {:>11} {:>11.3f} {:>14.3f}".format(
+                stage, count, seconds, seconds * 1000. / count if count else 0))
+        for docType in sorted(self.types):
+            lines.append("Tipo {}".format(docType))
+            for stage in sorted(self.types[docType]):
+                count, seconds = self.types[docType][stage]
+                lines.append("  {:<14} {:>11} {:>11.3f} {:>14.3f}".format(
+                    stage, count, seconds, seconds * 1000. / count if count else 0))
+        if self.heap:
+            lines.append("Archivos más lentos:")
+            for seconds, fileName, docType in self.get_slowest():
+                lines.append("  {:>9.3f} ms  {}  {}".format(seconds * 1000, docType, fileName))
+        return "\n".join(lines)
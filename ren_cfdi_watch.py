@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+'''
+Título              : ren_cfdi_watch.py
+Descripción         : Procesamiento continuo de CFDi (modo vigilancia)
+                      Vigila uno o varios directorios y procesa los XML nuevos
+                      en cuanto terminan de copiarse: los renombra y los
+                      agrega al reporte, sin interfaz gráfica
+Fecha (creación)    : 16/10/2026
+Versión             : 1.0
+Uso                 : Script independiente de la interfaz
+                      - Vigilar dos directorios con el folio 7:
+                      python ren_cfdi_watch.py --folio 7 /ruta/entrada /ruta/otra
+                      - Procesar también los XML que ya existían al iniciar:
+                      python ren_cfdi_watch.py --all /ruta/entrada
+                      - Utilizar otras reglas de nómina (ver ren_cfdi_rules.py):
+                      python ren_cfdi_watch.py --reglas reglas.ini /ruta/entrada
+                      - Detener con Ctrl+C.
+                      - Desde un script:
+                      from ren_cfdi_watch import FolderWatcher
+                      watcher = FolderWatcher([directorio], prefix='7')
+                      watcher.run()
+                      - Los directorios se consultan cada interval segundos; sólo
+                      se vuelven a listar los que cambiaron (fecha de
+                      modificación del directorio) y un XML se procesa cuando su
+                      tamaño y fecha no cambian durante settle segundos; si no
+                      es válido se vuelve a intentar cuando cambie.
+                      - Un archivo que no se pudo renombrar (por ejemplo un PDF
+                      abierto) se vuelve a renombrar cada settle segundos, sin
+                      agregarlo de nuevo al reporte.
+'''
+import os
+import sys
+import time
+import argparse
+import traceback
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_report import CsvReportWriter, SqliteReportWriter, REPORT_NAME, SQLITE_REPORT_NAME
+from ren_cfdi_rename import RenameIndex, RenamePlan, DUPLICATES_REPORT_NAME, JOURNAL_NAME
+from ren_cfdi_scan import list_entries
+from ren_cfdi_rules import load_rules, find_rules
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_SETTLE = 2.0
+
+
+class FolderWatcher(object):
+    """
+    Vigila directorios (por sondeo) y procesa los XML nuevos.
+    Conserva en memoria el estado de cada directorio (fecha de modificación
+    y archivos conocidos), por lo que no vuelve a recorrer todo el árbol.
+    """
+    def __init__(self, directories, prefix=False, interval=DEFAULT_INTERVAL,
+                 settle=DEFAULT_SETTLE, rename=True, report=True, sqlite=False,
+                 catch_up=False, out=None, rules=None):
+        self.roots = [os.path.abspath(d) for d in directories]
+        self.prefix = prefix
+        self.interval = interval
+        self.settle = settle
+        self.rename = rename
+        self.rules = rules
+        self.out = out or sys.stdout
+        self.dirs = {}
+        self.seen = {}
+        self.pending = {}
+        self.failed = {}
+        self.retry = []
+        self.lastRetry = 0.
+        self.uuids = {}
+        self.stopped = False
+        self.processed = 0
+        self.reports = {}
+        self.databases = {}
+        for root in self.roots:
+            if report:
+                self.reports[root] = CsvReportWriter(os.path.join(root, REPORT_NAME), append=True)
+            if sqlite:
+                self.databases[root] = SqliteReportWriter(os.path.join(root, SQLITE_REPORT_NAME),
+                                                          append=True)
+        # Estado inicial: sin catch_up los XML existentes no se procesan
+        now = time.time()
+        for root in self.roots:
+            self.scan_dir(root, root, now, not catch_up)
+
+    def scan_dir(self, directory, root, now, baseline=False):
+        """
+        Lista el directorio y registra sus XML nuevos como pendientes (o como
+        conocidos con baseline). Los subdirectorios nuevos se listan también.
+        """
+        try:
+            mtime = os.stat(directory).st_mtime
+            entries = list_entries(directory)
+        except OSError:
+            self.dirs.pop(directory, None)
+            return
+        self.dirs[directory] = (mtime, root)
+        for name, isDir, stat in entries:
+            path = os.path.join(directory, name)
+            if isDir:
+                if path not in self.dirs:
+                    self.scan_dir(path, root, now, baseline)
+                continue
+            if isDir is None or os.path.splitext(name)[1].upper() != '.XML':
+                continue
+            if path in self.seen or path in self.pending:
+                continue
+            try:
+                st = stat()
+            except OSError:
+                continue
+            if baseline:
+                self.seen[path] = (st.st_size, st.st_mtime)
+            else:
+                self.pending[path] = ((st.st_size, st.st_mtime), now, root)
+
+    def poll(self):
+        """
+        Vuelve a listar los directorios que cambiaron y devuelve la lista de
+        XML pendientes cuyo tamaño y fecha no cambiaron en settle segundos.
+        """
+        now = time.time()
+        for directory, (mtime, root) in self.dirs.items():
+            try:
+                current = os.stat(directory).st_mtime
+            except OSError:
+                del self.dirs[directory]
+                continue
+            # Un directorio modificado hace muy poco se vuelve a listar por la
+            # resolución de la fecha de modificación de algunos sistemas de archivos
+            if current != mtime or now - current < 2 * self.interval:
+                self.scan_dir(directory, root, now)
+
+        # Los XML no válidos (por ejemplo copiados a medias) se reintentan al cambiar
+        for path, (stat, root) in self.failed.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.failed[path]
+                continue
+            current = (st.st_size, st.st_mtime)
+            if current != stat:
+                del self.failed[path]
+                self.pending[path] = (current, now, root)
+
+        ready = []
+        for path, (stat, since, root) in self.pending.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            current = (st.st_size, st.st_mtime)
+            if current != stat:
+                self.pending[path] = (current, now, root)
+            elif now - since >= self.settle and now - st.st_mtime >= self.settle:
+                ready.append(path)
+        ready.sort()
+        return ready
+
+    def process(self, fileNames):
+        """
+        Procesa los XML listos: los agrega al reporte y los renombra.
+        Devuelve el número de CFDi procesados.
+        """
+        roots = {}
+        for fileName in fileNames:
+            stat, since, root = self.pending.pop(fileName)
+            self.seen[fileName] = stat
+            roots.setdefault(root, []).append(fileName)
+        count = 0
+        for root in sorted(roots):
+            count += self.process_root(root, roots[root])
+        self.processed += count
+        return count
+
+    def read_cfdis(self, root, fileNames):
+        """
+        Devuelve las instancias CFDi de los archivos; los que no son válidos
+        quedan en failed.
+        """
+        batch = BatchProcessor(self.prefix, workers=1 if len(fileNames) < 50 else None,
+                               rules=self.rules)
+        cfdis = batch.process(fileNames)
+        for error in batch.errors:
+            self.out.write("Error en {}: {}\n".format(error.fileName, error.detail))
+            self.failed[error.fileName] = (self.seen.pop(error.fileName), root)
+        return cfdis
+
+    def process_root(self, root, fileNames):
+        """
+        Procesa los XML listos de un directorio vigilado.
+        """
+        cfdis = self.read_cfdis(root, fileNames)
+        index = RenameIndex()
+        # Los UUID se conservan entre ciclos para detectar duplicados
+        index.uuids = self.uuids
+        report = self.reports.get(root)
+        database = self.databases.get(root)
+        for cfdi in cfdis:
+            index.add(cfdi)
+            if report:
+                report.write(cfdi.values, cfdi.fileName)
+            if database:
+                database.write(cfdi.values, cfdi.fileName)
+        if report:
+            report.flush()
+        if database:
+            database.flush()
+
+        plan = index.plan()
+        if self.rename and len(plan):
+            self.apply_plan(root, plan)
+        if index.conflicts:
+            fileName = os.path.join(root, DUPLICATES_REPORT_NAME)
+            index.write_report(fileName)
+            self.out.write("{} duplicados o colisiones, ver {}\n".format(len(index.conflicts), fileName))
+        self.out.write("{}: {} CFDi procesados\n".format(root, len(cfdis)))
+        self.out.flush()
+        return len(cfdis)
+
+    def apply_plan(self, root, plan):
+        """
+        Renombra los pares del plan; los renombrados se registran con su
+        nombre nuevo (no son archivos nuevos) y los que fallan quedan en retry.
+        """
+        try:
+            applied, failed = plan.apply(os.path.join(root, JOURNAL_NAME), self.out)
+        except (IOError, OSError):
+            # Sólo la bitácora: el plan completo se vuelve a intentar
+            traceback.print_exc(file=self.out)
+            applied, failed = [], [(old, new, '') for old, new in plan.entries]
+        for old, new in applied:
+            stat = self.seen.pop(old, None)
+            if stat is not None:
+                try:
+                    st = os.stat(new)
+                except OSError:
+                    continue
+                self.seen[new] = (st.st_size, st.st_mtime)
+        for old, new, detail in failed:
+            self.retry.append((old, new, root))
+        self.lastRetry = time.time()
+
+    def retry_renames(self):
+        """
+        Vuelve a intentar los renombrados fallidos. Se descartan los pares
+        cuyo archivo ya no existe o cuyo nombre destino ya está ocupado.
+        """
+        pending, self.retry = self.retry, []
+        for root in sorted(set(r for old, new, r in pending)):
+            entries = []
+            for old, new, r in pending:
+                if r != root:
+                    continue
+                if not os.path.exists(old) or os.path.exists(new):
+                    self.out.write("Se descarta el renombrado: {} -> {}\n".format(old, new))
+                    continue
+                entries.append((old, new))
+            if entries:
+                self.apply_plan(root, RenamePlan(entries))
+
+    def run(self, cycles=None):
+        """
+        Ciclo de vigilancia; termina con stop(), Ctrl+C o después de cycles ciclos.
+        """
+        try:
+            while not self.stopped and cycles != 0:
+                ready = self.poll()
+                if ready:
+                    self.process(ready)
+                if self.retry and time.time() - self.lastRetry >= self.settle:
+                    self.retry_renames()
+                if cycles is not None:
+                    cycles -= 1
+                if not self.stopped and cycles != 0:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        """
+        Solicita terminar el ciclo de vigilancia.
+        """
+        self.stopped = True
+
+    def close(self):
+        """
+        Cierra los reportes.
+        """
+        for writer in self.reports.values() + self.databases.values():
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vigila directorios y procesa los CFDi nuevos')
+    parser.add_argument('directories', nargs='+', help='Directorios a vigilar')
+    parser.add_argument('--folio', default='', help='Folio (prefijo) del nombre de archivo')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='Segundos entre consultas a los directorios')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help='Segundos sin cambios para considerar un XML completo')
+    parser.add_argument('--all', action='store_true',
+                        help='Procesar también los XML existentes al iniciar')
+    parser.add_argument('--sin-renombrar', dest='rename', action='store_false',
+                        help='Sólo generar el reporte')
+    parser.add_argument('--sin-csv', dest='report', action='store_false',
+                        help='No agregar al reporte CSV')
+    parser.add_argument('--sqlite', action='store_true',
+                        help='Agregar los valores a reportecfdi.sqlite')
+    parser.add_argument('--reglas', help='Archivo de reglas de nómina (INI o JSON)')
+    args = parser.parse_args()
+
+    rules = load_rules(args.reglas) if args.reglas else find_rules()
+    watcher = FolderWatcher(args.directories, args.folio.upper(), args.interval, args.settle,
+                            args.rename, args.report, args.sqlite, args.all, rules=rules)
+    sys.stdout.write("Vigilando: {}\n".format(", ".join(watcher.roots)))
+    watcher.run()
+
+
+if __name__ == '__main__':
+    main()
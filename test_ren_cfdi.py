@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas de la extracción de values de ren_cfdi.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi
+'''
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from ren_cfdi import CFDi, PARSERS
+from ren_cfdi_bench import generate_corpus
+from ren_cfdi_report import get_csv_row
+
+TOTAL_TRASLADOS_RE = re.compile(r'<cfdi:Impuestos TotalImpuestosTrasladados="([^"]*)"')
+
+
+class ExtractionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.fileNames = generate_corpus(os.path.join(cls.directory, 'corpus'), 200,
+                                        types='IEPN', pdf=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_parsers_match(self):
+        for fileName in self.fileNames:
+            iterparse, minidom = [dict(CFDi(fileName, 'B', parser).values) for parser in PARSERS]
+            self.assertEqual(iterparse, minidom, fileName)
+            self.assertEqual(get_csv_row(iterparse), get_csv_row(minidom))
+
+    def test_lazy_outputs_match_full_extraction(self):
+        for parser in PARSERS:
+            for fileName in self.fileNames:
+                full = CFDi(fileName, 'B', parser).values
+                lazy = CFDi(fileName, 'B', parser, outputs=['file_name']).values
+                self.assertEqual(lazy['file_name'], full['file_name'], fileName)
+                for field, value in dict(lazy).items():
+                    if value is not None:
+                        self.assertEqual(value, full[field], (fileName, field))
+
+    def test_concepto_taxes_are_not_counted(self):
+        # Los cfdi:Impuestos de cada concepto no se suman a los del comprobante
+        for parser in PARSERS:
+            for fileName in self.fileNames:
+                f = open(fileName)
+                match = TOTAL_TRASLADOS_RE.search(f.read())
+                f.close()
+                if not match:
+                    continue
+                values = CFDi(fileName, 'B', parser).values
+                self.assertAlmostEqual(float(values['traslados']), float(match.group(1)))
+                self.assertAlmostEqual(float(values['iva_t']), float(match.group(1)))
+
+    def test_missing_complemento(self):
+        messages = {'N': 'Nómina', 'P': 'Pagos'}
+        for fileName in self.fileNames:
+            f = open(fileName)
+            xml = f.read()
+            f.close()
+            docType = re.search(r'TipoDeComprobante="(\w)"', xml).group(1)
+            if docType not in messages:
+                continue
+            broken = os.path.join(self.directory, 'sin_complemento.xml')
+            f = open(broken, 'w')
+            f.write(re.sub(r'<cfdi:Complemento>.*</cfdi:Complemento>', '', xml))
+            f.close()
+            for parser in PARSERS:
+                with self.assertRaises(ValueError) as raised:
+                    CFDi(broken, 'B', parser)
+                self.assertIn('El CFDi no cuenta con {}'.format(messages[docType]),
+                              str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del motor masivo de ren_cfdi_batch.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_batch
+'''
+import os
+import shutil
+import tempfile
+import unittest
+import threading
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_bench import generate_corpus
+from ren_cfdi_filter import CFDiFilter
+from ren_cfdi_manifest import Manifest
+
+
+class BatchErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = generate_corpus(self.directory, 2, types='I', pdf=False)
+        self.broken = os.path.join(self.directory, 'roto.xml')
+        os.symlink(os.path.join(self.directory, 'no_existe', 'x.xml'), self.broken)
+        self.manifest = Manifest(self.directory)
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(self.directory)
+
+    def test_dangling_symlink_with_manifest(self):
+        fileNames = [self.fileNames[0], self.broken, self.fileNames[1]]
+        batch = BatchProcessor('B', workers=1, manifest=self.manifest)
+        processed = [cfdi.fileName for cfdi in batch.run(fileNames)]
+        self.assertEqual(processed, self.fileNames)
+        self.assertEqual(batch.count, 3)
+        self.assertEqual([error.fileName for error in batch.errors], [self.broken])
+        self.assertEqual(batch.errors[0].kind, 'OSError')
+
+
+class BatchProgressTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = generate_corpus(self.directory, 8, types='IEPN', pdf=False)
+        broken = os.path.join(self.directory, 'roto.xml')
+        open(broken, 'w').close()
+        self.fileNames.append(broken)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_progress_counts_skipped_and_errors(self):
+        counts = []
+        batch = BatchProcessor('B', workers=1, cfdi_filter=CFDiFilter(tipos='P'))
+        processed = list(batch.run(self.fileNames, progress=lambda b: counts.append(b.count)))
+        self.assertEqual(len(processed), 2)
+        self.assertEqual(counts, range(1, len(self.fileNames) + 1))
+        self.assertEqual(len(batch.errors), 1)
+
+    def test_cancel_between_skipped_files(self):
+        cancel = threading.Event()
+
+        def progress(batch):
+            if batch.count == 3:
+                cancel.set()
+
+        batch = BatchProcessor('B', workers=1, cfdi_filter=CFDiFilter(tipos='T'))
+        self.assertEqual(list(batch.run(self.fileNames, progress=progress, cancel=cancel)), [])
+        self.assertEqual(batch.count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas de la línea de comandos ren_cfdi_cli.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_cli
+'''
+import os
+import sys
+import json
+import select
+import shutil
+import tempfile
+import unittest
+import subprocess
+from ren_cfdi_bench import generate_corpus
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ren_cfdi_cli.py')
+# Segundos máximos para recibir la línea JSON de una ruta
+TIMEOUT = 10
+
+
+class StdinStreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = generate_corpus(os.path.join(self.directory, 'corpus'), 2,
+                                         types='I', pdf=False)
+        self.proc = subprocess.Popen([sys.executable, CLI, '-'], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def tearDown(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        shutil.rmtree(self.directory)
+
+    def read_line(self):
+        ready = select.select([self.proc.stdout], [], [], TIMEOUT)[0]
+        self.assertTrue(ready, 'sin salida antes de cerrar la entrada estándar')
+        return json.loads(self.proc.stdout.readline())
+
+    def test_each_path_is_written_before_stdin_closes(self):
+        for fileName in self.fileNames:
+            self.proc.stdin.write(fileName + '\n')
+            self.proc.stdin.flush()
+            self.assertEqual(self.read_line()['archivo'], fileName)
+        self.proc.stdin.close()
+        self.assertEqual(self.proc.stdout.read(), '')
+        self.assertEqual(self.proc.wait(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
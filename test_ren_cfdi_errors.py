@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas de la cuarentena de ren_cfdi_errors.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_errors
+'''
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+from ren_cfdi_batch import CFDiError
+from ren_cfdi_errors import quarantine, write_errors, QUARANTINE_NAME
+
+
+class QuarantineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.errors = []
+        for name in ('a.xml', 'b.xml'):
+            fileName = os.path.join(self.directory, name)
+            open(fileName, 'w').close()
+            self.errors.append(CFDiError(fileName, 'ParseError', 'no es XML'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_moves_files(self):
+        moved, failed = quarantine(self.errors, self.directory)
+        self.assertEqual(failed, {})
+        self.assertEqual(sorted(moved.values()),
+                         [os.path.join(self.directory, QUARANTINE_NAME, name)
+                          for name in ('a.xml', 'b.xml')])
+
+    def test_failed_move_is_reported_and_does_not_stop_the_batch(self):
+        # Un archivo con el nombre de la carpeta de cuarentena impide crearla
+        open(os.path.join(self.directory, QUARANTINE_NAME), 'w').close()
+        moved, failed = quarantine(self.errors, self.directory)
+        self.assertEqual(moved, {})
+        self.assertEqual(sorted(failed), [error.fileName for error in self.errors])
+        for error in self.errors:
+            self.assertTrue(os.path.isfile(error.fileName))
+
+        reportName = os.path.join(self.directory, 'errores.csv')
+        write_errors(reportName, self.errors, moved, failed)
+        f = open(reportName, 'rb')
+        rows = list(csv.reader(f))
+        f.close()
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row[3] == '' and row[4] for row in rows[1:]))
+
+    def test_existing_target_is_reported(self):
+        target = os.path.join(self.directory, QUARANTINE_NAME)
+        os.mkdir(target)
+        open(os.path.join(target, 'a.xml'), 'w').close()
+        moved, failed = quarantine(self.errors, self.directory)
+        self.assertEqual(sorted(moved), [self.errors[1].fileName])
+        self.assertEqual(sorted(failed), [self.errors[0].fileName])
+        self.assertIn('ya existe en cuarentena', failed[self.errors[0].fileName])
+        self.assertTrue(os.path.isfile(self.errors[0].fileName))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del filtro de ren_cfdi_filter.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_filter
+'''
+import os
+import re
+import random
+import shutil
+import tempfile
+import unittest
+from ren_cfdi_batch import BatchProcessor
+from ren_cfdi_bench import generate_cfdi
+from ren_cfdi_filter import parse_filter, read_header
+from ren_cfdi_manifest import Manifest
+
+RFC = 'MUÑ6403284EL'
+
+
+class NonAsciiRfcTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = []
+        rnd = random.Random(1)
+        for name, rfc in (('a.xml', RFC), ('b.xml', 'AAA010101AAA')):
+            uuid, xml = generate_cfdi(rnd, 'I')
+            xml = re.sub(r'(<cfdi:Emisor Rfc=")[^"]*', r'\g<1>' + rfc, xml)
+            fileName = os.path.join(self.directory, name)
+            f = open(fileName, 'wb')
+            f.write(xml)
+            f.close()
+            self.fileNames.append(fileName)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_filter(self, text):
+        batch = BatchProcessor('B', workers=1, cfdi_filter=parse_filter(text))
+        return [cfdi.fileName for cfdi in batch.run(self.fileNames)]
+
+    def test_header_is_unicode(self):
+        self.assertEqual(read_header(self.fileNames[0])['rfce'], RFC.decode('utf-8'))
+
+    def test_byte_string_filter(self):
+        # Como lo recibe la línea de comandos
+        cfdi_filter = parse_filter('rfce=' + RFC)
+        self.assertTrue(cfdi_filter.accepts(self.fileNames[0]))
+        self.assertFalse(cfdi_filter.accepts(self.fileNames[1]))
+        self.assertEqual(self.run_filter('rfce=' + RFC), self.fileNames[:1])
+
+    def test_unicode_filter(self):
+        # Como lo devuelve Tk, en minúsculas
+        text = u'rfce=' + RFC.decode('utf-8').lower()
+        self.assertTrue(parse_filter(text).accepts(self.fileNames[0]))
+        self.assertEqual(self.run_filter(text), self.fileNames[:1])
+
+    def test_cached_values_keep_the_name(self):
+        manifest = Manifest(self.directory)
+        try:
+            for i in range(2):
+                batch = BatchProcessor('B', workers=1, manifest=manifest,
+                                       cfdi_filter=parse_filter('rfce=' + RFC))
+                cfdi, = batch.run(self.fileNames)
+                self.assertTrue(cfdi.get_rename_targets()[1].endswith('.xml'))
+            self.assertEqual(batch.cached, 1)
+        finally:
+            manifest.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del manifiesto de ren_cfdi_manifest.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_manifest
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from ren_cfdi_manifest import Manifest
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = Manifest(self.directory)
+        self.fileNames = []
+        for name in ('a.xml', 'b.xml', 'c.xml'):
+            fileName = os.path.join(self.directory, name)
+            open(fileName, 'w').close()
+            self.manifest.put(fileName, self.manifest.stat(fileName), {'uuid': name})
+            self.fileNames.append(fileName)
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(self.directory)
+
+    def paths(self):
+        return sorted(row[0] for row in self.manifest.conn.execute("SELECT path FROM files"))
+
+    def test_prune_removes_files_not_seen(self):
+        os.remove(self.fileNames[1])
+        seen = [self.fileNames[0], self.fileNames[2]]
+        self.assertEqual(self.manifest.prune(seen), 1)
+        self.assertEqual(self.paths(), ['a.xml', 'c.xml'])
+        self.assertEqual(self.manifest.prune(seen), 0)
+
+    def test_move_keeps_one_row(self):
+        newName = os.path.join(self.directory, 'd.xml')
+        os.rename(self.fileNames[0], newName)
+        self.manifest.move(self.fileNames[0], newName)
+        self.assertEqual(self.paths(), ['b.xml', 'c.xml', 'd.xml'])
+
+
+if __name__ == '__main__':
+    unittest.main()
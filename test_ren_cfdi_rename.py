@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del renombrado de ren_cfdi_rename.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_rename
+'''
+import os
+import shutil
+import tempfile
+import unittest
+from ren_cfdi_rename import RenamePlan, read_journal, undo_journal
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'bitacora')
+        self.old = os.path.join(self.directory, 'a.xml')
+        self.new = os.path.join(self.directory, 'b.xml')
+        open(self.old, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_empty_plan_keeps_previous_journal(self):
+        RenamePlan([(self.old, self.new)]).apply(self.journal)
+        # Segunda ejecución sobre la carpeta ya renombrada
+        self.assertEqual(RenamePlan().apply(self.journal), ([], []))
+        self.assertEqual(read_journal(self.journal), ([(self.old, self.new)], True))
+        self.assertEqual(undo_journal(self.journal), 1)
+        self.assertTrue(os.path.isfile(self.old))
+
+    def test_failed_plan_keeps_previous_journal(self):
+        RenamePlan([(self.old, self.new)]).apply(self.journal)
+        missing = os.path.join(self.directory, 'c.xml')
+        applied, failed = RenamePlan([(missing, self.old)]).apply(self.journal)
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(read_journal(self.journal), ([(self.old, self.new)], True))
+
+
+if __name__ == '__main__':
+    unittest.main()
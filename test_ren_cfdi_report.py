@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del reporte SQLite de ren_cfdi_report.py
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_report
+'''
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from ren_cfdi import CFDi
+from ren_cfdi_bench import generate_corpus
+from ren_cfdi_report import SqliteReportWriter, SQLITE_COLUMNS
+
+
+class SqliteReportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileNames = generate_corpus(os.path.join(self.directory, 'corpus'), 8,
+                                         types='IEPN', pdf=False)
+        self.dbName = os.path.join(self.directory, 'reporte.sqlite')
+        report = SqliteReportWriter(self.dbName)
+        for fileName in self.fileNames:
+            cfdi = CFDi(fileName, 'B')
+            report.write(cfdi.values, cfdi.fileName)
+        report.close()
+        self.conn = sqlite3.connect(self.dbName)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.directory)
+
+    def test_real_columns_hold_only_numbers(self):
+        for name, kind, field in SQLITE_COLUMNS:
+            if kind == 'REAL':
+                types = set(row[0] for row in self.conn.execute(
+                    "SELECT DISTINCT typeof({}) FROM cfdi".format(name)))
+                self.assertTrue(types <= set(['real', 'null']), (name, types))
+
+    def test_numeric_range_query(self):
+        tipos = set(row[0] for row in self.conn.execute(
+            "SELECT DISTINCT tipo FROM cfdi"))
+        self.assertEqual(tipos, set(['I', 'E', 'P', 'N']))
+        rows = self.conn.execute("SELECT tipo FROM cfdi WHERE monto > 1e12").fetchall()
+        self.assertEqual(rows, [])
+        rows = self.conn.execute("SELECT tipo FROM cfdi WHERE neto_f > 1e12").fetchall()
+        self.assertEqual(rows, [])
+        tipos = set(row[0] for row in self.conn.execute(
+            "SELECT tipo FROM cfdi WHERE neto_f >= 0"))
+        self.assertEqual(tipos, set(['N']))
+        tipos = set(row[0] for row in self.conn.execute(
+            "SELECT tipo FROM cfdi WHERE monto >= 0"))
+        self.assertEqual(tipos, set(['P']))
+
+    def test_old_text_placeholders_are_cleared(self):
+        self.conn.execute("UPDATE cfdi SET monto = '-' WHERE tipo = 'I'")
+        self.conn.execute("PRAGMA user_version = 0")
+        self.conn.commit()
+        SqliteReportWriter(self.dbName, append=True).close()
+        rows = self.conn.execute("SELECT tipo FROM cfdi WHERE monto > 1e12").fetchall()
+        self.assertEqual(rows, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
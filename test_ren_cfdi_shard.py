@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+'''
+Pruebas del procesamiento repartido de ren_cfdi_shard.py, con un proceso
+por parte como en varios equipos
+                      - Ejecutar:
+                      python -m unittest test_ren_cfdi_shard
+'''
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+from ren_cfdi_bench import generate_corpus
+
+SHARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ren_cfdi_shard.py')
+
+
+class ShardProcessTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.corpus = os.path.join(self.directory, 'corpus')
+        generate_corpus(self.corpus, 60, types='IEPN')
+        # Un archivo no válido para el reporte de errores
+        open(os.path.join(self.corpus, 'roto.xml'), 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def shard(self, *args):
+        proc = subprocess.Popen([sys.executable, SHARD] + list(args),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        return proc.returncode, err
+
+    def run_shards(self, name, count, filters=None):
+        """
+        Ejecuta count procesos 'procesar' en paralelo y devuelve los parciales.
+        """
+        partials = []
+        procs = []
+        for i in range(count):
+            partial = os.path.join(self.directory, '{}_{}.sqlite'.format(name, i))
+            args = [sys.executable, SHARD, 'procesar', self.corpus, '--shard',
+                    '{}/{}'.format(i, count), '--salida', partial, '--procesos', '1']
+            if filters:
+                args += ['--filtro', filters[i]]
+            procs.append(subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE))
+            partials.append(partial)
+        for proc in procs:
+            out, err = proc.communicate()
+            self.assertEqual(proc.returncode, 0, err)
+        return partials
+
+    def merge(self, name, partials):
+        output = os.path.join(self.directory, name)
+        os.mkdir(output)
+        returncode, err = self.shard('unir', '--salida', output, *partials)
+        self.assertEqual(returncode, 0, err)
+        return output
+
+    def read_reports(self, output):
+        reports = {}
+        for name in sorted(os.listdir(output)):
+            f = open(os.path.join(output, name), 'rb')
+            reports[name] = f.read()
+            f.close()
+        return reports
+
+    def test_shards_match_single_run(self):
+        single = self.merge('uno', self.run_shards('uno', 1))
+        sharded = self.merge('tres', self.run_shards('tres', 3))
+        expected = self.read_reports(single)
+        self.assertIn('reportecfdi.csv', expected)
+        self.assertIn('errorescfdi.csv', expected)
+        self.assertEqual(self.read_reports(sharded), expected)
+
+    def test_different_filters_are_not_merged(self):
+        partials = self.run_shards('filtro', 2, ['tipo=I', 'tipo=P'])
+        returncode, err = self.shard('unir', '--salida', self.directory, *partials)
+        self.assertEqual(returncode, 1)
+        self.assertIn('(filter)', err)
+
+
+if __name__ == '__main__':
+    unittest.main()